@@ -1,9 +1,40 @@
 from django.contrib import admin
-from food.models import Food, Order, OrderStatusHistory, OrderItem, Category, Review, Vendor
+from food.models import (
+    ArchivedOrder, ArchivedOrderItem, Food, Order, OrderStatusHistory, OrderItem, Category, Review, Vendor,
+)
+from food.catalog_cache import invalidate_catalog
+from food.search import refresh_search_documents
+from food.services.cart_service import repair_order_totals
+from food.services.category_service import delete_category
+from food.services.order_service import cancel_orders
 
 
 admin.site.register(Food)
-admin.site.register(OrderItem)
+
+
+def _retotal(order_ids):
+    # item edits in the admin bypass the cart services, which move totals by
+    # delta, so the affected orders are re-summed from their items instead
+    repair_order_totals(Order.objects.filter(id__in=[order_id for order_id in order_ids if order_id]))
+
+
+class OrderItemAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        previous = form.initial.get("order") if change else None
+        super().save_model(request, obj, form, change)
+        _retotal([obj.order_id, previous])
+
+    def delete_model(self, request, obj):
+        order_id = obj.order_id
+        super().delete_model(request, obj)
+        _retotal([order_id])
+
+    def delete_queryset(self, request, queryset):
+        order_ids = list(queryset.values_list("order_id", flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        _retotal(order_ids)
+
+admin.site.register(OrderItem, OrderItemAdmin)
 
 
 class OrderItemInline(admin.StackedInline):
@@ -14,6 +45,17 @@ class OrderItemInline(admin.StackedInline):
 class OrderAdmin(admin.ModelAdmin):
     inlines = [OrderItemInline]
     list_display = ['id', 'user', 'address', 'total', 'status',  'created_at', 'updated_at', 'payment_status']
+    list_filter = ['status', 'vendor']
+    actions = ['cancel_selected_orders']
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        _retotal([form.instance.id])
+
+    @admin.action(description="Cancel selected orders and restock")
+    def cancel_selected_orders(self, request, queryset):
+        cancelled = cancel_orders(queryset, user=request.user)
+        self.message_user(request, f"Cancelled {cancelled} orders; orders already in preparation were skipped.")
 admin.site.register(Order, OrderAdmin)
 
 class OrderHistoryStatusAdmin(admin.ModelAdmin):
@@ -22,6 +64,27 @@ class OrderHistoryStatusAdmin(admin.ModelAdmin):
 admin.site.register(OrderStatusHistory, OrderHistoryStatusAdmin)
 
 
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    readonly_fields = ('food', 'quantity', 'price_at_purchase', 'subtotal')
+    can_delete = False
+    extra = 0
+
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    # read only: archived orders are kept for support and reporting
+    inlines = [ArchivedOrderItemInline]
+    list_display = ['id', 'user', 'vendor', 'total', 'status', 'payment_status', 'created_at', 'archived_at']
+    list_filter = ['status', 'vendor']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+admin.site.register(ArchivedOrder, ArchivedOrderAdmin)
+
+
 class FoodInline(admin.StackedInline):
     model = Food
     extra = 1
@@ -30,6 +93,21 @@ class FoodInline(admin.StackedInline):
 class CategoryAdmin(admin.ModelAdmin):
     inlines = [FoodInline]
 
+    # admin writes invalidate like category_service's, or every worker keeps
+    # serving its old category snapshot
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if "name" in form.changed_data:
+            refresh_search_documents(Food.objects.filter(category=obj))
+        invalidate_catalog(category_ids=[obj.id], categories=True)
+
+    def delete_model(self, request, obj):
+        delete_category(obj)
+
+    def delete_queryset(self, request, queryset):
+        for category in queryset:
+            delete_category(category)
+
 admin.site.register(Category, CategoryAdmin)
 
 class ReviewAdmin(admin.ModelAdmin):
@@ -0,0 +1,92 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import transaction
+
+CATALOG_SCOPE = "catalog"
+CATEGORIES_SCOPE = "categories"
+VENDORS_SCOPE = "vendors"
+
+CATALOG_RESPONSE_TIMEOUT = 300
+
+
+def vendor_scope(vendor_id):
+    return f"vendor:{vendor_id}"
+
+
+def category_scope(category_id):
+    return f"category:{category_id}"
+
+
+def location_scopes(city=None, state=None):
+    # Vendor lists filtered by ?city= / ?state= (case-insensitive) depend only
+    # on vendors in that place; values are hashed to keep cache keys safe.
+    scopes = []
+    for kind, value in (("city", city), ("state", state)):
+        if value:
+            digest = hashlib.md5(value.upper().encode("utf-8")).hexdigest()
+            scopes.append(f"{kind}:{digest}")
+    return scopes
+
+
+def _generation_key(scope):
+    return f"catalog_generation_{scope}"
+
+
+def _new_generation():
+    # Seeded from the clock so a counter that was evicted never comes back
+    # with a value an older cached response was stored under.
+    return time.time_ns()
+
+
+def get_generations(scopes):
+    keys = [_generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    generations = []
+    for key in keys:
+        generation = found.get(key)
+        if generation is None:
+            generation = _new_generation()
+            if not cache.add(key, generation, timeout=None):
+                generation = cache.get(key, generation)
+        generations.append(generation)
+    return generations
+
+
+def bump_generations(scopes):
+    for scope in set(scopes):
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _new_generation(), timeout=None)
+
+
+def invalidate_catalog(
+    vendor_ids=(), category_ids=(), vendors=False, categories=False, locations=()
+):
+    scopes = [CATALOG_SCOPE]
+    scopes += [vendor_scope(vendor_id) for vendor_id in vendor_ids if vendor_id]
+    scopes += [category_scope(category_id) for category_id in category_ids if category_id]
+    for city, state in locations:
+        scopes += location_scopes(city, state)
+    if vendors:
+        scopes.append(VENDORS_SCOPE)
+    if categories:
+        scopes.append(CATEGORIES_SCOPE)
+    # Bump after commit so a concurrent reader can't re-cache pre-commit rows
+    # under the new generation.
+    transaction.on_commit(lambda: bump_generations(scopes))
+
+
+def catalog_response_key(request, scopes):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    parts = [
+        request.build_absolute_uri(request.path),
+        query,
+        *(str(generation) for generation in get_generations(scopes)),
+    ]
+    digest = hashlib.md5("|".join(parts).encode("utf-8")).hexdigest()
+    return f"catalog_response_{digest}"
@@ -0,0 +1,50 @@
+from dataclasses import dataclass
+from types import MappingProxyType
+
+from food.catalog_cache import CATEGORIES_SCOPE, get_generations
+from food.models import Category
+
+
+@dataclass(frozen=True)
+class CategoryRow:
+    id: int
+    name: str
+    slug: str
+
+
+@dataclass(frozen=True)
+class CategorySnapshot:
+    version: int
+    categories: tuple
+    by_id: MappingProxyType
+    by_slug: MappingProxyType
+
+
+# Categories change rarely but are read on every catalog page, so each worker
+# keeps an immutable snapshot and reloads it when the shared CATEGORIES
+# generation moves (category_service bumps it on commit).
+_snapshot = None
+
+
+def _load_snapshot(version):
+    rows = tuple(
+        CategoryRow(*values)
+        for values in Category.objects.order_by("name").values_list("id", "name", "slug")
+    )
+    return CategorySnapshot(
+        version=version,
+        categories=rows,
+        by_id=MappingProxyType({row.id: row for row in rows}),
+        by_slug=MappingProxyType({row.slug: row for row in rows}),
+    )
+
+
+def get_category_snapshot():
+    global _snapshot
+    # The version is read before loading, so a write racing the load can only
+    # leave newer rows under an older version, which the next bump replaces.
+    version = get_generations([CATEGORIES_SCOPE])[0]
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        snapshot = _snapshot = _load_snapshot(version)
+    return snapshot
@@ -1,24 +1,59 @@
 import django_filters
-from food.models import Food, Order, Review
+from rest_framework import filters
+from rest_framework.settings import api_settings
+from food.models import Food, Order, Review, Vendor
+from food.search import restrict_search, search_foods
 
 class FoodFilter(django_filters.FilterSet):
     category = django_filters.NumberFilter(field_name="category__id")
     category_name = django_filters.CharFilter(field_name="category__name", lookup_expr="icontains")
     min_price = django_filters.NumberFilter(field_name="price", lookup_expr="gte")
     max_price = django_filters.NumberFilter(field_name="price", lookup_expr="lte")
+    city = django_filters.CharFilter(field_name="vendor__city", lookup_expr="iexact")
+    state = django_filters.CharFilter(field_name="vendor__state", lookup_expr="iexact")
 
     class Meta:
         model = Food
-        fields = ["category", "category_name", "min_price", "max_price"]
+        fields = ["category", "category_name", "min_price", "max_price", "city", "state"]
+
+
+class VendorFilter(django_filters.FilterSet):
+    # iexact compiles to UPPER(col) = UPPER(%s), matching vendor_live_location_idx
+    city = django_filters.CharFilter(field_name="city", lookup_expr="iexact")
+    state = django_filters.CharFilter(field_name="state", lookup_expr="iexact")
+
+    class Meta:
+        model = Vendor
+        fields = ["city", "state"]
+
+
+class FoodSearchFilter(filters.SearchFilter):
+    # Full-text ?search= over Food.search_document, ranked by relevance
+    # unless the client asked for an explicit ?ordering=. A view's
+    # search_fields, if set, narrow which parts of the document may match.
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, "").strip()
+        if not term:
+            return queryset
+
+        queryset = search_foods(queryset, term)
+        search_fields = getattr(view, "search_fields", None)
+        if search_fields:
+            queryset = restrict_search(queryset, term, search_fields)
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by("-search_rank", "id")
+        return queryset
 
 
 class OrderFilter(django_filters.FilterSet):
     status = django_filters.CharFilter(field_name="status", lookup_expr="iexact")
     payment_status = django_filters.CharFilter(field_name="payment_status", lookup_expr="iexact")
+    created_after = django_filters.IsoDateTimeFilter(field_name="created_at", lookup_expr="gte")
+    created_before = django_filters.IsoDateTimeFilter(field_name="created_at", lookup_expr="lt")
 
     class Meta:
         model = Order
-        fields = ["status", "payment_status"]
+        fields = ["status", "payment_status", "created_after", "created_before"]
 
 
 class ReviewFilter(django_filters.FilterSet):
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from food.services.archive_service import archive_orders
+
+
+class Command(BaseCommand):
+    help = "Move delivered and cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS into the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        archived = archive_orders(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} orders"))
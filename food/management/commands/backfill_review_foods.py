@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from food.services.review_service import backfill_review_foods
+
+
+class Command(BaseCommand):
+    help = "Create missing ReviewFood links for reviews written before the table existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = backfill_review_foods(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Created {created} review-food links"))
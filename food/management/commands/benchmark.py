@@ -0,0 +1,333 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, transaction
+from django.db.models.signals import post_save
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from food.models import Category, Food, Order, OrderItem, StockReservation, Vendor
+from food.pagination import FoodKeysetPagination
+from food.selectors import get_available_foods
+from food.serializers import FOOD_LIST_VALUES, FoodSerializer, serialize_food_rows
+from food.services import cart_service, order_service, order_versioning, reservation_service, stock_service
+from users.signals import send_welcome_on_register
+
+DEFAULT_FOODS = {
+    "pagination": 1_000_000,
+    "serializer": 10_000,
+    "conditional": 1_000,
+    "checkout": 1,
+    "reservations": 1,
+    "cart_contention": 1,
+}
+
+# Concurrent scenarios need rows other connections can see, so they seed
+# committed data and delete it afterwards instead of rolling back.
+COMMITTED_SCENARIOS = {"checkout", "cart_contention"}
+
+# Generation counters (and so list ETags) only persist on a real cache backend
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "food-benchmark",
+    }
+}
+
+
+def create_benchmark_user(username):
+    # fixture users aren't signups: no welcome email, and no task queue needed
+    post_save.disconnect(send_welcome_on_register, sender=User)
+    try:
+        return User.objects.create_user(username=username)
+    finally:
+        post_save.connect(send_welcome_on_register, sender=User)
+
+
+def seed_catalog(food_count, batch_size=5000):
+    suffix = uuid.uuid4().hex[:8]
+    user = create_benchmark_user(f"benchmark-{suffix}")
+    vendor = Vendor.objects.create(
+        user=user,
+        business_name=f"Benchmark Kitchen {suffix}",
+        address="1 Benchmark Street",
+        city="Lagos",
+        state="Lagos",
+        is_approved=True,
+    )
+    category = Category.objects.create(name=f"Benchmark {suffix}")
+    start = timezone.now() - timedelta(seconds=food_count)
+
+    for offset in range(0, food_count, batch_size):
+        Food.objects.bulk_create([
+            Food(
+                vendor=vendor,
+                category=category,
+                name=f"Benchmark food {i}",
+                slug=f"benchmark-{suffix}-{i}",
+                price=Decimal(100 + i % 5000),
+                image=f"foods/benchmark-{i}.jpg",
+                stock=100,
+                created_at=start + timedelta(seconds=i),
+            )
+            for i in range(offset, min(offset + batch_size, food_count))
+        ])
+    return vendor, category
+
+
+def median_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+class Command(BaseCommand):
+    help = "Run a catalog benchmark against a throwaway seeded dataset (rolled back afterwards)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=list(DEFAULT_FOODS))
+        parser.add_argument("--foods", type=int)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--pages", default="1,10,100,500")
+        parser.add_argument("--orders", type=int, default=200)
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--reservations", type=int, default=10_000)
+        parser.add_argument("--adds", type=int, default=25, help="cart adds per worker")
+        parser.add_argument("--shards", default="0", help="checkout: stock shard counts to compare, 0 = unsharded")
+
+    def handle(self, *args, **options):
+        options["foods"] = options["foods"] or DEFAULT_FOODS[options["scenario"]]
+        if options["scenario"] in COMMITTED_SCENARIOS:
+            return getattr(self, f"run_{options['scenario']}")(options)
+
+        with transaction.atomic():
+            self.stdout.write(f"Seeding {options['foods']} foods...")
+            self.vendor, self.category = seed_catalog(options["foods"])
+            getattr(self, f"run_{options['scenario']}")(options)
+            transaction.set_rollback(True)
+
+    def run_pagination(self, options):
+        factory = APIRequestFactory()
+        paginator = FoodKeysetPagination()
+        page_size = paginator.page_size
+        queryset = get_available_foods().order_by("-created_at")
+        ordered = get_available_foods().order_by("-created_at", "-id")
+
+        def paginate(params):
+            request = Request(factory.get("/api/menu/", params))
+            return lambda: paginator.paginate_queryset(queryset, request)
+
+        self.stdout.write(f"{'page':>6} {'page mode ms':>14} {'cursor mode ms':>16}")
+        for page in [int(p) for p in options["pages"].split(",")]:
+            offset_params = {"page": page}
+            cursor_params = {"pagination": "cursor"}
+            if page > 1:
+                boundary = ordered[(page - 1) * page_size - 1]
+                cursor_params["cursor"] = paginator.encode_cursor(
+                    (boundary.created_at, boundary.id)
+                )
+
+            page_ms = median_ms(paginate(offset_params), options["repeat"])
+            cursor_ms = median_ms(paginate(cursor_params), options["repeat"])
+            self.stdout.write(f"{page:>6} {page_ms:>14.2f} {cursor_ms:>16.2f}")
+
+    def run_serializer(self, options):
+        request = Request(APIRequestFactory().get("/api/menu/", HTTP_HOST="localhost"))
+        queryset = get_available_foods().order_by("-created_at")
+        rows = options["foods"]
+
+        def model_serializer():
+            FoodSerializer(queryset, many=True, context={"request": request}).data
+
+        def values_serializer():
+            serialize_food_rows(queryset.values(*FOOD_LIST_VALUES), request)
+
+        self.stdout.write(f"{'serializer':>12} {'total ms':>10} {'us/row':>8} {'rows/s':>10}")
+        for label, fn in (("model", model_serializer), ("values", values_serializer)):
+            total_ms = median_ms(fn, options["repeat"])
+            self.stdout.write(
+                f"{label:>12} {total_ms:>10.1f} {total_ms * 1000 / rows:>8.1f} "
+                f"{rows / (total_ms / 1000):>10.0f}"
+            )
+
+    @override_settings(CACHES=LOCMEM_CACHES, RATELIMIT_ENABLE=False)
+    def run_conditional(self, options):
+        client = Client(HTTP_HOST="localhost")
+        food = Food.objects.filter(vendor=self.vendor).first()
+        urls = {
+            "menu": reverse("food:menu"),
+            "food": reverse("food:food-detail", args=[food.id]),
+            "vendor": reverse("food:vendor-detail", args=[self.vendor.slug]),
+        }
+
+        self.stdout.write(
+            f"{'endpoint':>10} {'200 bytes':>10} {'200 ms':>8} {'304 bytes':>10} {'304 ms':>8}"
+        )
+        for label, url in urls.items():
+            full = client.get(url)
+            etag = full["ETag"]
+            revalidated = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            full_ms = median_ms(lambda: client.get(url), options["repeat"])
+            revalidated_ms = median_ms(
+                lambda: client.get(url, HTTP_IF_NONE_MATCH=etag), options["repeat"]
+            )
+            self.stdout.write(
+                f"{label:>10} {len(full.content):>10} {full_ms:>8.2f} "
+                f"{len(revalidated.content):>10} {revalidated_ms:>8.2f}"
+            )
+
+    def run_checkout(self, options):
+        for shards in [int(n) for n in options["shards"].split(",")]:
+            self._run_checkout(options, shards)
+
+    def _run_checkout(self, options, shards):
+        # Every order buys one unit of the same food; stock covers half of
+        # them, so exactly that many checkouts may succeed.
+        orders, stock = options["orders"], options["orders"] // 2
+        vendor, category = seed_catalog(1)
+        Food.objects.filter(vendor=vendor).update(stock=stock)
+        food = Food.objects.get(vendor=vendor)
+        if shards:
+            stock_service.shard_food_stock(food, shards)
+        users = User.objects.bulk_create([
+            User(username=f"benchmark-buyer-{uuid.uuid4().hex[:12]}") for _ in range(orders)
+        ])
+        order_ids = []
+        for user in users:
+            order = Order.objects.create(user=user, vendor=vendor, address="1 Benchmark Street")
+            OrderItem.objects.create(order=order, food=food, quantity=1)
+            order_ids.append(order.id)
+
+        def checkout(order_id):
+            try:
+                order_service.finalize_order(Order.objects.get(id=order_id))
+                return "confirmed"
+            except ValidationError:
+                return "out of stock"
+            except DatabaseError:
+                return "error"
+            finally:
+                connection.close()
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+                outcomes = list(pool.map(checkout, order_ids))
+            elapsed = time.perf_counter() - started
+
+            food.refresh_from_db()
+            final_stock = stock_service.current_stock(food)
+            confirmed = outcomes.count("confirmed")
+            self.stdout.write(
+                f"{orders} checkouts, {options['workers']} workers, {shards} shards, stock {stock}: "
+                f"{elapsed * 1000:.0f} ms ({orders / elapsed:.0f} checkouts/s)"
+            )
+            self.stdout.write(
+                f"confirmed={confirmed} out_of_stock={outcomes.count('out of stock')} "
+                f"errors={outcomes.count('error')} final_stock={final_stock} "
+                f"oversold={max(confirmed - stock, 0) or final_stock < 0}"
+            )
+        finally:
+            Order.objects.filter(id__in=order_ids).delete()
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+            vendor.user.delete()
+            category.delete()
+
+    def run_reservations(self, options):
+        # Half the seeded reservations on the hot food are live and half have
+        # expired: reserving has to sum past the live ones, and the sweeper
+        # has to clear the rest.
+        count = options["reservations"]
+        food = Food.objects.filter(vendor=self.vendor).first()
+        Food.objects.filter(id=food.id).update(stock=count * 10)
+        users = User.objects.bulk_create([
+            User(username=f"benchmark-shopper-{uuid.uuid4().hex[:12]}") for _ in range(count + 1)
+        ])
+        now = timezone.now()
+        StockReservation.objects.bulk_create([
+            StockReservation(
+                user=user,
+                food=food,
+                quantity=1,
+                expires_at=now + timedelta(minutes=10 if i % 2 else -10),
+            )
+            for i, user in enumerate(users[:-1])
+        ], batch_size=5000)
+        shopper = users[-1]
+
+        reserve_ms = median_ms(
+            lambda: reservation_service.reserve_stock(shopper, food, 1), options["repeat"]
+        )
+        started = time.perf_counter()
+        released = reservation_service.release_expired_reservations()
+        sweep_ms = (time.perf_counter() - started) * 1000
+
+        self.stdout.write(f"{count} reservations on one food")
+        self.stdout.write(f"reserve: {reserve_ms:.2f} ms median")
+        self.stdout.write(
+            f"sweep: {released} expired released in {sweep_ms:.0f} ms, "
+            f"{StockReservation.objects.filter(food=food).count()} left"
+        )
+
+    def run_cart_contention(self, options):
+        # A double-tapping client: every worker adds the same food to the same
+        # cart. Latency includes any lock waits, conflicts and retry backoff.
+        adds = options["workers"] * options["adds"]
+        vendor, category = seed_catalog(1)
+        Food.objects.filter(vendor=vendor).update(stock=adds)
+        food = Food.objects.get(vendor=vendor)
+        user = create_benchmark_user(f"benchmark-shopper-{uuid.uuid4().hex[:12]}")
+        # count retries by wrapping the backoff every retry sleeps in
+        retries = []
+        real_backoff = order_versioning._backoff
+
+        def backoff(retry):
+            retries.append(retry)
+            real_backoff(retry)
+
+        def add(_):
+            started = time.perf_counter()
+            try:
+                cart_service.add_item_to_cart(user, food, 1)
+                outcome = "ok"
+            except (ValidationError, DatabaseError):
+                outcome = "error"
+            finally:
+                connection.close()
+            return (time.perf_counter() - started) * 1000, outcome
+
+        try:
+            order_versioning._backoff = backoff
+            with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+                results = list(pool.map(add, range(adds)))
+
+            latencies = sorted(ms for ms, _ in results)
+            order = Order.objects.get(user=user)
+            self.stdout.write(
+                f"{adds} adds, {options['workers']} workers: p50 {statistics.median(latencies):.1f} ms "
+                f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms max {latencies[-1]:.1f} ms"
+            )
+            self.stdout.write(
+                f"retries={len(retries)} errors={[o for _, o in results].count('error')} "
+                f"quantity={order.items.get().quantity} total={order.total}"
+            )
+        finally:
+            order_versioning._backoff = real_backoff
+            Order.objects.filter(user=user).delete()
+            reservation_service.release_stock(user, [food.id])
+            user.delete()
+            vendor.user.delete()
+            category.delete()
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from food.models import Order
+from food.services.cart_service import orders_with_drifted_totals, repair_order_totals
+
+
+class Command(BaseCommand):
+    help = "Verify Order.total against the sum of its items; --fix rewrites drifted totals."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--status", choices=[value for value, _ in Order.STATUS])
+        parser.add_argument("--fix", action="store_true")
+        parser.add_argument("--show", type=int, default=20, help="Drifted orders to list")
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        if options["status"]:
+            orders = orders.filter(status=options["status"])
+
+        drifted = orders_with_drifted_totals(orders).order_by("id")
+        count = drifted.count()
+        for order_id, total, expected in drifted.values_list("id", "total", "expected_total")[:options["show"]]:
+            self.stdout.write(f"Order {order_id}: total {total}, items sum to {expected}")
+
+        if not count:
+            self.stdout.write(self.style.SUCCESS("All order totals match their items"))
+            return
+
+        if options["fix"]:
+            with transaction.atomic():
+                fixed = repair_order_totals(drifted)
+            self.stdout.write(self.style.SUCCESS(f"Fixed {fixed} order totals"))
+        else:
+            self.stdout.write(self.style.WARNING(f"{count} orders have drifted totals"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from food.services.sla_service import rebuild_fulfilment_histograms
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-vendor fulfilment time histograms from order timestamps."
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            buckets = rebuild_fulfilment_histograms()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} fulfilment histogram buckets"))
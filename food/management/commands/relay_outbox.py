@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from food.services.outbox_service import (
+    parked_events,
+    purge_published_events,
+    redrive_parked_events,
+    relay_outbox,
+)
+
+
+class Command(BaseCommand):
+    help = "Publish committed outbox events (emails, cache invalidations) in batches; run one or more side by side."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to sleep when the outbox is drained")
+        parser.add_argument("--once", action="store_true", help="Drain the outbox and exit")
+        parser.add_argument(
+            "--redrive", action="store_true", help="Retry events parked after OUTBOX_MAX_ATTEMPTS, then exit"
+        )
+
+    def handle(self, *args, **options):
+        if options["redrive"]:
+            self.stdout.write(f"Re-drove {redrive_parked_events()} parked outbox events")
+            return
+
+        parked = 0
+        while True:
+            published = 0
+            while True:
+                # failed events back off before they are due again, so this
+                # ends once the due ones are relayed
+                relayed = relay_outbox(options["batch_size"])
+                published += relayed
+                if relayed < options["batch_size"]:
+                    break
+            purged = purge_published_events()
+            if published or purged:
+                self.stdout.write(f"Relayed {published} outbox events, purged {purged}")
+            parked, previously_parked = parked_events().count(), parked
+            if parked and parked != previously_parked:
+                self.stderr.write(f"{parked} outbox events are parked; re-drive them with --redrive")
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from food.services.review_service import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = "Recompute Food and Vendor rating_sum/rating_count from reviews."
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            vendors, foods = rebuild_rating_aggregates()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt rating aggregates for {vendors} vendors and {foods} foods")
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from food.catalog_cache import invalidate_catalog
+from food.models import Food
+from food.services.stock_service import shard_food_stock, unshard_food_stock
+
+
+class Command(BaseCommand):
+    help = "Split a hot food's stock across N counter rows for flash sales; --shards 0 merges it back."
+
+    def add_arguments(self, parser):
+        parser.add_argument("food_id", type=int)
+        parser.add_argument("--shards", type=int, default=8)
+
+    def handle(self, *args, **options):
+        try:
+            food = Food.objects.get(id=options["food_id"])
+        except Food.DoesNotExist:
+            raise CommandError(f"Food {options['food_id']} does not exist")
+        if options["shards"] < 0:
+            raise CommandError("--shards cannot be negative")
+
+        if options["shards"]:
+            stock = shard_food_stock(food, options["shards"])
+            message = f"{food.name}: {stock} in stock across {options['shards']} shards"
+        else:
+            stock = unshard_food_stock(food)
+            message = f"{food.name}: {stock} in stock, no longer sharded"
+        invalidate_catalog(vendor_ids=[food.vendor_id], category_ids=[food.category_id])
+        self.stdout.write(self.style.SUCCESS(message))
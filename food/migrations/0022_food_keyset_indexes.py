@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0021_alter_category_slug_alter_vendor_slug_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(condition=models.Q(('available', True)), fields=['created_at', 'id'], name='food_available_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(condition=models.Q(('available', True)), fields=['price', 'id'], name='food_available_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(condition=models.Q(('available', True)), fields=['name', 'id'], name='food_available_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(condition=models.Q(('available', True)), fields=['vendor', 'created_at', 'id'], name='food_vendor_created_idx'),
+        ),
+    ]
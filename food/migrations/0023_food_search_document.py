@@ -0,0 +1,40 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:03
+
+from django.db import migrations, models
+
+from food.search import build_search_document, install_search_index, remove_search_index
+
+
+def backfill_search_documents(apps, schema_editor):
+    Food = apps.get_model("food", "Food")
+    rows = Food.objects.values_list("id", "name", "category__name", "vendor__business_name")
+    foods = [
+        Food(id=food_id, search_document=build_search_document(*parts))
+        for food_id, *parts in rows
+    ]
+    Food.objects.bulk_update(foods, ["search_document"], batch_size=1000)
+
+
+def install_index(apps, schema_editor):
+    install_search_index(schema_editor)
+
+
+def remove_index(apps, schema_editor):
+    remove_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0022_food_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='food',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(install_index, remove_index),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:08
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Food = apps.get_model("food", "Food")
+    Vendor = apps.get_model("food", "Vendor")
+    Review = apps.get_model("food", "Review")
+
+    vendor_reviews = Review.objects.filter(vendor=OuterRef("pk")).order_by().values("vendor")
+    Vendor.objects.update(
+        rating_sum=Coalesce(Subquery(vendor_reviews.annotate(total=Sum("rating")).values("total")), 0),
+        rating_count=Coalesce(Subquery(vendor_reviews.annotate(total=Count("id")).values("total")), 0),
+    )
+    food_reviews = Review.objects.filter(
+        order__items__food=OuterRef("pk")
+    ).order_by().values("order__items__food")
+    Food.objects.update(
+        rating_sum=Coalesce(Subquery(food_reviews.annotate(total=Sum("rating")).values("total")), 0),
+        rating_count=Coalesce(Subquery(food_reviews.annotate(total=Count("id")).values("total")), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0023_food_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='food',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='food',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_review_food_links(apps, schema_editor):
+    OrderItem = apps.get_model("food", "OrderItem")
+    ReviewFood = apps.get_model("food", "ReviewFood")
+
+    rows = OrderItem.objects.filter(
+        order__review__isnull=False
+    ).values_list("order__review__id", "food_id", "order__review__created_at").distinct()
+    ReviewFood.objects.bulk_create(
+        [
+            ReviewFood(review_id=review_id, food_id=food_id, created_at=created_at)
+            for review_id, food_id, created_at in rows
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0024_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewFood',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('food', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_links', to='food.food')),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='food_links', to='food.review')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['food', '-created_at'], name='reviewfood_food_created_idx')],
+                'constraints': [models.UniqueConstraint(fields=('review', 'food'), name='unique_review_food')],
+            },
+        ),
+        migrations.RunPython(backfill_review_food_links, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:15
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0025_review_food'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vendor',
+            index=models.Index(django.db.models.functions.text.Upper('state'), django.db.models.functions.text.Upper('city'), condition=models.Q(('is_active', True), ('is_approved', True)), name='vendor_live_location_idx'),
+        ),
+    ]
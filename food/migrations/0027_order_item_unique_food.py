@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:19
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_items(apps, schema_editor):
+    OrderItem = apps.get_model("food", "OrderItem")
+    duplicates = (
+        OrderItem.objects.values("order_id", "food_id")
+        .annotate(lines=Count("id"), keep_id=Min("id"), quantity=Sum("quantity"))
+        .filter(lines__gt=1)
+    )
+    for row in duplicates:
+        OrderItem.objects.filter(id=row["keep_id"]).update(quantity=row["quantity"])
+        OrderItem.objects.filter(
+            order_id=row["order_id"], food_id=row["food_id"]
+        ).exclude(id=row["keep_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0026_vendor_location_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='orderitem',
+            constraint=models.UniqueConstraint(fields=('order', 'food'), name='unique_order_item_food'),
+        ),
+    ]
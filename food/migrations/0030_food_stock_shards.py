@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0029_order_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='food',
+            name='stock_shard_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='FoodStockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('stock', models.PositiveIntegerField(default=0)),
+                ('food', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='food.food')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('food', 'shard'), name='unique_food_stock_shard')],
+            },
+        ),
+    ]
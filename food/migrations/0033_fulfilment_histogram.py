@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0032_order_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FulfilmentHistogram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('stage', models.CharField(max_length=20)),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fulfilment_histograms', to='food.vendor')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'day', 'stage', 'bucket'), name='unique_fulfilment_bucket')],
+            },
+        ),
+    ]
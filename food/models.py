@@ -1,13 +1,20 @@
 from django.db import models
 from django.db.models import Q, UniqueConstraint
-from django.db.models.functions import Lower
+from django.db.models.functions import Lower, Upper
 from django.contrib.auth.models import User
 from django.utils import timezone
 from food.utils import save_with_unique_slug
+from food.search import food_search_document
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
+def average_rating(rating_sum, rating_count):
+    if not rating_count:
+        return 0
+    return round(rating_sum / rating_count, 1)
+
+
 class Category(models.Model):
     name = models.CharField(max_length=70, db_index=True)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
@@ -36,6 +43,8 @@ class Vendor(models.Model):
     country = models.CharField(max_length=100, default="Nigeria")
     is_active = models.BooleanField(default=True)
     is_approved = models.BooleanField(default=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -45,6 +54,19 @@ class Vendor(models.Model):
                 Lower("business_name"), name="unique_business_name_ci"
             )
         ]
+        # Location discovery over live vendors (?state= / ?city=, case-insensitive)
+        indexes = [
+            models.Index(
+                Upper("state"),
+                Upper("city"),
+                condition=Q(is_approved=True, is_active=True),
+                name="vendor_live_location_idx",
+            ),
+        ]
+
+    @property
+    def average_rating(self):
+        return average_rating(self.rating_sum, self.rating_count)
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -64,8 +86,15 @@ class Food(models.Model):
     image = models.ImageField(upload_to="foods/", null=True, blank=True)
     available = models.BooleanField(default=True)
     stock = models.PositiveIntegerField(default=0)
+    # > 0: stock lives in that many FoodStockShard rows and the stock column
+    # above is a periodically refreshed snapshot of their sum
+    stock_shard_count = models.PositiveSmallIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+    # name + category + vendor, indexed by food.search (GIN on Postgres, FTS5 on SQLite)
+    search_document = models.TextField(blank=True, default="", editable=False)
 
     class Meta:
         constraints = [
@@ -75,10 +104,40 @@ class Food(models.Model):
                 name="unique_vendor_food_name_ci"
             )
         ]
+        # Keyset pagination seeks on (ordering field, id) over available foods
+        indexes = [
+            models.Index(
+                fields=["created_at", "id"],
+                condition=Q(available=True),
+                name="food_available_created_idx",
+            ),
+            models.Index(
+                fields=["price", "id"],
+                condition=Q(available=True),
+                name="food_available_price_idx",
+            ),
+            models.Index(
+                fields=["name", "id"],
+                condition=Q(available=True),
+                name="food_available_name_idx",
+            ),
+            models.Index(
+                fields=["vendor", "created_at", "id"],
+                condition=Q(available=True),
+                name="food_vendor_created_idx",
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         if self.stock == 0:
             self.available = False
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"name", "category", "vendor"} & set(update_fields):
+            self.search_document = food_search_document(self)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "search_document"}
+
         if not self.slug:
             return save_with_unique_slug(self, self.name)
         super().save(*args, **kwargs)
@@ -87,10 +146,30 @@ class Food(models.Model):
     #     ordering = ('category', 'name',)
     #     index_together = (('id', 'slug'), )
 
+    @property
+    def average_rating(self):
+        return average_rating(self.rating_sum, self.rating_count)
+
     def __str__(self):
         return self.name
 
 
+class FoodStockShard(models.Model):
+    # One of a hot food's stock counters: concurrent checkouts decrement
+    # different rows instead of all queueing on the food row.
+    food = models.ForeignKey(Food, on_delete=models.CASCADE, related_name="stock_shards")
+    shard = models.PositiveSmallIntegerField()
+    stock = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["food", "shard"], name="unique_food_stock_shard")
+        ]
+
+    def __str__(self):
+        return f"Food {self.food_id} shard {self.shard}: {self.stock}"
+
+
 class Order(models.Model):
     STATUS = [
         ("PENDING", "Pending"),
@@ -126,6 +205,8 @@ class Order(models.Model):
     delivered_at = models.DateTimeField(null=True, blank=True)
     payment_reference = models.CharField(max_length=100, blank=True)
     payment_status = models.CharField(max_length=10, choices=PAYMENT_STATUS, default="UNPAID")
+    # bumped by every cart, checkout and status write; see services/order_versioning.py
+    version = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"Order {self.id} - {self.user.username} - {self.status}"
@@ -146,6 +227,29 @@ class Order(models.Model):
         super().save(*args, **kwargs)
 
 
+class StockReservation(models.Model):
+    # Stock held by a shopper's cart line until it expires; the food's
+    # available stock is its stock minus the live reservations of others.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="stock_reservations")
+    food = models.ForeignKey(Food, on_delete=models.CASCADE, related_name="reservations")
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["user", "food"], name="unique_reservation_per_user_food")
+        ]
+        indexes = [
+            # live reservations for a food: a range scan from now onwards
+            models.Index(fields=["food", "expires_at"], name="reservation_food_expiry_idx"),
+            # the sweeper's expired-first scan
+            models.Index(fields=["expires_at"], name="reservation_expiry_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x Food {self.food_id} for User {self.user_id}"
+
+
 class OrderStatusHistory(models.Model):
     order = models.ForeignKey(Order, related_name="status_history", on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=Order.STATUS)
@@ -165,6 +269,12 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     price_at_purchase = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
 
+    class Meta:
+        # one line per food per order; also the conflict target for bulk cart upserts
+        constraints = [
+            UniqueConstraint(fields=["order", "food"], name="unique_order_item_food")
+        ]
+
     def __str__(self):
         return f"{self.quantity}x {self.food.name}"
     
@@ -180,6 +290,91 @@ class OrderItem(models.Model):
         super().save(*args, **kwargs)
 
 
+class FulfilmentHistogram(models.Model):
+    # Per-vendor, per-day duration histograms for each fulfilment stage,
+    # bumped by update_order_status as it records the stage's end timestamp.
+    # bucket indexes services/sla_service.py's BUCKET_BOUNDS; day is the UTC
+    # date the stage ended.
+    vendor = models.ForeignKey(Vendor, on_delete=models.CASCADE, related_name="fulfilment_histograms")
+    day = models.DateField()
+    stage = models.CharField(max_length=20)
+    bucket = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # also the index for a vendor's date-range read
+            UniqueConstraint(fields=["vendor", "day", "stage", "bucket"], name="unique_fulfilment_bucket")
+        ]
+
+    def __str__(self):
+        return f"Vendor {self.vendor_id} {self.stage} {self.day} bucket {self.bucket}: {self.count}"
+
+
+class ArchivedOrder(models.Model):
+    # Cold copy of a DELIVERED or CANCELLED order that archive_orders moved
+    # out of Order, keeping its id and fields so OrderSerializer renders it
+    # unchanged. Nothing writes to it afterwards.
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_orders")
+    vendor = models.ForeignKey(Vendor, on_delete=models.SET_NULL, related_name="archived_orders", null=True)
+    address = models.CharField(max_length=100, blank=True)
+    phone = models.CharField(max_length=15, blank=True)
+    status = models.CharField(max_length=20, choices=Order.STATUS)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    confirmed_at = models.DateTimeField(null=True, blank=True)
+    preparing_at = models.DateTimeField(null=True, blank=True)
+    ready_at = models.DateTimeField(null=True, blank=True)
+    out_for_delivery_at = models.DateTimeField(null=True, blank=True)
+    cancelled_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    payment_reference = models.CharField(max_length=100, blank=True)
+    payment_status = models.CharField(max_length=10, choices=Order.PAYMENT_STATUS)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="archivedorder_user_created_idx"),
+            models.Index(fields=["vendor", "-created_at"], name="archivedorder_vendor_idx"),
+        ]
+
+    def __str__(self):
+        return f"Archived order {self.id} - {self.status}"
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name="items")
+    food = models.ForeignKey(Food, on_delete=models.CASCADE, related_name="archived_items")
+    quantity = models.PositiveIntegerField()
+    price_at_purchase = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.quantity}x {self.food.name}"
+
+    @property
+    def subtotal(self):
+        if self.price_at_purchase is None:
+            return 0
+        return self.quantity * self.price_at_purchase
+
+
+class ArchivedOrderStatusHistory(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, related_name="status_history", on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=Order.STATUS)
+    changed_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["created_at"]
+
+    def __str__(self):
+        return f"Archived order {self.order_id} → {self.status}"
+
+
 class Review(models.Model):    
     order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name="review", null=True)
     vendor = models.ForeignKey(Vendor, on_delete=models.SET_NULL, related_name="reviews", null=True)
@@ -200,3 +395,50 @@ class Review(models.Model):
         order_id = self.order_id if self.order_id else "unknown"
         return f"Review by {self.user.username} for Order {order_id}" 
 
+
+class ReviewFood(models.Model):
+    # One row per (review, food in the reviewed order), so a food's reviews can
+    # be range-scanned newest first without joining through orders and items.
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name="food_links")
+    food = models.ForeignKey(Food, on_delete=models.CASCADE, related_name="review_links")
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["review", "food"], name="unique_review_food")
+        ]
+        indexes = [
+            models.Index(fields=["food", "-created_at"], name="reviewfood_food_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"Review {self.review_id} → Food {self.food_id}"
+
+
+
+class OutboxEvent(models.Model):
+    # A side effect (email, cache invalidation) written in the same
+    # transaction as the state change that caused it, so it commits or rolls
+    # back with it. The relay_outbox command publishes it after commit.
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # a failed event waits out an exponential backoff before it is retried
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # the relay's oldest-unpublished-first scan stays small however
+            # many published rows are waiting to be purged
+            models.Index(
+                fields=["id"],
+                condition=Q(published_at__isnull=True),
+                name="outbox_unpublished_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} event {self.id}"
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import logging
+
+import redis
+from redis import asyncio as aioredis
+from django.conf import settings
+from food.models import Order
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "vendor_orders_"
+
+# queued in place of a client's backlog when it falls too far behind or the
+# broker connection drops: the dashboard should refetch its order list
+RESYNC = object()
+
+
+# Vendor dashboards keep one server-sent events stream open instead of polling
+# the order list. Each ASGI worker has one OrderFeedHub: an open stream is an
+# asyncio.Queue registered here plus a suspended coroutine, and a single broker
+# subscription per process fans messages out to them, so thousands of idle
+# dashboards cost no threads and no extra broker connections.
+#
+# ORDER_FEED_BROKER = "redis" carries messages from the outbox relay to every
+# worker over pub/sub. "local" delivers them in-process only, which is enough
+# for tests and for a dev server that also runs the relay.
+
+class OrderFeedHub:
+    def __init__(self):
+        self._subscribers = {}
+        self._loop = None
+        self._reader = None
+
+    def subscriber_count(self, vendor_id=None):
+        if vendor_id is not None:
+            return len(self._subscribers.get(vendor_id, ()))
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def subscribe(self, vendor_id):
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=settings.ORDER_FEED_QUEUE_SIZE)
+        self._subscribers.setdefault(vendor_id, set()).add(queue)
+        if settings.ORDER_FEED_BROKER == "redis" and (self._reader is None or self._reader.done()):
+            self._reader = self._loop.create_task(self._read_redis())
+        return queue
+
+    def unsubscribe(self, vendor_id, queue):
+        queues = self._subscribers.get(vendor_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[vendor_id]
+
+    def dispatch(self, vendor_id, message):
+        # runs on the hub's loop; never blocks on a slow client
+        for queue in self._subscribers.get(vendor_id, ()):
+            _offer(queue, message)
+
+    def resync_all(self):
+        for queues in self._subscribers.values():
+            for queue in queues:
+                _offer(queue, RESYNC)
+
+    def publish_local(self, vendor_id, message):
+        # safe from any thread: the relay publishes from sync code
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self.dispatch, vendor_id, message)
+
+    async def _read_redis(self):
+        while self._subscribers:
+            try:
+                client = aioredis.Redis.from_url(settings.ORDER_FEED_REDIS_URL)
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                    async for message in pubsub.listen():
+                        if message["type"] != "pmessage":
+                            continue
+                        vendor_id = int(message["channel"].decode().removeprefix(CHANNEL_PREFIX))
+                        self.dispatch(vendor_id, json.loads(message["data"]))
+            except (redis.RedisError, OSError):
+                logger.exception("Order feed lost its broker subscription, reconnecting")
+                # anything published meanwhile is gone
+                self.resync_all()
+                await asyncio.sleep(1)
+
+
+def _offer(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESYNC)
+
+
+hub = OrderFeedHub()
+
+_redis_client = None
+
+
+def _publish(vendor_id, message):
+    global _redis_client
+    if settings.ORDER_FEED_BROKER == "redis":
+        if _redis_client is None:
+            _redis_client = redis.Redis.from_url(settings.ORDER_FEED_REDIS_URL)
+        _redis_client.publish(f"{CHANNEL_PREFIX}{vendor_id}", json.dumps(message))
+    else:
+        hub.publish_local(vendor_id, message)
+
+
+def order_summary(order):
+    return {
+        "id": order["id"],
+        "status": order["status"],
+        "payment_status": order["payment_status"],
+        "total": str(order["total"]),
+        "updated_at": order["updated_at"].isoformat(),
+    }
+
+
+def publish_order_changes(order_ids):
+    # one query for the whole batch, one message per vendor
+    by_vendor = {}
+    for order in Order.objects.filter(id__in=order_ids).order_by("id").values(
+        "id", "vendor_id", "status", "payment_status", "total", "updated_at"
+    ):
+        if order["vendor_id"] is not None:
+            by_vendor.setdefault(order["vendor_id"], []).append(order_summary(order))
+    for vendor_id, orders in by_vendor.items():
+        _publish(vendor_id, {"orders": orders})
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream(vendor_id):
+    queue = hub.subscribe(vendor_id)
+    try:
+        yield f"retry: {settings.ORDER_FEED_RETRY_MS}\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), settings.ORDER_FEED_HEARTBEAT)
+            except asyncio.TimeoutError:
+                # keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            if message is RESYNC:
+                yield _event("resync", {})
+            else:
+                yield _event("orders", message["orders"])
+    finally:
+        hub.unsubscribe(vendor_id, queue)
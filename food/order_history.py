@@ -0,0 +1,45 @@
+import heapq
+from itertools import islice
+from operator import itemgetter
+
+
+class MergedOrders:
+    # Live orders and archived ones, each a queryset in the same order, read
+    # as one sorted sequence that Django's Paginator can count and slice. A
+    # page at offset n merges at most n + page size (sort key, id) pairs from
+    # each table, then loads and prefetches only the page's own orders.
+
+    def __init__(self, *querysets):
+        self.querysets = querysets
+        self._field = (querysets[0].query.order_by or ["-created_at"])[0]
+        self._reverse = self._field.startswith("-")
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def _keys(self, source, stop):
+        keys = self.querysets[source].prefetch_related(None).values_list(self._field.lstrip("-"), "id")
+        return ((value, source, order_id) for value, order_id in keys[:stop])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        merged = heapq.merge(
+            *(self._keys(source, stop) for source in range(len(self.querysets))),
+            key=itemgetter(0),
+            reverse=self._reverse,
+        )
+        page = list(islice(merged, start, stop))
+
+        ids = {}
+        for _, source, order_id in page:
+            ids.setdefault(source, []).append(order_id)
+        orders = {source: self.querysets[source].in_bulk(source_ids) for source, source_ids in ids.items()}
+        return [orders[source][order_id] for _, source, order_id in page]
+
+    def __iter__(self):
+        return iter(self[:None])
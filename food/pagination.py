@@ -0,0 +1,120 @@
+import base64
+import binascii
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class FoodKeysetPagination(PageNumberPagination):
+    # Page numbers by default; `?pagination=cursor` (or any `?cursor=`) switches
+    # to keyset mode, which seeks on (ordering field, id) instead of COUNT + OFFSET,
+    # so deep pages cost the same as the first one.
+    mode_query_param = "pagination"
+    cursor_query_param = "cursor"
+    keyset_fields = {
+        "created_at": parse_datetime,
+        "price": Decimal,
+        "name": str,
+        "rating_count": int,
+    }
+    default_keyset_ordering = ("created_at", True)
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_keyset = self.wants_keyset(request)
+        if not self.use_keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        field, descending = self.get_keyset_ordering(queryset)
+        prefix = "-" if descending else ""
+        queryset = queryset.order_by(f"{prefix}{field}", f"{prefix}id")
+
+        position = self.decode_cursor(request, field)
+        if position is not None:
+            value, pk = position
+            lookup = "lt" if descending else "gt"
+            # The inclusive bound lets the planner range-scan the index;
+            # the OR only breaks ties on the boundary value.
+            queryset = queryset.filter(
+                Q(**{f"{field}__{lookup}e": value}),
+                Q(**{f"{field}__{lookup}": value}) | Q(**{f"id__{lookup}": pk}),
+            )
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_position = (
+            self.get_position(rows[-1], field) if self.has_next else None
+        )
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.use_keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            "next": self.get_next_cursor_link(),
+            "results": data,
+        })
+
+    def wants_keyset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or self.cursor_query_param in request.query_params
+        )
+
+    def get_keyset_ordering(self, queryset):
+        # An unordered list, or one only in the selector's id order, takes the
+        # default; any other ordering must be one the cursor can seek on.
+        ordering = queryset.query.order_by
+        if not ordering or ordering[0] == "id":
+            return self.default_keyset_ordering
+        field = ordering[0].lstrip("-") if isinstance(ordering[0], str) else None
+        if field in self.keyset_fields:
+            return field, ordering[0].startswith("-")
+        if field == "search_rank":
+            message = "Cursor pagination can't follow search relevance; pass an explicit ordering."
+        else:
+            message = "Cursor pagination can't order by this field."
+        raise ValidationError({"ordering": [
+            f"{message} Use one of: {', '.join(sorted(self.keyset_fields))}."
+        ]})
+
+    def get_position(self, row, field):
+        if isinstance(row, dict):
+            return row[field], row["id"]
+        return getattr(row, field), row.id
+
+    def encode_cursor(self, position):
+        value, pk = position
+        raw = json.dumps([str(value), pk]).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    def decode_cursor(self, request, field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw_value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            value = self.keyset_fields[field](raw_value)
+            pk = int(pk)
+        except (TypeError, ValueError, InvalidOperation, binascii.Error, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def get_next_cursor_link(self):
+        if self.next_position is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_position)
+        )
@@ -0,0 +1,166 @@
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_DOCUMENT_SOURCES = ("name", "category__name", "vendor__business_name")
+
+POSTGRES_SEARCH_INDEX = "food_food_search_gin"
+SQLITE_SEARCH_TABLE = "food_food_fts"
+
+POSTGRES_INSTALL_SQL = [
+    f"CREATE INDEX IF NOT EXISTS {POSTGRES_SEARCH_INDEX} ON food_food "
+    "USING GIN (to_tsvector('simple', search_document))",
+]
+POSTGRES_REMOVE_SQL = [f"DROP INDEX IF EXISTS {POSTGRES_SEARCH_INDEX}"]
+
+# External-content FTS5 table kept in sync with food_food.search_document by triggers.
+SQLITE_INSTALL_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_SEARCH_TABLE} USING fts5("
+    "search_document, content='food_food', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {SQLITE_SEARCH_TABLE}_ai AFTER INSERT ON food_food BEGIN "
+    f"INSERT INTO {SQLITE_SEARCH_TABLE}(rowid, search_document) "
+    "VALUES (new.id, new.search_document); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SQLITE_SEARCH_TABLE}_ad AFTER DELETE ON food_food BEGIN "
+    f"INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}, rowid, search_document) "
+    "VALUES ('delete', old.id, old.search_document); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SQLITE_SEARCH_TABLE}_au "
+    "AFTER UPDATE OF search_document ON food_food BEGIN "
+    f"INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}, rowid, search_document) "
+    "VALUES ('delete', old.id, old.search_document); "
+    f"INSERT INTO {SQLITE_SEARCH_TABLE}(rowid, search_document) "
+    "VALUES (new.id, new.search_document); END",
+    f"INSERT INTO {SQLITE_SEARCH_TABLE}({SQLITE_SEARCH_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_REMOVE_SQL = [
+    f"DROP TRIGGER IF EXISTS {SQLITE_SEARCH_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {SQLITE_SEARCH_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {SQLITE_SEARCH_TABLE}_au",
+    f"DROP TABLE IF EXISTS {SQLITE_SEARCH_TABLE}",
+]
+
+
+def build_search_document(*parts):
+    return " ".join(part.strip() for part in parts if part and part.strip())
+
+
+def food_search_document(food):
+    return build_search_document(
+        food.name,
+        food.category.name if food.category_id else None,
+        food.vendor.business_name if food.vendor_id else None,
+    )
+
+
+def refresh_search_documents(queryset, batch_size=1000):
+    from food.models import Food
+
+    rows = list(queryset.values_list("id", *SEARCH_DOCUMENT_SOURCES))
+    for start in range(0, len(rows), batch_size):
+        Food.objects.bulk_update(
+            [
+                Food(id=food_id, search_document=build_search_document(*parts))
+                for food_id, *parts in rows[start:start + batch_size]
+            ],
+            ["search_document"],
+        )
+
+
+def install_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {
+        "postgresql": POSTGRES_INSTALL_SQL,
+        "sqlite": SQLITE_INSTALL_SQL,
+    }.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def remove_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {
+        "postgresql": POSTGRES_REMOVE_SQL,
+        "sqlite": SQLITE_REMOVE_SQL,
+    }.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def ensure_sqlite_search_triggers(using="default"):
+    # SQLite migrations that rebuild food_food drop its triggers with the old table.
+    from django.db import connections
+
+    conn = connections[using]
+    if conn.vendor != "sqlite":
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+            [f"{SQLITE_SEARCH_TABLE}_%"],
+        )
+        if cursor.fetchone()[0] == 3:
+            return
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE name = 'food_food'"
+        )
+        if not cursor.fetchone()[0]:
+            return
+        for sql in SQLITE_INSTALL_SQL:
+            cursor.execute(sql)
+
+
+def _search_tokens(term):
+    return re.findall(r"\w+", term.lower())
+
+
+def search_foods(queryset, term):
+    tokens = _search_tokens(term)
+    if not tokens:
+        return queryset.none()
+
+    if connection.vendor == "postgresql":
+        query = " & ".join(f"{token}:*" for token in tokens)
+        matches = RawSQL(
+            "to_tsvector('simple', food_food.search_document) @@ to_tsquery('simple', %s)",
+            (query,),
+            output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            "ts_rank(to_tsvector('simple', food_food.search_document), to_tsquery('simple', %s))",
+            (query,),
+            output_field=FloatField(),
+        )
+        return queryset.filter(matches).annotate(search_rank=rank)
+
+    if connection.vendor == "sqlite":
+        query = " ".join(f'"{token}"*' for token in tokens)
+        matches = RawSQL(
+            f"food_food.id IN (SELECT rowid FROM {SQLITE_SEARCH_TABLE} "
+            f"WHERE {SQLITE_SEARCH_TABLE} MATCH %s)",
+            (query,),
+            output_field=BooleanField(),
+        )
+        # FTS5 rank is bm25, where lower is more relevant
+        rank = RawSQL(
+            f"(SELECT -rank FROM {SQLITE_SEARCH_TABLE} "
+            f"WHERE {SQLITE_SEARCH_TABLE} MATCH %s AND rowid = food_food.id)",
+            (query,),
+            output_field=FloatField(),
+        )
+        return queryset.filter(matches).annotate(search_rank=rank)
+
+    for token in tokens:
+        queryset = queryset.filter(search_document__icontains=token)
+    return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def restrict_search(queryset, term, fields):
+    # search_document also holds the vendor's name; this keeps only the
+    # matches where every word of the term is found in one of `fields`
+    for token in _search_tokens(term):
+        queryset = queryset.filter(reduce(or_, (Q(**{f"{field}__icontains": token}) for field in fields)))
+    return queryset
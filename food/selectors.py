@@ -1,13 +1,17 @@
-from food.models import Food, Order, Review, Vendor, Category
-from django.db.models import Avg, Count, Sum, Q
+from food.category_catalog import get_category_snapshot
+from food.models import ArchivedOrder, Food, Order, Review, Vendor, Category, average_rating
+from django.db.models import Count, Sum, Q
 from django.core.cache import cache
 
 
 def get_all_categories():
-    return Category.objects.all().order_by("name")
+    return get_category_snapshot().categories
 
 def get_category_by_slug(slug):
-    return Category.objects.get(slug=slug)
+    category = get_category_snapshot().by_slug.get(slug)
+    if category is None:
+        raise Category.DoesNotExist
+    return category
 
 def get_category_by_id(category_id):
     return Category.objects.get(id=category_id)
@@ -24,6 +28,9 @@ def get_food_by_id(food_id):
 def get_available_food_by_id(food_id):
     return Food.objects.select_related("vendor", "category").get(id=food_id, available=True)
 
+def get_foods_by_ids(food_ids):
+    return Food.objects.select_related("vendor", "category").filter(id__in=food_ids)
+
 def get_user_orders(user):
     return Order.objects.prefetch_related(
         "items__food"
@@ -34,21 +41,44 @@ def get_pending_order(user):
         "items__food"
     ).filter(user=user, status="PENDING").first()
 
+def get_pending_orders(user):
+    return Order.objects.prefetch_related(
+        "items__food"
+    ).filter(user=user, status="PENDING").order_by("created_at", "id")
+
 def get_order_by_id(order_id):
     return Order.objects.prefetch_related(
         "items__food"
     ).get(id=order_id)
 
+def get_orders_by_ids(order_ids):
+    return Order.objects.prefetch_related(
+        "items__food"
+    ).select_related("user", "vendor").filter(id__in=order_ids).order_by("vendor_id")
+
 def get_user_order_by_id(order_id, user):
     return Order.objects.prefetch_related(
         "items__food"
     ).get(id=order_id, user=user)
 
+def get_user_archived_orders(user):
+    return ArchivedOrder.objects.prefetch_related(
+        "items__food"
+    ).filter(user=user).order_by("-created_at")
+
+def get_user_archived_order_by_id(order_id, user):
+    return ArchivedOrder.objects.prefetch_related(
+        "items__food"
+    ).get(id=order_id, user=user)
+
 def get_order_by_id_for_email(order_id):
     return Order.objects.select_related(
         "user"
     ).get(id=order_id)
 
+def get_orders_for_email(order_ids):
+    return Order.objects.select_related("user").in_bulk(order_ids)
+
 def get_order_by_reference(reference, user):
     return Order.objects.select_related("user", "vendor").get(
         payment_reference=reference, 
@@ -63,24 +93,21 @@ def get_order_review(order):
 
 def get_food_reviews(food_id):
     return Review.objects.filter(
-            order__items__food__id=food_id
-        ).select_related("user", "vendor").order_by("-created_at")
+            food_links__food_id=food_id
+        ).select_related("user", "vendor").order_by("-food_links__created_at", "-id")
 
 def get_food_reviews_stats(food_id):
     cache_key = f"food_reviews_stats_{food_id}"
     stats = cache.get(cache_key)
 
     if stats is None:
-        result = Review.objects.filter(
-            order__items__food__id=food_id
-        ).aggregate(
-            average_rating=Avg("rating"),
-            total_reviews=Count("id")
-        )
+        rating_sum, rating_count = Food.objects.filter(
+            id=food_id
+        ).values_list("rating_sum", "rating_count").first() or (0, 0)
 
         stats = {
-            "average_rating": round(result["average_rating"] or 0, 1),
-            "total_reviews": result["total_reviews"] or 0
+            "average_rating": average_rating(rating_sum, rating_count),
+            "total_reviews": rating_count
         }
         cache.set(cache_key, stats, timeout=300)
     
@@ -117,6 +144,16 @@ def get_vendor_order_by_id(vendor, order_id):
         "items__food"
     ).select_related("user").get(id=order_id, vendor=vendor)
 
+def get_vendor_archived_orders(vendor):
+    return ArchivedOrder.objects.filter(vendor=vendor).prefetch_related(
+        "items__food"
+    ).select_related("user").order_by("-created_at")
+
+def get_vendor_archived_order_by_id(vendor, order_id):
+    return ArchivedOrder.objects.prefetch_related(
+        "items__food"
+    ).select_related("user").get(id=order_id, vendor=vendor)
+
 def get_vendor_reviews(vendor):
     return Review.objects.filter(
         vendor=vendor
@@ -127,15 +164,13 @@ def get_vendor_reviews_stats(vendor_id):
     stats = cache.get(cache_key)
 
     if stats is None:
-        result = Review.objects.filter(
-            vendor_id=vendor_id,
-        ).aggregate(
-            average_rating=Avg("rating"),
-            total_reviews=Count("id")
-        )
+        rating_sum, rating_count = Vendor.objects.filter(
+            id=vendor_id
+        ).values_list("rating_sum", "rating_count").first() or (0, 0)
+
         stats = {
-            "average_rating": round(result["average_rating"] or 0, 1),
-            "total_reviews": result["total_reviews"] or 0
+            "average_rating": average_rating(rating_sum, rating_count),
+            "total_reviews": rating_count
         }
         cache.set(cache_key, stats, timeout=300)
     
@@ -158,6 +193,16 @@ def get_vendor_dashboard_stats(vendor):
         cancelled_orders=Count("id", filter=Q(status="CANCELLED")),
         total_earnings=Sum("total", filter=Q(payment_status="PAID")),
     )
+    # all-time figures: archived orders are all delivered or cancelled
+    archived = ArchivedOrder.objects.filter(vendor=vendor).aggregate(
+        total_orders=Count("id"),
+        delivered_orders=Count("id", filter=Q(status="DELIVERED")),
+        cancelled_orders=Count("id", filter=Q(status="CANCELLED")),
+        total_earnings=Sum("total", filter=Q(payment_status="PAID")),
+    )
+    for key, value in archived.items():
+        if value:
+            stats[key] = (stats[key] or 0) + value
 
     result = {
         "total_orders": stats["total_orders"] or 0,
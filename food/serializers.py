@@ -1,6 +1,9 @@
+from django.core.files.storage import default_storage
+from django.utils.encoding import filepath_to_uri
 from rest_framework import serializers
-from food.models import Food, Order, OrderItem, Review, Category, Vendor
+from food.models import Food, Order, OrderItem, Review, Category, Vendor, average_rating
 from users.validators import validate_phone_format
+from food.services.cart_service import set_delivery_details
 from drf_spectacular.utils import extend_schema_field
 
 
@@ -43,6 +46,9 @@ class VendorRegistrationSerializer(serializers.ModelSerializer):
 
 
 class VendorProfileSerializer(serializers.ModelSerializer):
+    average_rating = serializers.FloatField(read_only=True)
+    total_reviews = serializers.IntegerField(source="rating_count", read_only=True)
+
     class Meta:
         model = Vendor
         fields = (
@@ -51,6 +57,8 @@ class VendorProfileSerializer(serializers.ModelSerializer):
             "description",
             "profile_photo",
             "slug",
+            "average_rating",
+            "total_reviews",
         )
 
 
@@ -125,6 +133,8 @@ class FoodSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     vendor = VendorProfileSerializer(read_only=True)
     image = serializers.SerializerMethodField()
+    average_rating = serializers.FloatField(read_only=True)
+    total_reviews = serializers.IntegerField(source="rating_count", read_only=True)
 
     class Meta:
         model = Food
@@ -138,7 +148,9 @@ class FoodSerializer(serializers.ModelSerializer):
             "image", 
             "category", 
             "available",
-            "stock"
+            "stock",
+            "average_rating",
+            "total_reviews",
         )
     
     @extend_schema_field(serializers.CharField(allow_null=True))
@@ -151,6 +163,90 @@ class FoodSerializer(serializers.ModelSerializer):
         return None
 
 
+FOOD_LIST_VALUES = (
+    "id",
+    "name",
+    "slug",
+    "price",
+    "description",
+    "image",
+    "available",
+    "stock",
+    "rating_sum",
+    "rating_count",
+    "created_at",
+    "vendor_id",
+    "vendor__business_name",
+    "vendor__description",
+    "vendor__profile_photo",
+    "vendor__slug",
+    "vendor__rating_sum",
+    "vendor__rating_count",
+    "category_id",
+    "category__name",
+    "category__slug",
+)
+
+
+def _media_url_builder(request):
+    # Resolve the absolute media prefix once instead of per row
+    base_url = default_storage.url("")
+    if request is not None:
+        base_url = request.build_absolute_uri(base_url)
+
+    # MEDIA_URL always ends with a slash, so joining is plain concatenation
+    def build(name):
+        if not name:
+            return None
+        return base_url + filepath_to_uri(name).lstrip("/")
+
+    return build
+
+
+def serialize_food_rows(rows, request=None):
+    """Read-only FoodSerializer(many=True) output built from .values(*FOOD_LIST_VALUES) rows."""
+    media_url = _media_url_builder(request)
+
+    data = []
+    for row in rows:
+        vendor = None
+        if row["vendor_id"] is not None:
+            vendor = {
+                "id": row["vendor_id"],
+                "business_name": row["vendor__business_name"],
+                "description": row["vendor__description"],
+                "profile_photo": media_url(row["vendor__profile_photo"]),
+                "slug": row["vendor__slug"],
+                "average_rating": float(
+                    average_rating(row["vendor__rating_sum"], row["vendor__rating_count"])
+                ),
+                "total_reviews": row["vendor__rating_count"],
+            }
+        category = None
+        if row["category_id"] is not None:
+            category = {
+                "id": row["category_id"],
+                "name": row["category__name"],
+                "slug": row["category__slug"],
+            }
+        data.append({
+            "id": row["id"],
+            "vendor": vendor,
+            "name": row["name"],
+            "slug": row["slug"],
+            # price is stored as DECIMAL(10, 2), matching FoodSerializer's output
+            "price": f"{row['price']:.2f}",
+            "description": row["description"],
+            "image": media_url(row["image"]),
+            "category": category,
+            "available": row["available"],
+            "stock": row["stock"],
+            "average_rating": float(average_rating(row["rating_sum"], row["rating_count"])),
+            "total_reviews": row["rating_count"],
+        })
+    return data
+
+
 class FoodWriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Food
@@ -221,11 +317,59 @@ class OrderSerializer(serializers.ModelSerializer):
         )
 
 
+class CartLineSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    food = serializers.IntegerField(source="food_id")
+    quantity = serializers.IntegerField()
+    price_at_purchase = serializers.DecimalField(max_digits=10, decimal_places=2)
+    subtotal = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+class CartChangeSerializer(serializers.Serializer):
+    # compact cart response: the line that changed, the new total and how
+    # many lines the cart now has (quantity 0 means the line was removed)
+    id = serializers.IntegerField(allow_null=True)
+    item = CartLineSerializer(source="changed_item")
+    total = serializers.DecimalField(max_digits=10, decimal_places=2)
+    item_count = serializers.IntegerField()
+
+
 class AddToCartSerializer(serializers.Serializer):
     food = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1, default=1)
 
+
+class BulkAddToCartSerializer(serializers.Serializer):
+    items = AddToCartSerializer(many=True, allow_empty=False, max_length=50)
+
+    def validate_items(self, items):
+        # repeated foods in one request are added together
+        quantities = {}
+        for item in items:
+            quantities[item["food"]] = quantities.get(item["food"], 0) + item["quantity"]
+        return quantities
+
    
+class OrderStatusMoveSerializer(serializers.Serializer):
+    order = serializers.IntegerField()
+    status = serializers.CharField()
+
+    def validate_status(self, value):
+        return value.strip().upper()
+
+
+class BulkOrderStatusSerializer(serializers.Serializer):
+    transitions = OrderStatusMoveSerializer(many=True, allow_empty=False, max_length=100)
+
+    def validate_transitions(self, transitions):
+        moves = {}
+        for move in transitions:
+            if move["order"] in moves:
+                raise serializers.ValidationError(f"Order {move['order']} appears more than once.")
+            moves[move["order"]] = move["status"]
+        return moves
+
+
 class OrderDeliveryDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -242,13 +386,15 @@ class OrderDeliveryDetailSerializer(serializers.ModelSerializer):
         return value
 
     
-    def update(self, instance, validated_data):
-        instance.address = validated_data.get("address", instance.address)
+    def delivery_details(self, instance):
+        # (address, phone) for checkout, falling back to what the order or the
+        # user's profile already has; nothing is saved
+        address = self.validated_data.get("address", instance.address)
 
-        if not instance.address:
+        if not address:
             raise serializers.ValidationError("Address is required")
 
-        phone = validated_data.get("phone")
+        phone = self.validated_data.get("phone")
         if not phone:
             if instance.phone:
                 phone = instance.phone
@@ -256,10 +402,10 @@ class OrderDeliveryDetailSerializer(serializers.ModelSerializer):
                 phone = instance.user.profile.phone
             else:
                 raise serializers.ValidationError("Phone number is required.")
-        
-        instance.phone = phone
-        instance.save(update_fields=["address", "phone"])
-        return instance
+        return address, phone
+
+    def update(self, instance, validated_data):
+        return set_delivery_details(instance, *self.delivery_details(instance))
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from food.models import (
+    ArchivedOrder,
+    ArchivedOrderItem,
+    ArchivedOrderStatusHistory,
+    Order,
+    OrderItem,
+    OrderStatusHistory,
+    Review,
+)
+
+ARCHIVED_STATUSES = ["DELIVERED", "CANCELLED"]
+
+ORDER_FIELDS = [field.attname for field in ArchivedOrder._meta.concrete_fields if field.name != "archived_at"]
+ITEM_FIELDS = [field.attname for field in ArchivedOrderItem._meta.concrete_fields]
+HISTORY_FIELDS = [field.attname for field in ArchivedOrderStatusHistory._meta.concrete_fields]
+
+
+def archive_horizon():
+    # orders created since then are never archived, so a date range that
+    # starts after it can be answered from Order alone
+    return timezone.now() - timedelta(days=settings.ORDER_ARCHIVE_AFTER_DAYS)
+
+
+def archivable_orders(cutoff=None):
+    # Reviewed orders stay live: Review.order cascades, so moving the row
+    # would take the review with it.
+    return Order.objects.filter(
+        status__in=ARCHIVED_STATUSES,
+        updated_at__lt=cutoff or archive_horizon(),
+    ).exclude(Exists(Review.objects.filter(order=OuterRef("pk"))))
+
+
+def archive_orders(chunk_size=500, cutoff=None):
+    # Moves old terminal orders with their items and history into the archive
+    # tables, one short transaction per chunk so the live table is never
+    # locked for long. SKIP LOCKED lets a second run, or a payment webhook
+    # holding one of the rows, go on without waiting.
+    archived = 0
+    while True:
+        with transaction.atomic():
+            order_ids = list(
+                archivable_orders(cutoff)
+                .select_for_update(skip_locked=True)
+                .order_by("id")
+                .values_list("id", flat=True)[:chunk_size]
+            )
+            if not order_ids:
+                return archived
+
+            ArchivedOrder.objects.bulk_create([
+                ArchivedOrder(**row)
+                for row in Order.objects.filter(id__in=order_ids).values(*ORDER_FIELDS)
+            ])
+            ArchivedOrderItem.objects.bulk_create([
+                ArchivedOrderItem(**row)
+                for row in OrderItem.objects.filter(order_id__in=order_ids).values(*ITEM_FIELDS)
+            ])
+            ArchivedOrderStatusHistory.objects.bulk_create([
+                ArchivedOrderStatusHistory(**row)
+                for row in OrderStatusHistory.objects.filter(order_id__in=order_ids).values(*HISTORY_FIELDS)
+            ])
+            OrderItem.objects.filter(order_id__in=order_ids).delete()
+            OrderStatusHistory.objects.filter(order_id__in=order_ids).delete()
+            Order.objects.filter(id__in=order_ids).delete()
+        archived += len(order_ids)
@@ -1,88 +1,225 @@
+from decimal import Decimal
+
 from food.models import Food, Order, OrderItem
-from django.db import transaction
-from django.db.models import F, Sum
+from food.selectors import get_pending_order, get_pending_orders
+from food.services import cart_store
+from food.services.order_versioning import (
+    StaleOrder,
+    create_pending_order,
+    delete_if_current,
+    retry_on_conflict,
+    save_if_current,
+)
+from food.services.reservation_service import reserve_stock, shrink_reservation
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+def get_cart(user):
+    if cart_store.is_enabled():
+        return cart_store.get_cart(user)
+    return get_pending_order(user)
+
+def get_carts(user):
+    # every pending cart, one per vendor, oldest first
+    if cart_store.is_enabled():
+        return cart_store.get_carts(user)
+    return list(get_pending_orders(user))
 
-@transaction.atomic
 def add_item_to_cart(user, food, quantity=1):    
+    if cart_store.is_enabled():
+        # reserve_stock locks the food row, which needs a transaction
+        with transaction.atomic():
+            return cart_store.add_item(user, food, quantity)
+
     if not food.available:
         raise ValidationError("Food is not available")
-    
-    food = Food.objects.select_for_update().get(id=food.id)
-    
-    if quantity > food.stock:
-        raise ValidationError("Not enough stock for this food item")
-    
-    order = (
-        Order.objects.select_for_update()
-        .filter(user=user, vendor=food.vendor, status="PENDING")
-        .first()
-    )
 
-    if not order:       
-        order = Order.objects.create(user=user, vendor=food.vendor, status="PENDING")
+    return retry_on_conflict(lambda retry: _add_item(user, food, quantity))
 
-    item, created = OrderItem.objects.select_for_update().get_or_create(
-        order=order, 
-        food=food,
-        defaults={"quantity": quantity, 'price_at_purchase': food.price}
-    )
-    
-    if not created:
-        item.quantity = F("quantity") + quantity
-        item.save()
-        item.refresh_from_db()
-    
-    update_order_total(order)   
+@transaction.atomic
+def _add_item(user, food, quantity):
+    order = Order.objects.filter(user=user, vendor_id=food.vendor_id, status="PENDING").first()
+    if not order:
+        order = create_pending_order(user, food.vendor_id)
+
+    # carts are small: one read gives both the line and the line count
+    lines = {line.food_id: line for line in order.items.all()}
+    item = lines.get(food.id)
+    if item:
+        item.quantity += quantity
+        item.save(update_fields=["quantity"])
+    else:
+        item = OrderItem(order=order, food=food, quantity=quantity, price_at_purchase=food.price)
+        _insert_line(item)
+
+    reserve_stock(user, food, item.quantity)
+    _apply_total_delta(order, quantity * (item.price_at_purchase or 0))
+    _record_change(order, item, len(lines) + (food.id not in lines))
     return order
 
+def _insert_line(item):
+    # another request added the same food first
+    try:
+        with transaction.atomic():
+            item.save()
+    except IntegrityError as exc:
+        raise StaleOrder(item.order_id) from exc
+
+def add_items_to_cart(user, quantities):
+    return retry_on_conflict(lambda retry: _add_items(user, quantities))
+
 @transaction.atomic
+def _add_items(user, quantities):
+    # quantities: {food_id: quantity}. All foods are locked in one id-ordered
+    # SELECT ... FOR UPDATE so concurrent bulk reservations can't deadlock.
+    foods = Food.objects.filter(id__in=quantities).order_by("id")
+    if not cart_store.is_enabled():
+        foods = foods.select_for_update()
+    foods = list(foods)
+    if len(foods) != len(quantities):
+        raise Food.DoesNotExist("Food not found")
+
+    for food in foods:
+        if not food.available:
+            raise ValidationError(f"{food.name} is not available")
+
+    if cart_store.is_enabled():
+        return cart_store.add_items(
+            user,
+            [(food, quantities[food.id]) for food in foods],
+            stock_message="Not enough stock for {food.name}",
+        )
+
+    foods_by_vendor = {}
+    for food in foods:
+        foods_by_vendor.setdefault(food.vendor_id, []).append(food)
+
+    orders = []
+    for vendor_id in sorted(foods_by_vendor):
+        order = Order.objects.filter(user=user, vendor_id=vendor_id, status="PENDING").first()
+        if not order:
+            order = create_pending_order(user, vendor_id)
+
+        # absolute quantities from this read: the version check at the end
+        # rolls them back if anyone else wrote the cart in the meantime
+        existing = {
+            food_id: (quantity, price)
+            for food_id, quantity, price in order.items.values_list("food_id", "quantity", "price_at_purchase")
+        }
+        lines = []
+        delta = 0
+        for food in foods_by_vendor[vendor_id]:
+            quantity, price = existing.get(food.id, (0, food.price))
+            reserve_stock(
+                user, food, quantity + quantities[food.id], f"Not enough stock for {food.name}"
+            )
+            lines.append(OrderItem(
+                order=order,
+                food=food,
+                quantity=quantity + quantities[food.id],
+                price_at_purchase=price,
+            ))
+            delta += quantities[food.id] * (price or 0)
+
+        OrderItem.objects.bulk_create(
+            lines,
+            update_conflicts=True,
+            unique_fields=["order", "food"],
+            update_fields=["quantity"],
+        )
+        _apply_total_delta(order, delta)
+        orders.append(order)
+    return orders
+
 def remove_item_from_cart(user, item_id, action):
-    try:
-        item = OrderItem.objects.select_related(
-            "food__vendor", "order"
-        ).get(id=item_id)
+    if cart_store.is_enabled():
+        return cart_store.remove_item(user, item_id, action)
 
-        item = OrderItem.objects.select_for_update().get(id=item.id)
+    return retry_on_conflict(lambda retry: _remove_item(user, item_id, action))
 
-        item.refresh_from_db()
-        food = Food.objects.select_related("vendor").get(id=item.food_id)
+@transaction.atomic
+def _remove_item(user, item_id, action):
+    try:
+        item = OrderItem.objects.select_related("order").get(id=item_id)
     except OrderItem.DoesNotExist:
         raise ValidationError("Item not found in Cart")
-    
-    order = Order.objects.select_for_update().filter(
-        user=user, 
-        vendor=food.vendor, 
-        status="PENDING").first()
-    
-    if not order:
-        raise ValidationError("Cart is empty")
-    
-    if item.order_id != order.id:
+
+    order = item.order
+    if order.user_id != user.id or order.status != "PENDING":
         raise ValidationError("Item does not belong to your cart")
 
+    line_id = item.id
+    price = item.price_at_purchase or 0
     if action == "decrease":
-        item.quantity = F("quantity") - 1
-        item.save()
-        item.refresh_from_db()
-
-        if item.quantity <= 0:
-            item.delete()
-            
+        item.quantity -= 1
+        delta = -price
     elif action == "delete":
-        item.delete()
-
+        delta = -item.quantity * price
+        item.quantity = 0
     else:
         raise ValidationError("Invalid action")
-    
-    if not order.items.exists():
-        order.delete()
+
+    if item.quantity > 0:
+        item.save(update_fields=["quantity"])
+    else:
+        item.delete()
+        item = OrderItem(id=line_id, food_id=item.food_id, quantity=0, price_at_purchase=price)
+    shrink_reservation(user, item.food_id, item.quantity)
+
+    remaining = order.items.count()
+    if not remaining:
+        delete_if_current(order)
         return None
     
-    update_order_total(order)
+    _apply_total_delta(order, delta)
+    _record_change(order, item, remaining)
     return order
 
-def update_order_total(order):
-    total = order.items.aggregate(total=Sum(F("quantity") * F("price_at_purchase")))["total"] or 0
-    order.total = total
-    order.save(update_fields=["total", "updated_at"])
+def set_delivery_details(order, address, phone):
+    def attempt(retry):
+        if retry:
+            order.version = Order.objects.values_list("version", flat=True).get(id=order.id)
+        save_if_current(order, address=address, phone=phone)
+
+    order.address, order.phone = address, phone
+    if order.pk:
+        retry_on_conflict(attempt)
+    else:
+        order.save(update_fields=["address", "phone"])
+    return order
+
+def _apply_total_delta(order, delta):
+    # Totals move by the changed line's amount instead of re-summing the cart;
+    # check_order_totals verifies them in bulk. This is also the version
+    # check that commits a cart write, so the in-memory total stays exact.
+    save_if_current(order, total=F("total") + delta)
+    order.total = Decimal(order.total) + delta
+
+def _record_change(order, item, item_count):
+    # what a compact cart response reports, straight from the write path
+    order.changed_item = item
+    order.item_count = item_count
+
+def _expected_total():
+    line_totals = OrderItem.objects.filter(
+        order=OuterRef("pk")
+    ).order_by().values("order").annotate(
+        total=Sum(F("quantity") * F("price_at_purchase"))
+    ).values("total")
+    return Coalesce(
+        Subquery(line_totals),
+        Value(0),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+def orders_with_drifted_totals(orders=None):
+    orders = Order.objects.all() if orders is None else orders
+    return orders.annotate(expected_total=_expected_total()).exclude(total=F("expected_total"))
+
+def repair_order_totals(orders):
+    return Order.objects.filter(
+        id__in=orders.values("id")
+    ).update(total=_expected_total(), updated_at=timezone.now())
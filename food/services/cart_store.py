@@ -0,0 +1,200 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from food.models import Food, Order, OrderItem, Vendor
+from food.services.reservation_service import release_stock, reserve_stock, shrink_reservation
+
+
+# Optional cart backend (CART_BACKEND = "cache"): pending carts live in the
+# shared cache as {vendor_id: {"items": {food_id: [quantity, price]}, ...}} per
+# user and only become Order/OrderItem rows when finalize_order materializes
+# them. Writes are last-writer-wins per user, which is fine for one shopper.
+
+def is_enabled():
+    return getattr(settings, "CART_BACKEND", "db") == "cache"
+
+
+def _cart_key(user_id):
+    return f"cart_{user_id}"
+
+
+def _load(user_id):
+    return cache.get(_cart_key(user_id)) or {}
+
+
+def _store(user_id, carts):
+    if carts:
+        cache.set(_cart_key(user_id), carts, timeout=settings.CART_TTL)
+    else:
+        cache.delete(_cart_key(user_id))
+
+
+class CachedCart:
+    # Stands in for a pending Order so OrderSerializer and
+    # OrderDeliveryDetailSerializer render and update it unchanged.
+    id = None
+    pk = None
+    status = "PENDING"
+    payment_status = "UNPAID"
+
+    def __init__(self, user, vendor, state, foods):
+        self.user = user
+        self.vendor = vendor
+        self.address = state["address"]
+        self.phone = state["phone"]
+        self.created_at = state["created_at"]
+        self.updated_at = state["updated_at"]
+        # item ids are food ids: a cart holds at most one line per food
+        self.items = [
+            OrderItem(id=food_id, food=foods[food_id], quantity=quantity, price_at_purchase=price)
+            for food_id, (quantity, price) in state["items"].items()
+            if food_id in foods
+        ]
+        self.total = sum((item.subtotal for item in self.items), 0)
+        self.changed_item = None
+
+    @property
+    def item_count(self):
+        return len(self.items)
+
+    def save(self, update_fields=None):
+        carts = _load(self.user.id)
+        state = carts.get(self.vendor.id)
+        if state is None:
+            raise ValidationError("Cart has expired")
+        state.update(address=self.address, phone=self.phone, updated_at=timezone.now())
+        _store(self.user.id, carts)
+
+
+def _new_state():
+    now = timezone.now()
+    return {"address": "", "phone": "", "created_at": now, "updated_at": now, "items": {}}
+
+
+def _build_cart(user, vendor_id, state):
+    foods = Food.objects.in_bulk(list(state["items"]))
+    vendor = Vendor.objects.filter(id=vendor_id).first()
+    return CachedCart(user, vendor, state, foods)
+
+
+def get_cart(user):
+    carts = _load(user.id)
+    if not carts:
+        return None
+    vendor_id = min(carts, key=lambda vendor_id: carts[vendor_id]["created_at"])
+    return _build_cart(user, vendor_id, carts[vendor_id])
+
+
+def get_carts(user):
+    carts = _load(user.id)
+    return [
+        _build_cart(user, vendor_id, carts[vendor_id])
+        for vendor_id in sorted(carts, key=lambda vendor_id: carts[vendor_id]["created_at"])
+    ]
+
+
+def add_item(user, food, quantity=1):
+    if not food.available:
+        raise ValidationError("Food is not available")
+
+    cart = add_items(user, [(food, quantity)])[0]
+    cart.changed_item = next(item for item in cart.items if item.food.id == food.id)
+    return cart
+
+
+def add_items(user, food_quantities, stock_message="Not enough stock for this food item"):
+    carts = _load(user.id)
+    vendor_ids = []
+    for food, quantity in food_quantities:
+        state = carts.setdefault(food.vendor_id, _new_state())
+        line = state["items"].get(food.id)
+        reserve_stock(user, food, (line[0] if line else 0) + quantity, stock_message.format(food=food))
+        if line:
+            line[0] += quantity
+        else:
+            state["items"][food.id] = [quantity, food.price]
+        state["updated_at"] = timezone.now()
+        if food.vendor_id not in vendor_ids:
+            vendor_ids.append(food.vendor_id)
+
+    _store(user.id, carts)
+    return [_build_cart(user, vendor_id, carts[vendor_id]) for vendor_id in vendor_ids]
+
+
+def remove_item(user, item_id, action):
+    carts = _load(user.id)
+    try:
+        food_id = int(item_id)
+    except (TypeError, ValueError):
+        raise ValidationError("Item not found in Cart")
+
+    vendor_id = next(
+        (vendor_id for vendor_id, state in carts.items() if food_id in state["items"]),
+        None,
+    )
+    if vendor_id is None:
+        raise ValidationError("Item not found in Cart")
+
+    items = carts[vendor_id]["items"]
+    price = items[food_id][1]
+    if action == "decrease":
+        items[food_id][0] -= 1
+        shrink_reservation(user, food_id, items[food_id][0])
+        if items[food_id][0] <= 0:
+            del items[food_id]
+    elif action == "delete":
+        del items[food_id]
+        release_stock(user, [food_id])
+    else:
+        raise ValidationError("Invalid action")
+
+    if not items:
+        del carts[vendor_id]
+        _store(user.id, carts)
+        return None
+
+    carts[vendor_id]["updated_at"] = timezone.now()
+    _store(user.id, carts)
+    cart = _build_cart(user, vendor_id, carts[vendor_id])
+    cart.changed_item = next(
+        (item for item in cart.items if item.food.id == food_id),
+        OrderItem(id=food_id, food_id=food_id, quantity=0, price_at_purchase=price),
+    )
+    return cart
+
+
+def discard_cart(cart):
+    release_stock(cart.user, [item.food.id for item in cart.items])
+    carts = _load(cart.user.id)
+    carts.pop(cart.vendor.id, None)
+    _store(cart.user.id, carts)
+
+
+def materialize_cart(cart):
+    # Called inside finalize_order's transaction: the cart is only dropped
+    # from the cache once the order rows are committed.
+    if not cart.items:
+        raise ValidationError("Cannot checkout an empty cart")
+
+    order = Order.objects.create(
+        user=cart.user,
+        vendor=cart.vendor,
+        address=cart.address,
+        phone=cart.phone,
+        total=cart.total,
+        status="PENDING",
+        created_at=cart.created_at,
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            food_id=item.food.id,
+            quantity=item.quantity,
+            price_at_purchase=item.price_at_purchase,
+        )
+        for item in cart.items
+    ])
+    transaction.on_commit(lambda: discard_cart(cart))
+    return order
@@ -0,0 +1,32 @@
+from django.db import transaction
+from food.models import Category, Food
+from food.search import refresh_search_documents
+from food.catalog_cache import invalidate_catalog
+
+
+@transaction.atomic
+def create_category(validated_data):
+    category = Category.objects.create(**validated_data)
+    invalidate_catalog(categories=True)
+    return category
+
+
+@transaction.atomic
+def update_category(category, validated_data):
+    previous_name = category.name
+    for field, value in validated_data.items():
+        setattr(category, field, value)
+    category.save()
+
+    if category.name != previous_name:
+        refresh_search_documents(Food.objects.filter(category=category))
+    invalidate_catalog(category_ids=[category.id], categories=True)
+    return category
+
+
+@transaction.atomic
+def delete_category(category):
+    food_ids = list(category.foods.values_list("id", flat=True))
+    invalidate_catalog(category_ids=[category.id], categories=True)
+    category.delete()
+    refresh_search_documents(Food.objects.filter(id__in=food_ids))
@@ -1,9 +1,16 @@
 from django.db import transaction
+from django.db.models import Case, Exists, F, OuterRef, PositiveIntegerField, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
-from food.models import Food, Order, OrderStatusHistory
-from food.tasks import send_order_status_email, send_payment_email
+from food.models import Food, Order, OrderItem, OrderStatusHistory, StockReservation
+from food.catalog_cache import invalidate_catalog
+from food.services.cart_store import CachedCart, discard_cart, materialize_cart
+from food.services.outbox_service import record_order_status_changes, record_payment_change
+from food.services.order_versioning import StaleOrder, bump_version, retry_on_conflict, save_if_current
+from food.services.reservation_service import live_reservations, release_stock
+from food.services.sla_service import TIMESTAMP_FIELDS, record_stage_durations, stage_durations
+from food.services.stock_service import return_sharded_stock, take_sharded_stock
 from django.core.exceptions import ValidationError
-from django.core.cache import cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,32 +27,48 @@ STATUS_TIMESTAMP_FIELDS = {
 }
 
 
-def _require_status(order, expected_status, message):
-    if order.status != expected_status:
+# target status -> (statuses it can be reached from, error otherwise)
+TRANSITION_RULES = {
+    "PREPARING": (("CONFIRMED",), "Order must be confirmed before preparing"),
+    "READY": (("PREPARING",), "Order must be preparing before ready"),
+    "OUT FOR DELIVERY": (("READY",), "Order must be ready before marking as out for delivery"),
+    "DELIVERED": (("OUT FOR DELIVERY",), "Order must be out for delivery"),
+    "CANCELLED": (
+        ("PENDING", "CONFIRMED"),
+        "Order is already being prepared or delivered and cannot be cancelled.",
+    ),
+}
+
+
+def _require_transition(order, new_status):
+    sources, message = TRANSITION_RULES[new_status]
+    if order.status not in sources:
         raise ValidationError(message)
 
 
 @transaction.atomic
-def update_order_status(order, new_status, changed_by=None):
+def update_order_status(order, new_status, changed_by=None, check_version=False):
     if order.status == new_status:
         raise ValidationError(f"Order is already {new_status}")
 
     if new_status not in STATUS_TIMESTAMP_FIELDS:
         raise ValidationError("Invalid order status")
     
-    order.status = new_status
+    changes = {"status": new_status}
     timestamp_field = STATUS_TIMESTAMP_FIELDS.get(new_status)
 
     if timestamp_field:
-        setattr(order, timestamp_field, timezone.now())
+        changes[timestamp_field] = timezone.now()
     else:
         logger.warning(f"No timestamp field for status {new_status}")
-    
-    update_fields = ["status", "updated_at"]
-    if timestamp_field:
-        update_fields.append(timestamp_field)
 
-    order.save(update_fields=update_fields)
+    # every status write moves the version, so in-flight cart writes see it
+    if check_version:
+        save_if_current(order, **changes)
+    else:
+        bump_version(order, **changes)
+    for field, value in changes.items():
+        setattr(order, field, value)
 
     if changed_by:
         OrderStatusHistory.objects.create(
@@ -54,72 +77,286 @@ def update_order_status(order, new_status, changed_by=None):
             changed_by=changed_by
         )
 
-    transaction.on_commit(lambda: send_order_status_email.delay(order.id, new_status))
-    transaction.on_commit(lambda: cache.delete(f"vendor_dashboard_stats_{order.vendor_id}"))
+    if timestamp_field:
+        record_stage_durations(stage_durations(
+            order.vendor_id, {field: getattr(order, field) for field in TIMESTAMP_FIELDS}, timestamp_field
+        ))
+
+    record_order_status_changes([(order.id, new_status)], [order.vendor_id])
 
     return order
 
 
-@transaction.atomic
+def _take_stock(user_id, items):
+    # One conditional UPDATE per food instead of lock, read, check and save:
+    # a zero row count is the shortfall, and raising rolls back the foods
+    # already taken. Id order keeps concurrent checkouts deadlock-free.
+    # Stock other shoppers still hold in live reservations is off limits.
+    held_by_others = Coalesce(
+        Subquery(
+            live_reservations(exclude_user=user_id)
+            .filter(food=OuterRef("pk"))
+            .order_by()
+            .values("food")
+            .annotate(total=Sum("quantity"))
+            .values("total")
+        ),
+        0,
+    )
+    quantities, names, shard_counts, category_ids = {}, {}, {}, set()
+    for food_id, quantity, name, category_id, shard_count in items:
+        quantities[food_id] = quantities.get(food_id, 0) + quantity
+        names[food_id] = name
+        shard_counts[food_id] = shard_count
+        category_ids.add(category_id)
+
+    now = timezone.now()
+    for food_id in sorted(quantities):
+        if shard_counts[food_id]:
+            # flash-sale foods: first to check out wins, holds aren't enforced
+            taken = take_sharded_stock(food_id, quantities[food_id], shard_counts[food_id])
+        else:
+            taken = Food.objects.filter(id=food_id, stock__gte=held_by_others + quantities[food_id]).update(
+                stock=F("stock") - quantities[food_id], updated_at=now
+            )
+        if not taken:
+            raise ValidationError(f"{names[food_id]} is out of stock")
+
+    # the stock is now taken for real
+    release_stock(user_id, list(quantities))
+    return category_ids
+
+
+def _reread_cart(order):
+    # a retry re-reads the cart, which a concurrent remove of its last item
+    # may have deleted in the meantime
+    try:
+        return Order.objects.get(id=order.id)
+    except Order.DoesNotExist:
+        raise ValidationError("Cannot checkout an empty cart")
+
+
 def finalize_order(order, user=None):
+    def attempt(retry):
+        return _finalize_order(_reread_cart(order) if retry else order, user)
+
+    return retry_on_conflict(attempt)
+
+
+@transaction.atomic
+def _finalize_order(order, user=None):
     if order.status != "PENDING":
         raise ValidationError("Only pending order can be finalized")
+
+    if isinstance(order, CachedCart):
+        order = materialize_cart(order)
     
     if not order.items.exists():
         raise ValidationError("Cannot checkout an empty cart")
-    
-    for item in order.items.select_related("food"):
-        food = Food.objects.select_for_update().get(id=item.food_id)
-        if food.stock < item.quantity:
-            raise ValidationError(f"{food.name} is out of stock")
-        food.stock -= item.quantity
-        food.save(update_fields=["stock", "updated_at"])
-        
-    return update_order_status(order, "CONFIRMED", changed_by=user)
+
+    category_ids = _take_stock(
+        order.user_id,
+        order.items.values_list(
+            "food_id", "quantity", "food__name", "food__category_id", "food__stock_shard_count"
+        ),
+    )
+
+    # menu pages show stock, so they go stale once it moves
+    invalidate_catalog(vendor_ids=[order.vendor_id], category_ids=category_ids)
+    # commits only if the cart is still the one whose items were read above
+    return update_order_status(order, "CONFIRMED", changed_by=user, check_version=True)
+
+
+def finalize_orders(orders, address, phone, user=None):
+    def attempt(retry):
+        current = [
+            _reread_cart(order) if retry and order.pk else order
+            for order in orders
+        ]
+        return _finalize_orders(current, address, phone, user)
+
+    return retry_on_conflict(attempt)
+
+
+@transaction.atomic
+def _finalize_orders(orders, address, phone, user=None):
+    # Checks out all of a user's carts at once: one UPDATE sets delivery
+    # details and status on every order, one pass takes stock across all
+    # foods, and emails and cache invalidations go out as one outbox batch.
+    if not orders:
+        raise ValidationError("Cannot checkout an empty cart")
+    if any(order.status != "PENDING" for order in orders):
+        raise ValidationError("Only pending order can be finalized")
+
+    orders = [
+        materialize_cart(order) if isinstance(order, CachedCart) else order
+        for order in orders
+    ]
+    order_ids = [order.id for order in orders]
+    items = list(
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values_list(
+            "order_id", "food_id", "quantity", "food__name", "food__category_id", "food__stock_shard_count"
+        )
+    )
+    if {item[0] for item in items} != set(order_ids):
+        raise ValidationError("Cannot checkout an empty cart")
+
+    now = timezone.now()
+    unchanged = Q()
+    for order in orders:
+        unchanged |= Q(id=order.id, version=order.version)
+    confirmed = Order.objects.filter(unchanged, status="PENDING").update(
+        address=address,
+        phone=phone,
+        status="CONFIRMED",
+        confirmed_at=now,
+        updated_at=now,
+        version=F("version") + 1,
+    )
+    # a concurrent cart write, checkout or cancel got to one of them first
+    if confirmed != len(order_ids):
+        raise StaleOrder(order_ids)
+
+    category_ids = _take_stock(orders[0].user_id, [item[1:] for item in items])
+
+    if user:
+        OrderStatusHistory.objects.bulk_create([
+            OrderStatusHistory(order_id=order_id, status="CONFIRMED", changed_by=user)
+            for order_id in order_ids
+        ])
+
+    for order in orders:
+        order.address, order.phone = address, phone
+        order.status, order.confirmed_at, order.updated_at = "CONFIRMED", now, now
+        order.version += 1
+
+    invalidate_catalog(vendor_ids=[order.vendor_id for order in orders], category_ids=category_ids)
+    record_order_status_changes(
+        [(order.id, "CONFIRMED") for order in orders], [order.vendor_id for order in orders]
+    )
+    return orders
 
 
 @transaction.atomic
 def mark_preparing(order, user=None):
-    _require_status(order, "CONFIRMED", "Order must be confirmed before preparing")
+    _require_transition(order, "PREPARING")
     
     return update_order_status(order, "PREPARING", changed_by=user)
 
 
 @transaction.atomic
 def mark_ready(order, user=None):
-    _require_status(order, "PREPARING", "Order must be preparing before ready")
+    _require_transition(order, "READY")
     
     return update_order_status(order, "READY", changed_by=user)
 
 
 @transaction.atomic
 def cancel_order(order, user=None):
-    if order.status not in ["PENDING", "CONFIRMED"]:
-        raise ValidationError("Order is already being prepared or delivered and cannot be cancelled.")
+    _require_transition(order, "CANCELLED")
+
+    if isinstance(order, CachedCart):
+        discard_cart(order)
+        return order
     
+    if order.status == "PENDING":
+        release_stock(order.user_id, order.items.values_list("food_id", flat=True))
+
     if order.status == "CONFIRMED":
-        for item in order.items.select_related("food"):
-            food = Food.objects.select_for_update().get(id=item.food_id)
-            item.food.stock += item.quantity
-            item.food.save(update_fields=["stock", "updated_at"])
+        category_ids = _restock(order.items.values_list(
+            "food_id", "quantity", "food__category_id", "food__stock_shard_count"
+        ))
+        invalidate_catalog(vendor_ids=[order.vendor_id], category_ids=category_ids)
 
     return update_order_status(order, "CANCELLED", changed_by=user)
 
 
+def _restock(items):
+    # items: (food_id, quantity, category_id, shard_count). The food rows are
+    # locked in id order, then restocked by one UPDATE ... CASE, so the query
+    # count doesn't grow with the number of lines.
+    quantities, shard_counts, category_ids = {}, {}, set()
+    for food_id, quantity, category_id, shard_count in items:
+        quantities[food_id] = quantities.get(food_id, 0) + quantity
+        shard_counts[food_id] = shard_count
+        category_ids.add(category_id)
+
+    plain = sorted(food_id for food_id in quantities if not shard_counts[food_id])
+    if plain:
+        foods = Food.objects.filter(id__in=plain)
+        list(foods.select_for_update().order_by("id").values_list("id", flat=True))
+        foods.update(
+            stock=F("stock") + Case(
+                *[When(id=food_id, then=Value(quantities[food_id])) for food_id in plain],
+                output_field=PositiveIntegerField(),
+            ),
+            updated_at=timezone.now(),
+        )
+
+    for food_id, shard_count in shard_counts.items():
+        if shard_count:
+            return_sharded_stock(food_id, quantities[food_id], shard_count)
+    return category_ids
+
+
 @transaction.atomic
-def mark_out_for_delivery(order, user=None):
-    _require_status(
-        order,
-        "READY",
-        "Order must be ready before marking as out for delivery",
+def cancel_orders(orders, user=None):
+    # Bulk cancel for admins, e.g. when a vendor closes unexpectedly. Orders
+    # that are past CONFIRMED are skipped. The query count stays the same for
+    # ten orders or a thousand.
+    cancellable = list(
+        orders.filter(status__in=TRANSITION_RULES["CANCELLED"][0])
+        .select_for_update()
+        .order_by("id")
+        .values_list("id", "status", "vendor_id")
+    )
+    if not cancellable:
+        return 0
+    order_ids = [order_id for order_id, _, _ in cancellable]
+    confirmed_ids = [order_id for order_id, status, _ in cancellable if status == "CONFIRMED"]
+    pending_ids = [order_id for order_id, status, _ in cancellable if status == "PENDING"]
+    vendor_ids = {vendor_id for _, _, vendor_id in cancellable}
+
+    category_ids = set()
+    if confirmed_ids:
+        category_ids = _restock(
+            OrderItem.objects.filter(order_id__in=confirmed_ids)
+            .values_list("food_id", "food__category_id", "food__stock_shard_count")
+            .annotate(total_quantity=Sum("quantity"))
+            .values_list("food_id", "total_quantity", "food__category_id", "food__stock_shard_count")
+        )
+    if pending_ids:
+        StockReservation.objects.filter(Exists(
+            OrderItem.objects.filter(
+                order_id__in=pending_ids, order__user=OuterRef("user"), food=OuterRef("food")
+            )
+        )).delete()
+
+    now = timezone.now()
+    Order.objects.filter(id__in=order_ids).update(
+        status="CANCELLED", cancelled_at=now, updated_at=now, version=F("version") + 1
     )
+    OrderStatusHistory.objects.bulk_create([
+        OrderStatusHistory(order_id=order_id, status="CANCELLED", changed_by=user)
+        for order_id in order_ids
+    ])
+
+    invalidate_catalog(vendor_ids=vendor_ids, category_ids=category_ids)
+    record_order_status_changes([(order_id, "CANCELLED") for order_id in order_ids], vendor_ids)
+    return len(order_ids)
+
+
+@transaction.atomic
+def mark_out_for_delivery(order, user=None):
+    _require_transition(order, "OUT FOR DELIVERY")
     
     return update_order_status(order, "OUT FOR DELIVERY", changed_by=user)
 
 
 @transaction.atomic
 def mark_delivered(order, user=None):
-    _require_status(order, "OUT FOR DELIVERY", "Order must be out for delivery")
+    _require_transition(order, "DELIVERED")
     
     return update_order_status(order, "DELIVERED", changed_by=user)
 
@@ -133,7 +370,7 @@ def update_payment_status(order, status):
     order.payment_status = status
     order.save(update_fields=["payment_status", "updated_at"])
 
-    transaction.on_commit(lambda: send_payment_email.delay(order.id, status))
+    record_payment_change(order.id, status)
 
 
 ADMIN_TRANSITION_MAP = {
@@ -151,3 +388,70 @@ VENDOR_TRANSITION_MAP = {
     "CANCELLED": cancel_order,
 }
 
+
+
+@transaction.atomic
+def bulk_update_order_status(moves, user, transition_map, vendor=None):
+    # moves: {order_id: target status}. Every move is checked in memory
+    # against the locked rows; the valid ones are applied with one UPDATE per
+    # target status. Returns {order_id: (status, error)} with one of them None.
+    orders = {
+        order["id"]: order
+        for order in Order.objects.filter(id__in=moves)
+        .select_for_update()
+        .order_by("id")
+        .values("id", "status", "vendor_id", *TIMESTAMP_FIELDS)
+    }
+
+    results, by_status = {}, {}
+    for order_id, new_status in moves.items():
+        order = orders.get(order_id)
+        if order is None:
+            error = "Order not found!"
+        elif vendor is not None and order["vendor_id"] != vendor.id:
+            error = "You can only update your own orders."
+        elif new_status not in transition_map:
+            error = f"'{new_status}' is not a valid transition."
+        elif order["status"] not in TRANSITION_RULES[new_status][0]:
+            error = TRANSITION_RULES[new_status][1]
+        else:
+            error = None
+            by_status.setdefault(new_status, []).append(order_id)
+        results[order_id] = (None, error) if error else (new_status, None)
+
+    # cancellations restock, so they take the bulk cancel path
+    cancelled = by_status.pop("CANCELLED", None)
+    if cancelled:
+        cancel_orders(Order.objects.filter(id__in=cancelled), user=user)
+
+    now = timezone.now()
+    for new_status, order_ids in by_status.items():
+        Order.objects.filter(id__in=order_ids).update(
+            status=new_status,
+            updated_at=now,
+            version=F("version") + 1,
+            **{STATUS_TIMESTAMP_FIELDS[new_status]: now},
+        )
+
+    changes = [
+        (order_id, new_status)
+        for new_status, order_ids in by_status.items()
+        for order_id in order_ids
+    ]
+    if changes:
+        OrderStatusHistory.objects.bulk_create([
+            OrderStatusHistory(order_id=order_id, status=new_status, changed_by=user)
+            for order_id, new_status in changes
+        ])
+        vendor_ids = {orders[order_id]["vendor_id"] for order_id, _ in changes}
+        record_stage_durations([
+            duration
+            for order_id, new_status in changes
+            for duration in stage_durations(
+                orders[order_id]["vendor_id"],
+                {**orders[order_id], STATUS_TIMESTAMP_FIELDS[new_status]: now},
+                STATUS_TIMESTAMP_FIELDS[new_status],
+            )
+        ])
+        record_order_status_changes(changes, vendor_ids)
+    return results
@@ -0,0 +1,67 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from food.models import Order
+
+
+# Pending orders are written with compare-and-swap on Order.version instead
+# of SELECT ... FOR UPDATE: a cart write reads without locking, makes its
+# changes and commits only if the version it read is still current. The
+# loser of a race rolls back and retry_on_conflict runs it again.
+
+class StaleOrder(Exception):
+    pass
+
+
+def save_if_current(order, **changes):
+    updated = Order.objects.filter(id=order.id, version=order.version).update(
+        version=F("version") + 1, updated_at=timezone.now(), **changes
+    )
+    if not updated:
+        raise StaleOrder(order.id)
+    order.version += 1
+
+
+def bump_version(order, **changes):
+    # unconditional write that still invalidates in-flight cart writes
+    Order.objects.filter(id=order.id).update(
+        version=F("version") + 1, updated_at=timezone.now(), **changes
+    )
+    order.version += 1
+
+
+def delete_if_current(order):
+    if not Order.objects.filter(id=order.id, version=order.version).delete()[0]:
+        raise StaleOrder(order.id)
+
+
+def create_pending_order(user, vendor_id):
+    # a concurrent request creating the same cart trips the
+    # one-pending-order-per-vendor constraint: that's a conflict, not an error
+    try:
+        with transaction.atomic():
+            return Order.objects.create(user=user, vendor_id=vendor_id, status="PENDING")
+    except IntegrityError as exc:
+        raise StaleOrder(None) from exc
+
+
+def retry_on_conflict(attempt):
+    # attempt(retry) must be atomic on its own, so a conflict leaves nothing behind
+    attempts = settings.ORDER_CAS_ATTEMPTS
+    for retry in range(attempts):
+        try:
+            return attempt(retry)
+        except StaleOrder:
+            if retry == attempts - 1:
+                raise ValidationError("Your cart was changed by another request, please try again")
+            _backoff(retry)
+
+
+def _backoff(retry):
+    # full jitter so retrying requests don't collide again in lockstep
+    time.sleep(random.uniform(0, settings.ORDER_CAS_BACKOFF * 2 ** retry))
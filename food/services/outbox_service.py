@@ -0,0 +1,150 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from food.models import OutboxEvent
+from food.order_feed import publish_order_changes
+from food.tasks import send_order_status_email, send_order_status_emails, send_payment_email
+
+logger = logging.getLogger(__name__)
+
+
+# Side effects of order writes go through the outbox instead of
+# transaction.on_commit: the event row commits atomically with the change, so
+# a crash between commit and publish can't lose an email or leave a dashboard
+# stale. relay_outbox publishes them at least once, so handlers must tolerate
+# the occasional repeat.
+
+ORDER_STATUS_EMAILS = "order_status_emails"
+PAYMENT_EMAIL = "payment_email"
+VENDOR_DASHBOARD_STATS = "vendor_dashboard_stats"
+VENDOR_ORDER_FEED = "vendor_order_feed"
+
+
+def record_order_status_changes(order_statuses, vendor_ids):
+    # order_statuses: [(order_id, status)]. One INSERT for all the events.
+    vendor_ids = sorted({vendor_id for vendor_id in vendor_ids if vendor_id is not None})
+    events = [
+        OutboxEvent(
+            kind=ORDER_STATUS_EMAILS,
+            payload={"changes": [[order_id, status] for order_id, status in order_statuses]},
+        ),
+        OutboxEvent(
+            kind=VENDOR_ORDER_FEED,
+            payload={"order_ids": [order_id for order_id, _ in order_statuses]},
+        ),
+    ]
+    if vendor_ids:
+        events.append(OutboxEvent(kind=VENDOR_DASHBOARD_STATS, payload={"vendor_ids": vendor_ids}))
+    OutboxEvent.objects.bulk_create(events)
+
+
+def record_payment_change(order_id, status):
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(kind=PAYMENT_EMAIL, payload={"order_id": order_id, "status": status}),
+        OutboxEvent(kind=VENDOR_ORDER_FEED, payload={"order_ids": [order_id]}),
+    ])
+
+
+def _publish_status_emails(payloads):
+    # every status change in the batch rides one grouped email job
+    changes = [change for payload in payloads for change in payload["changes"]]
+    if len(changes) == 1:
+        send_order_status_email.delay(*changes[0])
+    else:
+        send_order_status_emails.delay(changes)
+
+
+def _publish_payment_emails(payloads):
+    for payload in payloads:
+        send_payment_email.delay(payload["order_id"], payload["status"])
+
+
+def _publish_dashboard_invalidations(payloads):
+    vendor_ids = {vendor_id for payload in payloads for vendor_id in payload["vendor_ids"]}
+    cache.delete_many([f"vendor_dashboard_stats_{vendor_id}" for vendor_id in sorted(vendor_ids)])
+
+
+def _publish_order_feed(payloads):
+    # summaries are read at publish time, so a burst of changes to one order
+    # goes out once with its latest state
+    publish_order_changes(sorted({order_id for payload in payloads for order_id in payload["order_ids"]}))
+
+
+PUBLISHERS = {
+    ORDER_STATUS_EMAILS: _publish_status_emails,
+    PAYMENT_EMAIL: _publish_payment_emails,
+    VENDOR_DASHBOARD_STATS: _publish_dashboard_invalidations,
+    VENDOR_ORDER_FEED: _publish_order_feed,
+}
+
+
+def retry_delay(attempts):
+    # seconds before an event that has failed `attempts` times is tried again
+    return min(settings.OUTBOX_RETRY_BACKOFF * 2 ** (attempts - 1), settings.OUTBOX_RETRY_MAX_DELAY)
+
+
+def parked_events():
+    # events that used up OUTBOX_MAX_ATTEMPTS; they wait for redrive_parked_events
+    return OutboxEvent.objects.filter(published_at__isnull=True, attempts__gte=settings.OUTBOX_MAX_ATTEMPTS)
+
+
+@transaction.atomic
+def relay_outbox(batch_size=100):
+    # Claims the oldest due unpublished events with SKIP LOCKED, so several
+    # relays can drain the table side by side without waiting on each other
+    # or publishing the same event twice. Events of one kind are published
+    # together; a failing kind backs off exponentially and is retried, up to
+    # OUTBOX_MAX_ATTEMPTS, without holding back the others.
+    now = timezone.now()
+    events = list(
+        OutboxEvent.objects.select_for_update(skip_locked=True)
+        .filter(published_at__isnull=True, attempts__lt=settings.OUTBOX_MAX_ATTEMPTS)
+        .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now))
+        .order_by("id")[:batch_size]
+    )
+    if not events:
+        return 0
+
+    by_kind = {}
+    for event in events:
+        by_kind.setdefault(event.kind, []).append(event)
+
+    for kind, batch in by_kind.items():
+        try:
+            PUBLISHERS[kind]([event.payload for event in batch])
+        except Exception as exc:
+            logger.exception(f"Publishing {len(batch)} {kind} outbox events failed")
+            for event in batch:
+                event.attempts += 1
+                event.last_error = repr(exc)
+                event.next_attempt_at = now + timedelta(seconds=retry_delay(event.attempts))
+            parked = [event.id for event in batch if event.attempts >= settings.OUTBOX_MAX_ATTEMPTS]
+            if parked:
+                logger.error(
+                    f"Parked {len(parked)} {kind} outbox events after {settings.OUTBOX_MAX_ATTEMPTS} attempts: "
+                    f"{parked}; re-drive them with `manage.py relay_outbox --redrive`"
+                )
+        else:
+            for event in batch:
+                event.published_at = now
+
+    OutboxEvent.objects.bulk_update(events, ["published_at", "attempts", "next_attempt_at", "last_error"])
+    return len(events)
+
+
+def redrive_parked_events():
+    # gives parked events a fresh set of attempts, due now
+    return parked_events().update(attempts=0, next_attempt_at=None)
+
+
+def purge_published_events(older_than=None):
+    if older_than is None:
+        older_than = timedelta(seconds=settings.OUTBOX_RETENTION)
+    return OutboxEvent.objects.filter(
+        published_at__lt=timezone.now() - older_than
+    ).delete()[0]
@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Sum
+from django.utils import timezone
+from food.models import Food, StockReservation
+from food.services.stock_service import current_stock
+
+
+def _expiry():
+    return timezone.now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+
+
+def live_reservations(exclude_user=None):
+    reservations = StockReservation.objects.filter(expires_at__gt=timezone.now())
+    if exclude_user is not None:
+        reservations = reservations.exclude(user=exclude_user)
+    return reservations
+
+
+def reserved_quantities(food_ids, exclude_user=None):
+    rows = live_reservations(exclude_user).filter(
+        food_id__in=food_ids
+    ).order_by().values("food_id").annotate(total=Sum("quantity"))
+    return {row["food_id"]: row["total"] for row in rows}
+
+
+def get_available_stock(food, user=None):
+    held = reserved_quantities([food.id], exclude_user=user).get(food.id, 0)
+    return current_stock(food) - held
+
+
+def reserve_stock(user, food, quantity, message="Not enough stock for this food item"):
+    # quantity is the whole cart line, not the increment. Locking the food row
+    # serializes reservations for it, so two carts can't both take the last unit.
+    # Must run inside the caller's transaction. Sharded foods skip the lock to
+    # keep their hot row free: their holds are best effort and the shard
+    # decrement at checkout is what stops overselling.
+    if not food.stock_shard_count:
+        food = Food.objects.select_for_update().get(id=food.id)
+    if quantity > get_available_stock(food, user):
+        raise ValidationError(message)
+
+    StockReservation.objects.update_or_create(
+        user=user,
+        food=food,
+        defaults={"quantity": quantity, "expires_at": _expiry()},
+    )
+
+
+def shrink_reservation(user, food_id, quantity):
+    if quantity <= 0:
+        return release_stock(user, [food_id])
+    StockReservation.objects.filter(user=user, food_id=food_id).update(
+        quantity=quantity, expires_at=_expiry()
+    )
+
+
+def release_stock(user, food_ids):
+    StockReservation.objects.filter(user=user, food_id__in=food_ids).delete()
+
+
+def release_expired_reservations(chunk_size=1000):
+    # Chunked by primary key so each DELETE stays short and never holds
+    # locks across the whole expired backlog.
+    released = 0
+    now = timezone.now()
+    while True:
+        ids = list(
+            StockReservation.objects.filter(expires_at__lte=now)
+            .order_by("expires_at")
+            .values_list("id", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return released
+        released += StockReservation.objects.filter(id__in=ids).delete()[0]
@@ -1,7 +1,11 @@
 from django.core.exceptions import ValidationError
 from django.core.cache import cache
 from django.db import IntegrityError, transaction
-from food.models import Review
+from django.db.models import Count, Exists, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from food.catalog_cache import invalidate_catalog
+from food.models import Food, OrderItem, Review, ReviewFood, Vendor
 
 
 def _food_reviews_stats_cache_key(food_id):
@@ -10,33 +14,51 @@ def _food_reviews_stats_cache_key(food_id):
 def _vendor_reviews_stats_cache_key(vendor_id):
     return f"vendor_reviews_stats_{vendor_id}"
 
-def _invalidate_review_stats_cache(order):
-    food_ids = set(order.items.values_list("food_id", flat=True).distinct())
-    cache_keys = [
-        _food_reviews_stats_cache_key(food_id)
-        for food_id in food_ids
+def _order_food_ids(order):
+    return [
+        food_id
+        for food_id in set(order.items.values_list("food_id", flat=True).distinct())
         if food_id is not None
     ]
+
+def _invalidate_review_stats_cache(order, food_ids):
+    cache_keys = [_food_reviews_stats_cache_key(food_id) for food_id in food_ids]
     if order.vendor_id:
         cache_keys.append(_vendor_reviews_stats_cache_key(order.vendor_id))
     if cache_keys:
         cache.delete_many(cache_keys)
 
+def _apply_rating_delta(vendor, food_ids, rating_delta, count_delta=0):
+    # updated_at moves with the aggregates so conditional GETs see the change
+    changes = {"rating_sum": F("rating_sum") + rating_delta, "updated_at": timezone.now()}
+    if count_delta:
+        changes["rating_count"] = F("rating_count") + count_delta
+
+    if food_ids:
+        Food.objects.filter(id__in=food_ids).update(**changes)
+    if vendor:
+        Vendor.objects.filter(id=vendor.id).update(**changes)
+        invalidate_catalog(
+            vendor_ids=[vendor.id], vendors=True, locations=[(vendor.city, vendor.state)]
+        )
+    else:
+        invalidate_catalog()
+
 @transaction.atomic
 def create_review(order, user, validated_data):
     if order.user != user:
         raise ValidationError("You can only review your own orders")
-    
+
     if order.status != "DELIVERED":
         raise ValidationError("You can only review delivered orders")
-    
+
     if Review.objects.filter(order_id=order.id).exists():
         raise ValidationError("You have already reviewed this order")
-    
+
     data = dict(validated_data)
     data.pop("vendor", None)
     data.pop("order", None)
-    
+
     review = Review(
         order=order,
         user=user,
@@ -49,8 +71,59 @@ def create_review(order, user, validated_data):
     except IntegrityError as exc:
         raise ValidationError("You have already reviewed this order") from exc
 
-    _invalidate_review_stats_cache(order)
-    
+    food_ids = _order_food_ids(order)
+    ReviewFood.objects.bulk_create([
+        ReviewFood(review=review, food_id=food_id, created_at=review.created_at)
+        for food_id in food_ids
+    ])
+    _apply_rating_delta(review.vendor, food_ids, review.rating, count_delta=1)
+    _invalidate_review_stats_cache(order, food_ids)
+
+    return review
+
+
+@transaction.atomic
+def update_review(review, validated_data):
+    # of=self: order is nullable, and Postgres can't lock the nullable side
+    # of the outer join select_related adds
+    review = Review.objects.select_for_update(of=("self",)).select_related("order").get(id=review.id)
+    previous_rating = review.rating
+
+    for field, value in validated_data.items():
+        setattr(review, field, value)
+    review.save()
+
+    food_ids = _order_food_ids(review.order)
+    if review.rating != previous_rating:
+        _apply_rating_delta(review.vendor, food_ids, review.rating - previous_rating)
+    _invalidate_review_stats_cache(review.order, food_ids)
+
     return review
 
 
+def rebuild_rating_aggregates():
+    vendor_reviews = Review.objects.filter(vendor=OuterRef("pk")).order_by().values("vendor")
+    vendors = Vendor.objects.update(
+        rating_sum=Coalesce(Subquery(vendor_reviews.annotate(total=Sum("rating")).values("total")), 0),
+        rating_count=Coalesce(Subquery(vendor_reviews.annotate(total=Count("id")).values("total")), 0),
+    )
+
+    food_reviews = ReviewFood.objects.filter(food=OuterRef("pk")).order_by().values("food")
+    foods = Food.objects.update(
+        rating_sum=Coalesce(Subquery(food_reviews.annotate(total=Sum("review__rating")).values("total")), 0),
+        rating_count=Coalesce(Subquery(food_reviews.annotate(total=Count("id")).values("total")), 0),
+    )
+    return vendors, foods
+
+
+def backfill_review_foods(batch_size=1000):
+    missing = OrderItem.objects.filter(order__review__isnull=False).exclude(
+        Exists(ReviewFood.objects.filter(review=OuterRef("order__review"), food=OuterRef("food")))
+    ).values_list("order__review__id", "food_id", "order__review__created_at").distinct()
+
+    links = [
+        ReviewFood(review_id=review_id, food_id=food_id, created_at=created_at)
+        for review_id, food_id, created_at in missing.iterator(chunk_size=batch_size)
+    ]
+    ReviewFood.objects.bulk_create(links, batch_size=batch_size, ignore_conflicts=True)
+    return len(links)
@@ -0,0 +1,128 @@
+from bisect import bisect_left
+from collections import Counter
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from food.models import ArchivedOrder, FulfilmentHistogram, Order
+
+
+# stage -> (timestamp it starts at, timestamp it ends at)
+STAGES = {
+    "acceptance": ("confirmed_at", "preparing_at"),
+    "prep": ("preparing_at", "ready_at"),
+    "pickup": ("ready_at", "out_for_delivery_at"),
+    "delivery": ("out_for_delivery_at", "delivered_at"),
+}
+STAGE_ENDING_AT = {ended: (stage, started) for stage, (started, ended) in STAGES.items()}
+TIMESTAMP_FIELDS = ["confirmed_at", "preparing_at", "ready_at", "out_for_delivery_at", "delivered_at"]
+
+# Bucket upper bounds in seconds, roughly 25% apart so a percentile read off
+# the histogram is within a bucket's width of the true one. The last bucket,
+# len(BUCKET_BOUNDS), holds everything slower.
+BUCKET_BOUNDS = [
+    60, 120, 180, 240, 300, 420, 600, 780, 900, 1200,
+    1500, 1800, 2400, 3000, 3600, 4500, 5400, 7200, 10800, 14400,
+]
+
+
+def bucket_for(seconds):
+    return bisect_left(BUCKET_BOUNDS, seconds)
+
+
+def stage_durations(vendor_id, timestamps, ended_field):
+    # the (vendor, stage, day, bucket) that setting ended_field finishes, if any
+    if vendor_id is None or ended_field not in STAGE_ENDING_AT:
+        return []
+    stage, started_field = STAGE_ENDING_AT[ended_field]
+    started, ended = timestamps.get(started_field), timestamps.get(ended_field)
+    if started is None or ended is None or ended < started:
+        return []
+    return [(vendor_id, stage, ended.date(), bucket_for((ended - started).total_seconds()))]
+
+
+def record_stage_durations(durations):
+    # Runs in the status change's transaction, one UPDATE per distinct bucket;
+    # a bucket's first hit of the day inserts the row instead. Buckets go in
+    # sorted order so concurrent bulk changes lock rows alike and can't deadlock.
+    for (vendor_id, stage, day, bucket), count in sorted(Counter(durations).items()):
+        rows = FulfilmentHistogram.objects.filter(vendor_id=vendor_id, day=day, stage=stage, bucket=bucket)
+        if rows.update(count=F("count") + count):
+            continue
+        try:
+            with transaction.atomic():
+                FulfilmentHistogram.objects.create(
+                    vendor_id=vendor_id, day=day, stage=stage, bucket=bucket, count=count
+                )
+        except IntegrityError:
+            # another status change created it first
+            rows.update(count=F("count") + count)
+
+
+def percentile(counts, fraction):
+    # linear interpolation inside the bucket the rank falls in
+    total = sum(counts)
+    if not total:
+        return None
+    rank = fraction * total
+    seen = 0
+    for bucket, count in enumerate(counts):
+        if count and seen + count >= rank:
+            low = BUCKET_BOUNDS[bucket - 1] if bucket else 0
+            high = BUCKET_BOUNDS[bucket] if bucket < len(BUCKET_BOUNDS) else low
+            return round(low + (high - low) * (rank - seen) / count)
+        seen += count
+
+
+def fulfilment_times(vendor, days):
+    # p50/p90 seconds per stage over the last `days` days, from one range
+    # read of the vendor's rollup rows
+    since = timezone.now().date() - timedelta(days=days - 1)
+    counts = {stage: [0] * (len(BUCKET_BOUNDS) + 1) for stage in STAGES}
+    rows = (
+        FulfilmentHistogram.objects.filter(vendor=vendor, day__gte=since)
+        .values("stage", "bucket")
+        .annotate(total=Sum("count"))
+    )
+    for row in rows:
+        if row["stage"] in counts:
+            counts[row["stage"]][row["bucket"]] += row["total"]
+
+    return {
+        stage: {
+            "orders": sum(stage_counts),
+            "p50_seconds": percentile(stage_counts, 0.5),
+            "p90_seconds": percentile(stage_counts, 0.9),
+        }
+        for stage, stage_counts in counts.items()
+    }
+
+
+def rebuild_fulfilment_histograms(chunk_size=2000):
+    # Recomputes the rollup from order timestamps, live and archived, e.g.
+    # to backfill orders that predate it. Call inside a transaction.
+    if connection.vendor == "postgresql":
+        # Taken before the orders are read: a status change that already
+        # counted its duration commits first and is read below, any later one
+        # waits and counts on top of the rebuilt rows. SQLite serializes
+        # writers anyway.
+        with connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {FulfilmentHistogram._meta.db_table} IN EXCLUSIVE MODE")
+    durations = Counter()
+    for model in (Order, ArchivedOrder):
+        for row in model.objects.exclude(status="PENDING").values(
+            "vendor_id", *TIMESTAMP_FIELDS
+        ).iterator(chunk_size=chunk_size):
+            for ended_field in STAGE_ENDING_AT:
+                durations.update(stage_durations(row["vendor_id"], row, ended_field))
+
+    FulfilmentHistogram.objects.all().delete()
+    FulfilmentHistogram.objects.bulk_create(
+        [
+            FulfilmentHistogram(vendor_id=vendor_id, day=day, stage=stage, bucket=bucket, count=count)
+            for (vendor_id, stage, day, bucket), count in durations.items()
+        ],
+        batch_size=chunk_size,
+    )
+    return len(durations)
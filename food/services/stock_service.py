@@ -0,0 +1,120 @@
+import random
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.utils import timezone
+from food.catalog_cache import invalidate_catalog
+from food.models import Food, FoodStockShard
+
+
+# Opt-in sharded inventory for flash-sale foods. A sharded food's stock is
+# split across stock_shard_count FoodStockShard rows. Checkouts decrement a
+# randomly chosen shard, so they only collide when they pick the same one.
+# Food.stock becomes a snapshot of the shard sum that sync_sharded_stock
+# refreshes, keeping the hot food row out of the checkout path.
+
+def _split(stock, shards):
+    share, extra = divmod(stock, shards)
+    return [share + (1 if shard < extra else 0) for shard in range(shards)]
+
+
+@transaction.atomic
+def shard_food_stock(food, shards):
+    food = Food.objects.select_for_update().get(id=food.id)
+    stock = current_stock(food)
+    FoodStockShard.objects.filter(food=food).delete()
+    FoodStockShard.objects.bulk_create([
+        FoodStockShard(food=food, shard=shard, stock=share)
+        for shard, share in enumerate(_split(stock, shards))
+    ])
+    Food.objects.filter(id=food.id).update(
+        stock=stock, stock_shard_count=shards, updated_at=timezone.now()
+    )
+    return stock
+
+
+@transaction.atomic
+def unshard_food_stock(food):
+    food = Food.objects.select_for_update().get(id=food.id)
+    stock = current_stock(food)
+    FoodStockShard.objects.filter(food=food).delete()
+    Food.objects.filter(id=food.id).update(
+        stock=stock, stock_shard_count=0, updated_at=timezone.now()
+    )
+    return stock
+
+
+def current_stock(food):
+    if not food.stock_shard_count:
+        return food.stock
+    return FoodStockShard.objects.filter(food_id=food.id).aggregate(total=Sum("stock"))["total"] or 0
+
+
+@transaction.atomic
+def set_sharded_stock(food, stock):
+    # a vendor edit replaces the whole stock; spread it over the shards again
+    shards = list(FoodStockShard.objects.select_for_update().filter(food=food).order_by("shard"))
+    for shard, share in zip(shards, _split(stock, len(shards))):
+        shard.stock = share
+    FoodStockShard.objects.bulk_update(shards, ["stock"])
+
+
+def take_sharded_stock(food_id, quantity, shard_count):
+    # Fast path: one conditional UPDATE on a random shard row.
+    shards = FoodStockShard.objects.filter(food_id=food_id)
+    start = random.randrange(shard_count)
+    if shards.filter(shard=start, stock__gte=quantity).update(stock=F("stock") - quantity):
+        return True
+
+    # Fall back to the other shards that looked big enough in one unlocked
+    # read, so a sold-out food costs two queries rather than one per shard.
+    counts = dict(shards.values_list("shard", "stock"))
+    candidates = [shard for shard, stock in counts.items() if shard != start and stock >= quantity]
+    random.shuffle(candidates)
+    for shard in candidates:
+        if shards.filter(shard=shard, stock__gte=quantity).update(stock=F("stock") - quantity):
+            return True
+    if sum(counts.values()) < quantity:
+        return False
+
+    # No single shard covers the quantity: lock them all in shard order and
+    # drain them one after another.
+    locked = list(shards.select_for_update().order_by("shard"))
+    if sum(shard.stock for shard in locked) < quantity:
+        return False
+    for shard in locked:
+        take = min(shard.stock, quantity)
+        shard.stock -= take
+        quantity -= take
+    FoodStockShard.objects.bulk_update(locked, ["stock"])
+    return True
+
+
+def return_sharded_stock(food_id, quantity, shard_count):
+    FoodStockShard.objects.filter(
+        food_id=food_id, shard=random.randrange(shard_count)
+    ).update(stock=F("stock") + quantity)
+
+
+@transaction.atomic
+def sync_sharded_stock():
+    shard_totals = FoodStockShard.objects.filter(
+        food=OuterRef("pk")
+    ).order_by().values("food").annotate(total=Sum("stock")).values("total")
+    drifted = list(
+        Food.objects.filter(stock_shard_count__gt=0)
+        .exclude(stock=Subquery(shard_totals))
+        .values_list("id", "vendor_id", "category_id")
+    )
+    if not drifted:
+        return 0
+
+    synced = Food.objects.filter(id__in=[food_id for food_id, _, _ in drifted]).update(
+        stock=Subquery(shard_totals), updated_at=timezone.now()
+    )
+    # menu pages show stock, so only the vendors and categories it moved for go stale
+    invalidate_catalog(
+        vendor_ids=sorted({vendor_id for _, vendor_id, _ in drifted}),
+        category_ids=sorted({category_id for _, _, category_id in drifted}),
+    )
+    return synced
@@ -1,6 +1,9 @@
 from food.models import Vendor, Food, OrderItem
 from django.db import transaction, IntegrityError
 from django.core.exceptions import ValidationError
+from food.search import refresh_search_documents
+from food.catalog_cache import invalidate_catalog
+from food.services.stock_service import set_sharded_stock
 import logging
 
 logger = logging.getLogger(__name__)
@@ -64,7 +67,9 @@ def register_vendor(user, validated_data):
 
 @transaction.atomic
 def update_vendor_profile(vendor, validated_data):
-    return _apply_updates(
+    previous_name = vendor.business_name
+    previous_location = (vendor.city, vendor.state)
+    vendor = _apply_updates(
         vendor, 
         validated_data,
         allowed_fields=[
@@ -78,6 +83,14 @@ def update_vendor_profile(vendor, validated_data):
             "country"
         ]
     )
+    if vendor.business_name != previous_name:
+        refresh_search_documents(vendor.foods.all())
+    invalidate_catalog(
+        vendor_ids=[vendor.id],
+        vendors=True,
+        locations=[previous_location, (vendor.city, vendor.state)],
+    )
+    return vendor
 
 
 @transaction.atomic
@@ -87,6 +100,7 @@ def approve_vendor(vendor, approved_by=None):
     vendor.is_approved = True
     vendor.is_active = True
     result = _save_with_updated_at(vendor, update_fields=["is_approved", "is_active"])
+    invalidate_catalog(vendor_ids=[vendor.id], vendors=True, locations=[(vendor.city, vendor.state)])
     if approved_by:
         logger.info(f"Vendor '{vendor.business_name}' approved by user '{approved_by.username}'")
     return result
@@ -98,6 +112,7 @@ def reject_vendor(vendor, rejected_by=None):
         raise ValidationError("Cannot reject an already approved vendor.")
     vendor.is_active = False
     result = _save_with_updated_at(vendor, update_fields=["is_active"])
+    invalidate_catalog(vendor_ids=[vendor.id], vendors=True, locations=[(vendor.city, vendor.state)])
     if rejected_by:
         logger.info(f"Vendor '{vendor.business_name}' rejected by user '{rejected_by.username}'")
     return result
@@ -109,6 +124,7 @@ def deactivate_vendor(vendor, deactivated_by=None):
         raise ValidationError("Vendor is already deactivated.")
     vendor.is_active = False
     result = _save_with_updated_at(vendor, update_fields=["is_active"])
+    invalidate_catalog(vendor_ids=[vendor.id], vendors=True, locations=[(vendor.city, vendor.state)])
     if deactivated_by:
         logger.info(f"Vendor '{vendor.business_name}' deactivated by user '{deactivated_by.username}'")
     return result
@@ -122,6 +138,7 @@ def activate_vendor(vendor, activated_by=None):
         raise ValidationError("Vendor must be approved before activation.")
     vendor.is_active = True
     result = _save_with_updated_at(vendor, update_fields=["is_active"])
+    invalidate_catalog(vendor_ids=[vendor.id], vendors=True, locations=[(vendor.city, vendor.state)])
     if activated_by:
         logger.info(f"Vendor '{vendor.business_name}' activated by user '{activated_by.username}'")
     return result
@@ -130,18 +147,29 @@ def activate_vendor(vendor, activated_by=None):
 @transaction.atomic
 def create_vendor_food(vendor, validated_data):
     _ensure_vendor_can_manage_food(vendor)
-    return Food.objects.create(vendor=vendor, **validated_data)
+    food = Food.objects.create(vendor=vendor, **validated_data)
+    invalidate_catalog(vendor_ids=[vendor.id], category_ids=[food.category_id])
+    return food
 
 
 @transaction.atomic
 def update_vendor_food(food, user, validated_data):
     _ensure_food_vendor_can_manage(food)
-    return _apply_updates(food, validated_data)
+    previous_category_id = food.category_id
+    food = _apply_updates(food, validated_data)
+    if "stock" in validated_data and food.stock_shard_count:
+        set_sharded_stock(food, food.stock)
+    invalidate_catalog(
+        vendor_ids=[food.vendor_id],
+        category_ids=[previous_category_id, food.category_id],
+    )
+    return food
 
 
 @transaction.atomic
 def delete_vendor_food(food):
     _ensure_food_vendor_can_manage(food)
+    invalidate_catalog(vendor_ids=[food.vendor_id], category_ids=[food.category_id])
 
     active_orders = OrderItem.objects.filter(
         food=food, 
@@ -163,4 +191,5 @@ def toggle_vendor_food_availability(food):
     if not food.available and food.stock == 0:
         raise ValidationError("Cannot mark food available with zero stock.")
     food.available = not food.available
+    invalidate_catalog(vendor_ids=[food.vendor_id], category_ids=[food.category_id])
     return _save_with_updated_at(food, update_fields=["available"])
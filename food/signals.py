@@ -1,9 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_migrate
 from django.dispatch import receiver
-from .models import Order, OrderItem
+from .search import ensure_sqlite_search_triggers
 
-@receiver(post_save, sender=OrderItem)
-def update_total_order(sender, instance, **kwargs):
-    order = instance.order
-    order.total = sum(item.subtotal for item in order.items.all())
-    order.save(update_fields=["total"])
\ No newline at end of file
+
+@receiver(post_migrate)
+def ensure_food_search_index(sender, using, **kwargs):
+    if sender.name == "food":
+        ensure_sqlite_search_triggers(using)
@@ -1,8 +1,11 @@
 from celery import shared_task
-from food.selectors import get_order_by_id_for_email
+from food.selectors import get_order_by_id_for_email, get_orders_for_email
 import sib_api_v3_sdk
 from sib_api_v3_sdk.rest import ApiException
 from food.models import Order
+from food.services.archive_service import archive_orders
+from food.services.reservation_service import release_expired_reservations
+from food.services.stock_service import sync_sharded_stock
 from django.conf import settings
 import logging
 
@@ -42,6 +45,29 @@ STATUS_EMAIL_MESSAGES = {
 }
 
 
+def _transactional_emails_api():
+    configuration = sib_api_v3_sdk.Configuration()
+    configuration.api_key["api-key"] = settings.BREVO_API_KEY
+
+    return sib_api_v3_sdk.TransactionalEmailsApi(
+        sib_api_v3_sdk.ApiClient(configuration)
+    )
+
+
+def _status_email(order, email_data):
+    return sib_api_v3_sdk.SendSmtpEmail(
+        to=[{"email": order.user.email, "name": order.user.username}],
+        sender={"email": "alliolaniyan1@gmail.com", "name": "OlaTech Food"},
+        subject=email_data["subject"],
+        html_content=f"""
+            <h2>Hi {order.user.username},</h2>
+            <p>{email_data['message']}</p>
+            <p>Order Total: ₦{order.total}</p>
+            <p>Thank you for choosing OlaTech Food!</p>
+        """
+    )
+
+
 @shared_task(bind=True, max_retries=3)
 def send_order_status_email(self, order_id, new_status):
     try:
@@ -51,34 +77,37 @@ def send_order_status_email(self, order_id, new_status):
         return
 
     try:
-        configuration = sib_api_v3_sdk.Configuration()
-        configuration.api_key["api-key"] = settings.BREVO_API_KEY
-
-        api_instance = sib_api_v3_sdk.TransactionalEmailsApi(
-            sib_api_v3_sdk.ApiClient(configuration)
-        )
+        api_instance = _transactional_emails_api()
         email_data = STATUS_EMAIL_MESSAGES.get(new_status)
         if not email_data:
             return
-        
-        send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
-            to=[{"email": order.user.email, "name": order.user.username}],
-            sender={"email": "alliolaniyan1@gmail.com", "name": "OlaTech Food"},
-            subject=email_data["subject"],
-            html_content=f"""
-                <h2>Hi {order.user.username},</h2>
-                <p>{email_data['message']}</p>
-                <p>Order Total: ₦{order.total}</p>
-                <p>Thank you for choosing OlaTech Food!</p>
-            """
-        )
 
-        api_instance.send_transac_email(send_smtp_email)
+        api_instance.send_transac_email(_status_email(order, email_data))
         logger.info(f"Status email sent to {order.user.email} for order {order.id} → {new_status}")
 
     except ApiException as exc:
         logger.error(f"Failed to send status email for order {order.id}: {exc} ")
         raise self.retry(exc=exc, countdown=60)
+
+
+@shared_task
+def send_order_status_emails(order_statuses):
+    # One job for a batch of status changes: one query and one API client.
+    # An email that fails is handed to send_order_status_email to retry alone.
+    orders = get_orders_for_email([order_id for order_id, _ in order_statuses])
+    api_instance = _transactional_emails_api()
+
+    for order_id, new_status in order_statuses:
+        order = orders.get(order_id)
+        email_data = STATUS_EMAIL_MESSAGES.get(new_status)
+        if order is None or not email_data:
+            continue
+        try:
+            api_instance.send_transac_email(_status_email(order, email_data))
+        except ApiException as exc:
+            logger.error(f"Failed to send status email for order {order_id}: {exc} ")
+            send_order_status_email.apply_async((order_id, new_status), countdown=60)
+    logger.info(f"Sent status emails for {len(order_statuses)} orders")
     
 
 @shared_task(bind=True, max_retries=3)
@@ -130,3 +159,24 @@ def send_payment_email(self, order_id, payment_status):
         raise self.retry(exc=exc, countdown=60)
 
 
+
+
+@shared_task
+def release_expired_stock_reservations():
+    released = release_expired_reservations()
+    if released:
+        logger.info(f"Released {released} expired stock reservations")
+    return released
+
+
+@shared_task
+def sync_sharded_food_stock():
+    return sync_sharded_stock()
+
+
+@shared_task
+def archive_completed_orders():
+    archived = archive_orders()
+    if archived:
+        logger.info(f"Archived {archived} completed orders")
+    return archived
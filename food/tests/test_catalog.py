@@ -0,0 +1,428 @@
+from datetime import timedelta
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from food.models import Category, Food, Vendor
+from food.selectors import get_all_categories, get_available_foods, get_category_by_slug
+from food.serializers import FOOD_LIST_VALUES, FoodSerializer, serialize_food_rows
+from food.services.category_service import update_category
+from food.services.vendor_services import (
+    approve_vendor,
+    create_vendor_food,
+    deactivate_vendor,
+    update_vendor_profile,
+)
+
+LOCMEM_CACHE = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "food-catalog-tests",
+    }
+}
+
+
+class CatalogTestMixin:
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="chef", password="password123")
+        self.vendor = Vendor.objects.create(
+            user=self.user,
+            business_name="Mama Put",
+            address="12 Allen Avenue",
+            city="Ikeja",
+            state="Lagos",
+            is_active=True,
+            is_approved=True,
+        )
+        self.category = Category.objects.create(name="Rice", slug="rice")
+
+    def _create_foods(self, count):
+        now = timezone.now()
+        return [
+            Food.objects.create(
+                vendor=self.vendor,
+                category=self.category,
+                name=f"Jollof {i}",
+                price=f"{1000 + (i % 4) * 100}.00",
+                stock=5,
+                # a few identical timestamps force the id tie-breaker
+                created_at=now - timedelta(minutes=i // 3),
+            )
+            for i in range(count)
+        ]
+
+
+class MenuKeysetPaginationTests(CatalogTestMixin, TestCase):
+
+    def _walk(self, params):
+        ids = []
+        url = reverse("food:menu")
+        response = self.client.get(url, {**params, "pagination": "cursor"})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            ids.extend(food["id"] for food in response.data["results"])
+            if not response.data["next"]:
+                return ids
+            response = self.client.get(response.data["next"])
+
+    def test_cursor_mode_walks_every_food_once_in_order(self):
+        foods = self._create_foods(25)
+        expected = [
+            food.id for food in sorted(foods, key=lambda f: (f.created_at, f.id), reverse=True)
+        ]
+        self.assertEqual(self._walk({}), expected)
+
+    def test_cursor_mode_follows_price_ordering(self):
+        foods = self._create_foods(25)
+        expected = [food.id for food in sorted(foods, key=lambda f: (f.price, f.id))]
+        ids = self._walk({"ordering": "price"})
+        self.assertEqual(ids, expected)
+
+    def test_cursor_mode_follows_rating_count_ordering(self):
+        foods = self._create_foods(12)
+        for i, food in enumerate(foods):
+            Food.objects.filter(id=food.id).update(rating_count=i % 5)
+        expected = [
+            food.id for food in sorted(foods, key=lambda f: (foods.index(f) % 5, f.id), reverse=True)
+        ]
+        self.assertEqual(self._walk({"ordering": "-rating_count"}), expected)
+
+    def test_cursor_mode_rejects_orderings_it_cannot_seek_on(self):
+        self._create_foods(3)
+        response = self.client.get(reverse("food:menu"), {"pagination": "cursor", "search": "jollof"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("search relevance", response.data["ordering"][0])
+
+        response = self.client.get(reverse("food:menu"), {"search": "jollof"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_page_mode_is_still_the_default(self):
+        self._create_foods(12)
+        response = self.client.get(reverse("food:menu"))
+        self.assertEqual(response.data["count"], 12)
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse("food:menu"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 404)
+
+
+class FoodSearchTests(CatalogTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.soup = Category.objects.create(name="Soups", slug="soups")
+        self.jollof = Food.objects.create(
+            vendor=self.vendor, category=self.category, name="Jollof Rice", price="1500.00", stock=5
+        )
+        self.fried = Food.objects.create(
+            vendor=self.vendor, category=self.category, name="Fried Rice", price="1600.00", stock=5
+        )
+        self.egusi = Food.objects.create(
+            vendor=self.vendor, category=self.soup, name="Egusi", price="2000.00", stock=5
+        )
+
+    def _search(self, term, **params):
+        response = self.client.get(reverse("food:menu"), {"search": term, **params})
+        self.assertEqual(response.status_code, 200)
+        return [food["id"] for food in response.data["results"]]
+
+    def test_search_matches_name_category_and_vendor(self):
+        self.assertEqual(self._search("jollof"), [self.jollof.id])
+        self.assertEqual(self._search("soups"), [self.egusi.id])
+        self.assertCountEqual(
+            self._search("mama"), [self.jollof.id, self.fried.id, self.egusi.id]
+        )
+
+    def test_search_matches_word_prefixes(self):
+        self.assertEqual(self._search("jol"), [self.jollof.id])
+        self.assertEqual(self._search("egu mama"), [self.egusi.id])
+
+    def test_search_ranks_more_relevant_foods_first(self):
+        # "rice" appears in both the name and the category of Jollof/Fried Rice
+        rice_pudding = Food.objects.create(
+            vendor=self.vendor, category=self.soup, name="Rice Pudding", price="900.00", stock=5
+        )
+        ids = self._search("rice")
+        self.assertEqual(ids[-1], rice_pudding.id)
+        self.assertCountEqual(ids[:2], [self.jollof.id, self.fried.id])
+
+    def test_explicit_ordering_overrides_relevance(self):
+        self.assertEqual(
+            self._search("rice", ordering="-price"), [self.fried.id, self.jollof.id]
+        )
+
+    def test_vendor_menu_search_matches_only_name_and_category(self):
+        url = reverse("food:vendor-foods", args=[self.vendor.slug])
+        response = self.client.get(url, {"search": "mama"})
+        self.assertEqual(response.data["results"], [])
+        response = self.client.get(url, {"search": "rice jol"})
+        self.assertEqual([food["id"] for food in response.data["results"]], [self.jollof.id])
+
+    def test_category_and_vendor_renames_refresh_search_documents(self):
+        update_category(self.soup, {"name": "Stews"})
+        self.assertEqual(self._search("stews"), [self.egusi.id])
+        self.assertEqual(self._search("soups"), [])
+
+        update_vendor_profile(self.vendor, {"business_name": "Buka Express"})
+        self.assertEqual(len(self._search("buka")), 3)
+        self.assertEqual(self._search("mama"), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CatalogResponseCacheTests(CatalogTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self._create_foods(3)
+
+    def test_repeat_request_is_served_from_cache(self):
+        url = reverse("food:menu")
+        first = self.client.get(url, {"ordering": "price", "page": 1})
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {"page": 1, "ordering": "price"})
+        self.assertEqual(first.data, second.data)
+
+    def test_food_write_invalidates_menu_and_vendor_lists(self):
+        menu_url = reverse("food:menu")
+        vendor_url = reverse("food:vendor-foods", args=[self.vendor.slug])
+        self.client.get(menu_url)
+        self.client.get(vendor_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_vendor_food(self.vendor, {
+                "name": "Ofada Rice",
+                "price": "2500.00",
+                "stock": 4,
+                "category": self.category,
+            })
+
+        self.assertEqual(self.client.get(menu_url).data["count"], 4)
+        self.assertEqual(self.client.get(vendor_url).data["count"], 4)
+
+    def test_category_and_vendor_edits_invalidate_nested_data(self):
+        category_url = reverse("food:category-foods", args=[self.category.slug])
+        vendor_url = reverse("food:vendor-foods", args=[self.vendor.slug])
+        self.client.get(category_url)
+        self.client.get(vendor_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            update_category(self.category, {"name": "Rice Dishes"})
+            update_vendor_profile(self.vendor, {"business_name": "Mama Put Deluxe"})
+
+        category_food = self.client.get(category_url).data["results"][0]
+        vendor_food = self.client.get(vendor_url).data["results"][0]
+        self.assertEqual(category_food["vendor"]["business_name"], "Mama Put Deluxe")
+        self.assertEqual(vendor_food["category"]["name"], "Rice Dishes")
+
+
+class FastFoodSerializerParityTests(CatalogTestMixin, TestCase):
+
+    def test_fast_path_matches_food_serializer(self):
+        self.vendor.profile_photo = "vendors/mama put.png"
+        self.vendor.save()
+        foods = self._create_foods(3)
+        foods[0].image = "foods/jollof rice.jpg"
+        foods[0].save()
+        Food.objects.create(name="Orphan Plate", price="10.50", stock=1)
+
+        queryset = Food.objects.select_related("vendor", "category").order_by("id")
+        request = Request(APIRequestFactory().get("/api/menu/"))
+        for context_request in (request, None):
+            expected = FoodSerializer(
+                queryset, many=True, context={"request": context_request}
+            ).data
+            actual = serialize_food_rows(queryset.values(*FOOD_LIST_VALUES), context_request)
+            self.assertEqual([dict(food) for food in expected], actual)
+
+    def test_menu_endpoint_uses_the_same_shape(self):
+        self._create_foods(2)
+        response = self.client.get(reverse("food:menu"))
+        request = response.wsgi_request
+        expected = FoodSerializer(
+            get_available_foods().order_by("-created_at"),
+            many=True,
+            context={"request": request},
+        ).data
+        self.assertEqual(response.data["results"], [dict(food) for food in expected])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ConditionalGetTests(CatalogTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.food = self._create_foods(1)[0]
+
+    def _revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+    def test_unchanged_menu_returns_304_until_a_write(self):
+        url = reverse("food:menu")
+        first = self.client.get(url)
+
+        not_modified = self._revalidate(url, first)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b"")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_vendor_food(self.vendor, {
+                "name": "Ofada Rice",
+                "price": "2500.00",
+                "stock": 4,
+                "category": self.category,
+            })
+        self.assertEqual(self._revalidate(url, first).status_code, 200)
+
+    def test_food_detail_revalidates_on_vendor_changes(self):
+        url = reverse("food:food-detail", args=[self.food.id])
+        first = self.client.get(url)
+        self.assertIn("Last-Modified", first)
+        self.assertEqual(self._revalidate(url, first).status_code, 304)
+
+        self.vendor.description = "Now with dodo"
+        self.vendor.save()
+        self.assertEqual(self._revalidate(url, first).status_code, 200)
+
+    def test_food_detail_of_a_deleted_vendor_still_serves(self):
+        url = reverse("food:food-detail", args=[self.food.id])
+        self.vendor.delete()
+
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self._revalidate(url, first).status_code, 304)
+
+    def test_vendor_detail_supports_if_modified_since(self):
+        url = reverse("food:vendor-detail", args=[self.vendor.slug])
+        first = self.client.get(url)
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+
+class FoodBatchTests(CatalogTestMixin, TestCase):
+
+    def test_batch_returns_foods_in_request_order_with_status(self):
+        first, second = self._create_foods(2)
+        second.available = False
+        second.save()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("food:food-batch"), {"ids": f"{second.id},999999,{first.id}"}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual(
+            [(entry["id"], entry["status"]) for entry in results],
+            [(second.id, "unavailable"), (999999, "missing"), (first.id, "ok")],
+        )
+        expected = FoodSerializer(first, context={"request": response.wsgi_request}).data
+        self.assertEqual(results[2]["food"], dict(expected))
+
+    def test_batch_rejects_bad_or_oversized_id_lists(self):
+        url = reverse("food:food-batch")
+        too_many = ",".join(str(i) for i in range(1, 52))
+
+        for ids in ("", "1,two", too_many):
+            self.assertEqual(self.client.get(url, {"ids": ids}).status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class VendorLocationTests(CatalogTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.abuja_vendor = Vendor.objects.create(
+            user=User.objects.create_user(username="suya", password="password123"),
+            business_name="Suya Spot",
+            address="4 Wuse Road",
+            city="Wuse",
+            state="FCT",
+            is_approved=False,
+        )
+        self.url = reverse("food:vendors")
+
+    def test_vendor_and_food_lists_filter_by_location(self):
+        self._create_foods(1)
+        approve_vendor(self.abuja_vendor)
+
+        vendors = self.client.get(self.url, {"city": "ikeja"}).data["results"]
+        self.assertEqual([vendor["id"] for vendor in vendors], [self.vendor.id])
+        foods = self.client.get(reverse("food:menu"), {"state": "fct"}).data["results"]
+        self.assertEqual(foods, [])
+
+    def test_city_list_is_only_invalidated_by_vendors_in_that_city(self):
+        first = self.client.get(self.url, {"city": "Ikeja"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            approve_vendor(self.abuja_vendor)
+        revalidated = self.client.get(self.url, {"city": "Ikeja"}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            deactivate_vendor(self.vendor)
+        response = self.client.get(self.url, {"city": "Ikeja"}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"], [])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CategorySnapshotTests(CatalogTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_slug_lookups_are_served_from_the_snapshot(self):
+        get_all_categories()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_category_by_slug("rice").id, self.category.id)
+            with self.assertRaises(Category.DoesNotExist):
+                get_category_by_slug("soup")
+
+    def test_category_writes_reload_the_snapshot(self):
+        get_all_categories()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            update_category(self.category, {"name": "Rice Dishes"})
+
+        self.assertEqual(get_category_by_slug("rice").name, "Rice Dishes")
+
+    def test_admin_category_writes_reload_the_snapshot(self):
+        category_admin = admin.site._registry[Category]
+        request = RequestFactory().post("/")
+        get_all_categories()
+
+        form = category_admin.get_form(request, self.category)(
+            {"name": "Rice Dishes", "slug": "rice"}, instance=self.category
+        )
+        self.assertTrue(form.is_valid())
+        with self.captureOnCommitCallbacks(execute=True):
+            category_admin.save_model(request, form.save(commit=False), form, True)
+        self.assertEqual(get_category_by_slug("rice").name, "Rice Dishes")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            category_admin.delete_queryset(request, Category.objects.filter(id=self.category.id))
+        with self.assertRaises(Category.DoesNotExist):
+            get_category_by_slug("rice")
+
+    def test_category_list_ignores_query_ordering(self):
+        Category.objects.create(name="Beans", slug="beans")
+
+        response = self.client.get(reverse("food:categories"), {"ordering": "name"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([category["name"] for category in response.data["results"]], ["Beans", "Rice"])
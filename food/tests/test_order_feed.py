@@ -0,0 +1,132 @@
+import asyncio
+import json
+import tracemalloc
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from food import order_feed
+from food.models import Order, Vendor
+from food.services.order_service import mark_ready
+from food.services.outbox_service import relay_outbox
+
+
+def _events(chunk):
+    chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+    lines = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+    return lines["event"], json.loads(lines["data"])
+
+
+@override_settings(ORDER_FEED_BROKER="local")
+@patch("food.services.outbox_service.cache")
+@patch("food.services.outbox_service.send_order_status_email")
+class VendorOrderFeedTests(TestCase):
+
+    def setUp(self):
+        self.customer = User.objects.create_user(username="ada", password="password123")
+        self.vendor, self.rival = [
+            Vendor.objects.create(
+                user=User.objects.create_user(username=username, password="password123"),
+                business_name=username,
+                is_active=True,
+                is_approved=True,
+            )
+            for username in ("chef", "rival")
+        ]
+        self.order = Order.objects.create(user=self.customer, vendor=self.vendor, status="PREPARING")
+
+    def _login(self, user):
+        self.async_client.cookies["access_token"] = str(AccessToken.for_user(user))
+
+    async def test_feed_is_for_approved_vendors_only(self, mock_email, mock_cache):
+        response = await self.async_client.get(reverse("food:vendor-order-feed"))
+        self.assertEqual(response.status_code, 401)
+
+        self._login(self.customer)
+        response = await self.async_client.get(reverse("food:vendor-order-feed"))
+        self.assertEqual(response.status_code, 403)
+
+    def test_feed_is_not_served_by_the_wsgi_app(self, mock_email, mock_cache):
+        self.client.cookies["access_token"] = str(AccessToken.for_user(self.vendor.user))
+        response = self.client.get(reverse("food:vendor-order-feed"))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.streaming)
+        self.assertEqual(order_feed.hub.subscriber_count(self.vendor.id), 0)
+
+    async def test_relayed_changes_reach_only_the_vendors_stream(self, mock_email, mock_cache):
+        self._login(self.vendor.user)
+        response = await self.async_client.get(reverse("food:vendor-order-feed"))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b"retry: 5000\n\n")
+
+        rival_stream = order_feed.stream(self.rival.id)
+        await anext(rival_stream)
+
+        await sync_to_async(mark_ready)(self.order)
+        await sync_to_async(relay_outbox)()
+
+        event, orders = _events(await asyncio.wait_for(anext(chunks), 1))
+        self.assertEqual(event, "orders")
+        self.assertEqual([(order["id"], order["status"]) for order in orders], [(self.order.id, "READY")])
+        self.assertEqual(order_feed.hub.subscriber_count(self.rival.id), 1)
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(anext(rival_stream), 0.05)
+
+        await rival_stream.aclose()
+        self.assertEqual(order_feed.hub.subscriber_count(self.rival.id), 0)
+
+    @override_settings(ORDER_FEED_HEARTBEAT=0.01, ORDER_FEED_QUEUE_SIZE=2)
+    async def test_idle_streams_get_keepalives_and_slow_ones_resync(self, mock_email, mock_cache):
+        idle = order_feed.hub.subscriber_count()
+        stream = order_feed.stream(self.vendor.id)
+        await anext(stream)
+        self.assertEqual(await anext(stream), ": keepalive\n\n")
+
+        for _ in range(3):
+            order_feed.hub.dispatch(self.vendor.id, {"orders": []})
+        self.assertEqual(_events(await anext(stream)), ("resync", {}))
+        await stream.aclose()
+        self.assertEqual(order_feed.hub.subscriber_count(), idle)
+
+    @override_settings(ORDER_FEED_HEARTBEAT=3600)
+    async def test_one_worker_holds_thousands_of_idle_streams(self, mock_email, mock_cache):
+        # every dashboard is a coroutine parked on its queue in this one loop:
+        # no thread or broker connection each, and a change wakes only the
+        # streams of the vendor it belongs to
+        connections = 5000
+        received = {}
+        idle = order_feed.hub.subscriber_count()
+
+        async def dashboard(index, vendor_id):
+            async for chunk in order_feed.stream(vendor_id):
+                if chunk.startswith("event:"):
+                    received[index] = _events(chunk)
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        tasks = [
+            asyncio.create_task(dashboard(index, self.vendor.id if index % 100 == 0 else self.rival.id))
+            for index in range(connections)
+        ]
+        await asyncio.sleep(0)
+        per_connection = (tracemalloc.get_traced_memory()[0] - before) / connections
+        tracemalloc.stop()
+        self.assertEqual(order_feed.hub.subscriber_count(), idle + connections)
+        self.assertLess(per_connection, 20 * 1024)
+
+        await sync_to_async(mark_ready)(self.order)
+        await sync_to_async(relay_outbox)()
+        await asyncio.sleep(0.05)
+
+        self.assertEqual(sorted(received), list(range(0, connections, 100)))
+        self.assertEqual({event for event, _ in received.values()}, {"orders"})
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.assertEqual(order_feed.hub.subscriber_count(), idle)
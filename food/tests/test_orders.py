@@ -0,0 +1,952 @@
+import re
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from food.catalog_cache import get_generations, vendor_scope
+from food.models import (
+    ArchivedOrder, Category, Food, FulfilmentHistogram, Order, OrderItem, OrderStatusHistory, OutboxEvent,
+    Review, StockReservation, Vendor,
+)
+from food.services import cart_service
+from food.services.order_service import (
+    ADMIN_TRANSITION_MAP, bulk_update_order_status, cancel_order, cancel_orders, finalize_order, finalize_orders,
+    mark_delivered, mark_ready, update_payment_status,
+)
+from food.selectors import get_vendor_dashboard_stats
+from food.services.archive_service import archive_orders
+from food.services.outbox_service import relay_outbox
+from food.services.sla_service import fulfilment_times
+from food.tasks import archive_completed_orders, release_expired_stock_reservations, sync_sharded_food_stock
+
+LOCMEM_CACHE = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "food-order-tests",
+    }
+}
+
+
+def outbox_status_changes():
+    return [
+        tuple(change)
+        for payload in OutboxEvent.objects.filter(kind="order_status_emails").values_list("payload", flat=True)
+        for change in payload["changes"]
+    ]
+
+
+class OrderTestMixin:
+    def setUp(self):
+        self.customer = User.objects.create_user(username="ada", password="password123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+        self.vendor = Vendor.objects.create(
+            user=User.objects.create_user(username="chef", password="password123"),
+            business_name="Mama Put",
+            address="12 Allen Avenue",
+            city="Ikeja",
+            state="Lagos",
+            is_active=True,
+            is_approved=True,
+        )
+        self.category = Category.objects.create(name="Rice", slug="rice")
+        self.jollof = Food.objects.create(
+            vendor=self.vendor, category=self.category, name="Jollof", price="1500.00", stock=10
+        )
+        self.plantain = Food.objects.create(
+            vendor=self.vendor, category=self.category, name="Dodo", price="500.00", stock=10
+        )
+
+    def _add(self, food, quantity=1):
+        return self.client.post(reverse("food:add"), {"food": food.id, "quantity": quantity})
+
+    def _checkout(self):
+        return self.client.post(
+            reverse("food:checkout"), {"address": "3 Marina Road", "phone": "+2348012345678"}
+        )
+
+
+class FinalizeOrderStockTests(OrderTestMixin, TestCase):
+
+    def _order(self, *lines):
+        order = Order.objects.create(user=self.customer, vendor=self.vendor)
+        for food, quantity in lines:
+            OrderItem.objects.create(order=order, food=food, quantity=quantity)
+        return order
+
+    def test_checkout_decrements_stock_per_line(self):
+        order = self._order((self.jollof, 3), (self.plantain, 10))
+
+        finalize_order(order)
+
+        self.assertEqual(
+            list(Food.objects.order_by("id").values_list("stock", flat=True)), [7, 0]
+        )
+
+    def test_shortfall_rolls_back_lines_already_reserved(self):
+        order = self._order((self.jollof, 3), (self.plantain, 11))
+
+        with self.assertRaisesMessage(ValidationError, "Dodo is out of stock"):
+            finalize_order(order)
+
+        self.jollof.refresh_from_db()
+        self.assertEqual(self.jollof.stock, 10)
+        order.refresh_from_db()
+        self.assertEqual(order.status, "PENDING")
+
+
+class StockReservationTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        Food.objects.filter(id=self.jollof.id).update(stock=3)
+        self.rival = APIClient()
+        self.rival.force_authenticate(User.objects.create_user(username="bola", password="password123"))
+
+    def _rival_add(self, food, quantity=1):
+        return self.rival.post(reverse("food:add"), {"food": food.id, "quantity": quantity})
+
+    def test_cart_lines_hold_stock_against_other_shoppers(self):
+        self._add(self.jollof, 2)
+        self._add(self.jollof)
+
+        response = self._rival_add(self.jollof)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(StockReservation.objects.get(user=self.customer).quantity, 3)
+
+        line = OrderItem.objects.get(food=self.jollof)
+        self.client.post(reverse("food:remove"), {"item_id": line.id, "action": "decrease"})
+        self.assertEqual(self._rival_add(self.jollof).status_code, 201)
+
+    def test_expired_reservations_free_stock_and_are_swept(self):
+        self._add(self.jollof, 3)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self._rival_add(self.jollof, 2).status_code, 201)
+        self.assertEqual(release_expired_stock_reservations(), 1)
+        self.assertEqual(StockReservation.objects.get().user.username, "bola")
+
+    def test_checkout_respects_and_releases_reservations(self):
+        self._add(self.jollof, 2)
+        self._rival_add(self.jollof)
+        Food.objects.filter(id=self.jollof.id).update(stock=2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self._checkout().status_code, 400)
+        Food.objects.filter(id=self.jollof.id).update(stock=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self._checkout().status_code, 200)
+
+        self.assertFalse(StockReservation.objects.filter(user=self.customer).exists())
+        rival_order = Order.objects.get(user__username="bola")
+        cancel_order(rival_order)
+        self.assertFalse(StockReservation.objects.exists())
+
+
+class MultiVendorCheckoutTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        suya_vendor = Vendor.objects.create(
+            user=User.objects.create_user(username="suya", password="password123"),
+            business_name="Suya Spot",
+            address="4 Wuse Road",
+            city="Wuse",
+            state="FCT",
+            is_approved=True,
+        )
+        self.suya = Food.objects.create(vendor=suya_vendor, name="Suya", price="2000.00", stock=5)
+
+    def _checkout_all(self):
+        return self.client.post(
+            reverse("food:checkout-all"), {"address": "3 Marina Road", "phone": "+2348012345678"}
+        )
+
+    def test_confirms_every_pending_cart_in_one_go(self):
+        self._add(self.jollof, 2)
+        self._add(self.suya)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._checkout_all()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total"], 5000)
+        self.assertEqual(len(response.data["orders"]), 2)
+        self.assertEqual(
+            set(Order.objects.values_list("status", "address")), {("CONFIRMED", "3 Marina Road")}
+        )
+        self.assertEqual(
+            list(Food.objects.order_by("id").values_list("stock", flat=True)), [8, 10, 4]
+        )
+        self.assertEqual(OrderStatusHistory.objects.filter(status="CONFIRMED").count(), 2)
+        self.assertEqual(OutboxEvent.objects.filter(kind="order_status_emails").count(), 1)
+        self.assertEqual(len(outbox_status_changes()), 2)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_one_shortfall_rolls_back_every_cart(self):
+        self._add(self.jollof, 2)
+        self._add(self.suya, 2)
+        Food.objects.filter(id=self.suya.id).update(stock=1)
+        StockReservation.objects.all().delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._checkout_all()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "Suya is out of stock")
+        self.assertEqual(set(Order.objects.values_list("status", flat=True)), {"PENDING"})
+        self.jollof.refresh_from_db()
+        self.assertEqual(self.jollof.stock, 10)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    @override_settings(CART_BACKEND="cache", CACHES=LOCMEM_CACHE)
+    def test_cached_carts_are_materialized_together(self):
+        cache.clear()
+        self._add(self.jollof)
+        self._add(self.suya)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._checkout_all()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.filter(status="CONFIRMED").count(), 2)
+        self.assertEqual(self._checkout_all().status_code, 404)
+
+
+class CompactCartResponseTests(OrderTestMixin, TestCase):
+
+    def _compact(self, name, data):
+        return self.client.post(f"{reverse(name)}?response=compact", data)
+
+    def test_add_reports_the_changed_line_without_rereading_the_order(self):
+        with CaptureQueriesContext(connection) as full:
+            self._add(self.plantain)
+        with CaptureQueriesContext(connection) as compact:
+            response = self._compact("food:add", {"food": self.jollof.id, "quantity": 2})
+        self.assertLess(len(compact), len(full))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["total"], "3500.00")
+        self.assertEqual(response.data["item_count"], 2)
+        self.assertEqual(response.data["item"]["quantity"], 2)
+        self.assertEqual(response.data["item"]["food"], self.jollof.id)
+        self.assertNotIn("vendor", response.data)
+
+        response = self._compact("food:add", {"food": self.jollof.id})
+        self.assertEqual((response.data["item"]["quantity"], response.data["total"]), (3, "5000.00"))
+
+    def test_remove_reports_decreased_and_deleted_lines(self):
+        self._add(self.jollof, 2)
+        self._add(self.plantain)
+        line = OrderItem.objects.get(food=self.jollof)
+
+        response = self._compact("food:remove", {"item_id": line.id, "action": "decrease"})
+        self.assertEqual(response.data["item"]["quantity"], 1)
+        self.assertEqual((response.data["total"], response.data["item_count"]), ("2000.00", 2))
+
+        response = self._compact("food:remove", {"item_id": line.id, "action": "delete"})
+        self.assertEqual((response.data["item"]["id"], response.data["item"]["quantity"]), (line.id, 0))
+        self.assertEqual((response.data["total"], response.data["item_count"]), ("500.00", 1))
+        self.assertEqual(Order.objects.get().total, 500)
+
+    @override_settings(CART_BACKEND="cache", CACHES=LOCMEM_CACHE)
+    def test_cached_cart_compact_response(self):
+        cache.clear()
+        self._add(self.plantain)
+
+        response = self._compact("food:add", {"food": self.jollof.id})
+        self.assertEqual((response.data["total"], response.data["item_count"]), ("2000.00", 2))
+
+        response = self._compact("food:remove", {"item_id": self.jollof.id, "action": "delete"})
+        self.assertEqual((response.data["item"]["quantity"], response.data["item_count"]), (0, 1))
+
+
+@patch("food.services.order_versioning._backoff")
+class OrderVersionTests(OrderTestMixin, TestCase):
+
+    def _racing_reserve(self, races):
+        # another request commits a write to the cart mid-way through this one
+        real_reserve = cart_service.reserve_stock
+
+        def reserve(*args, **kwargs):
+            if races:
+                races.pop()
+                Order.objects.update(version=F("version") + 1)
+            return real_reserve(*args, **kwargs)
+        return patch("food.services.cart_service.reserve_stock", side_effect=reserve)
+
+    def test_conflicting_cart_write_is_retried_once(self, mock_backoff):
+        self._add(self.jollof)
+
+        with self._racing_reserve([True]):
+            response = self._add(self.jollof, 2)
+
+        self.assertEqual(response.status_code, 201)
+        mock_backoff.assert_called_once_with(0)
+        order = Order.objects.get()
+        self.assertEqual((order.total, order.items.get().quantity), (4500, 3))
+
+    @override_settings(ORDER_CAS_ATTEMPTS=2)
+    def test_gives_up_after_bounded_retries(self, mock_backoff):
+        self._add(self.jollof)
+
+        with self._racing_reserve([True, True]):
+            response = self._add(self.plantain)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("changed by another request", response.data["error"])
+        self.assertEqual(mock_backoff.call_count, 1)
+        self.assertEqual(Order.objects.get().items.count(), 1)
+
+    def test_checkout_rereads_a_cart_changed_after_it_was_loaded(self, mock_backoff):
+        self._add(self.jollof)
+        stale = Order.objects.get()
+        self._add(self.plantain, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order = finalize_order(stale)
+
+        self.assertEqual((order.status, order.total), ("CONFIRMED", 2500))
+        mock_backoff.assert_called_once()
+        self.assertEqual(
+            list(Food.objects.order_by("id").values_list("stock", flat=True)), [9, 8]
+        )
+
+    def test_checkout_of_a_cart_emptied_before_the_retry_is_rejected(self, mock_backoff):
+        # the last item is removed, deleting the cart, between the attempts
+        mock_backoff.side_effect = lambda attempt: Order.objects.all().delete()
+
+        checkouts = [
+            finalize_order,
+            lambda order: finalize_orders([order], "3 Marina Road", "+2348012345678"),
+        ]
+        for checkout in checkouts:
+            self._add(self.jollof)
+            stale = Order.objects.get()
+            self._add(self.plantain)
+            with self.assertRaisesMessage(ValidationError, "Cannot checkout an empty cart"):
+                checkout(stale)
+        self.assertEqual(mock_backoff.call_count, 2)
+
+
+class ShardedStockTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        call_command("shard_food_stock", self.jollof.id, "--shards", "3", stdout=StringIO())
+        self.jollof.refresh_from_db()
+
+    def _shards(self):
+        return list(self.jollof.stock_shards.order_by("shard").values_list("stock", flat=True))
+
+    def _order(self, quantity, user=None):
+        order = Order.objects.create(user=user or self.customer, vendor=self.vendor)
+        OrderItem.objects.create(order=order, food=self.jollof, quantity=quantity)
+        return order
+
+    def test_checkouts_draw_from_shards_without_overselling(self):
+        self.assertEqual(self._shards(), [4, 3, 3])
+
+        finalize_order(self._order(2))
+        finalize_order(self._order(5, User.objects.create_user(username="bola")))
+        self.assertEqual(sum(self._shards()), 3)
+
+        with self.assertRaisesMessage(ValidationError, "Jollof is out of stock"):
+            finalize_order(self._order(4, User.objects.create_user(username="chidi")))
+        self.assertEqual(sum(self._shards()), 3)
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_food_stock_is_a_snapshot_of_the_shard_sum(self):
+        cache.clear()
+        order = finalize_order(self._order(4))
+        self.jollof.refresh_from_db()
+        self.assertEqual(self.jollof.stock, 10)
+
+        generations = get_generations([vendor_scope(self.vendor.id)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sync_sharded_food_stock(), 1)
+        self.jollof.refresh_from_db()
+        self.assertEqual(self.jollof.stock, 6)
+        self.assertNotEqual(get_generations([vendor_scope(self.vendor.id)]), generations)
+        self.assertEqual(sync_sharded_food_stock(), 0)
+
+        cancel_order(order)
+        call_command("shard_food_stock", self.jollof.id, "--shards", "0", stdout=StringIO())
+        self.jollof.refresh_from_db()
+        self.assertEqual((self.jollof.stock, self.jollof.stock_shard_count), (10, 0))
+        self.assertFalse(self.jollof.stock_shards.exists())
+
+    def test_cart_adds_check_the_shard_sum(self):
+        self.assertEqual(self._add(self.jollof, 10).status_code, 201)
+        self.assertEqual(self._add(self.jollof).status_code, 400)
+
+
+class CancelOrdersTests(OrderTestMixin, TestCase):
+
+    def _confirmed(self, user, *lines):
+        order = Order.objects.create(user=user, vendor=self.vendor, status="CONFIRMED")
+        for food, quantity in lines:
+            OrderItem.objects.create(order=order, food=food, quantity=quantity)
+        return order
+
+    def test_cancel_order_restocks_the_locked_rows(self):
+        order = self._confirmed(self.customer, (self.jollof, 2), (self.plantain, 3))
+        Food.objects.filter(id=self.jollof.id).update(stock=5)
+
+        cancel_order(order)
+
+        self.assertEqual(
+            list(Food.objects.order_by("id").values_list("stock", flat=True)), [7, 13]
+        )
+
+    def test_bulk_cancel_uses_a_constant_number_of_queries(self):
+        admin = User.objects.create_user(username="admin", password="password123")
+        users = [User.objects.create_user(username=f"shopper{i}") for i in range(12)]
+
+        def run(count):
+            for user in users[:count]:
+                self._confirmed(user, (self.jollof, 1), (self.plantain, 1))
+            with CaptureQueriesContext(connection) as queries, \
+                    self.captureOnCommitCallbacks(execute=True):
+                cancelled = cancel_orders(Order.objects.filter(status="CONFIRMED"), user=admin)
+            self.assertEqual(cancelled, count)
+            return len(queries)
+
+        self.assertEqual(run(2), run(10))
+        self.assertEqual(
+            list(Food.objects.order_by("id").values_list("stock", flat=True)), [22, 22]
+        )
+        self.assertEqual(OrderStatusHistory.objects.filter(status="CANCELLED", changed_by=admin).count(), 12)
+        self.assertEqual(len(outbox_status_changes()), 12)
+
+    def test_bulk_cancel_releases_pending_holds_and_skips_later_orders(self):
+        self._add(self.jollof, 2)
+        self._confirmed(self.customer, (self.plantain, 1))
+        preparing = self._confirmed(self.customer, (self.plantain, 1))
+        Order.objects.filter(id=preparing.id).update(status="PREPARING")
+
+        self.assertEqual(cancel_orders(Order.objects.all()), 2)
+
+        self.assertFalse(StockReservation.objects.exists())
+        preparing.refresh_from_db()
+        self.assertEqual(preparing.status, "PREPARING")
+
+
+class BulkOrderStatusTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.vendor.user)
+
+    def _orders(self, status, count):
+        orders = []
+        start = User.objects.count()
+        for i in range(start, start + count):
+            order = Order.objects.create(
+                user=User.objects.create_user(username=f"shopper-{i}"),
+                vendor=self.vendor,
+                status=status,
+            )
+            OrderItem.objects.create(order=order, food=self.plantain, quantity=1)
+            orders.append(order)
+        return orders
+
+    def _bulk(self, *moves):
+        return self.client.patch(
+            reverse("food:order-status-bulk"),
+            {"transitions": [{"order": order_id, "status": status} for order_id, status in moves]},
+            format="json",
+        )
+
+    def test_valid_moves_apply_in_one_batch_and_invalid_ones_are_reported(self):
+        preparing = self._orders("PREPARING", 3)
+        confirmed = self._orders("CONFIRMED", 1)[0]
+        other_vendor = Order.objects.create(
+            user=self.customer,
+            vendor=Vendor.objects.create(
+                user=User.objects.create_user(username="rival"), business_name="Rival", is_approved=True
+            ),
+            status="PREPARING",
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._bulk(
+                *[(order.id, "ready") for order in preparing],
+                (confirmed.id, "cancelled"),
+                (other_vendor.id, "READY"),
+                (confirmed.id + 1000, "READY"),
+            )
+
+        self.assertEqual(response.status_code, 200)
+        results = {result["id"]: result for result in response.data["results"]}
+        self.assertEqual({results[order.id]["status"] for order in preparing}, {"READY"})
+        self.assertEqual(results[confirmed.id]["status"], "CANCELLED")
+        self.assertEqual(results[other_vendor.id]["error"], "You can only update your own orders.")
+        self.assertEqual(results[confirmed.id + 1000]["error"], "Order not found!")
+
+        self.assertEqual(Order.objects.filter(status="READY", ready_at__isnull=False).count(), 3)
+        self.plantain.refresh_from_db()
+        self.assertEqual(self.plantain.stock, 11)
+        self.assertEqual(OrderStatusHistory.objects.filter(status="READY").count(), 3)
+        self.assertEqual(
+            sorted(status for _, status in outbox_status_changes()), ["CANCELLED", "READY", "READY", "READY"]
+        )
+
+    def test_vendor_map_and_transition_rules_are_enforced(self):
+        ready = self._orders("READY", 1)[0]
+        confirmed = self._orders("CONFIRMED", 1)[0]
+
+        response = self._bulk((ready.id, "OUT FOR DELIVERY"), (confirmed.id, "READY"))
+
+        errors = [result["error"] for result in response.data["results"]]
+        self.assertEqual(errors, [
+            "'OUT FOR DELIVERY' is not a valid transition.",
+            "Order must be preparing before ready",
+        ])
+        self.assertFalse(Order.objects.filter(status__in=["OUT FOR DELIVERY", "READY"]).exclude(id=ready.id).exists())
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        def run(count):
+            orders = self._orders("CONFIRMED", count)
+            with CaptureQueriesContext(connection) as queries:
+                self._bulk(*[(order.id, "PREPARING") for order in orders])
+            return len(queries)
+
+        self.assertEqual(run(3), run(30))
+
+        duplicate = self._bulk((1, "READY"), (1, "READY"))
+        self.assertEqual(duplicate.status_code, 400)
+
+
+class OutboxTests(OrderTestMixin, TestCase):
+
+    def _order(self, status="PREPARING"):
+        return Order.objects.create(user=self.customer, vendor=self.vendor, status=status)
+
+    def test_side_effects_commit_and_roll_back_with_the_status_change(self):
+        kept, rolled_back = self._order(), self._order()
+
+        mark_ready(kept)
+        with self.assertRaises(ValidationError), transaction.atomic():
+            mark_ready(rolled_back)
+            raise ValidationError("boom")
+
+        self.assertEqual(outbox_status_changes(), [(kept.id, "READY")])
+        self.assertEqual(
+            OutboxEvent.objects.get(kind="vendor_dashboard_stats").payload, {"vendor_ids": [self.vendor.id]}
+        )
+
+    @patch("food.services.outbox_service.cache")
+    @patch("food.services.outbox_service.send_payment_email")
+    @patch("food.services.outbox_service.send_order_status_emails")
+    def test_relay_groups_a_batch_by_kind_and_marks_it_published(self, mock_emails, mock_payment, mock_cache):
+        orders = [self._order(), self._order()]
+        for order in orders:
+            mark_ready(order)
+        update_payment_status(orders[0], "PAID")
+
+        self.assertEqual(relay_outbox(batch_size=10), 8)
+
+        mock_emails.delay.assert_called_once_with([[orders[0].id, "READY"], [orders[1].id, "READY"]])
+        mock_payment.delay.assert_called_once_with(orders[0].id, "PAID")
+        mock_cache.delete_many.assert_called_once_with([f"vendor_dashboard_stats_{self.vendor.id}"])
+        self.assertFalse(OutboxEvent.objects.filter(published_at__isnull=True).exists())
+        self.assertEqual(relay_outbox(batch_size=10), 0)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_BACKOFF=10, OUTBOX_RETRY_MAX_DELAY=15)
+    @patch("food.services.outbox_service.cache")
+    @patch("food.services.outbox_service.send_order_status_email")
+    def test_failing_kind_backs_off_without_holding_back_others(self, mock_email, mock_cache):
+        mock_email.delay.side_effect = ConnectionError("broker down")
+        mark_ready(self._order())
+        start = timezone.now()
+
+        def relay_at(seconds):
+            with patch("food.services.outbox_service.timezone.now", return_value=start + timedelta(seconds=seconds)):
+                return relay_outbox()
+
+        self.assertEqual(relay_at(0), 3)
+        failed = OutboxEvent.objects.get(kind="order_status_emails")
+        self.assertEqual(failed.attempts, 1)
+        self.assertEqual(failed.next_attempt_at, start + timedelta(seconds=10))
+        self.assertIn("broker down", failed.last_error)
+        mock_cache.delete_many.assert_called_once()
+
+        # not due again until its backoff has passed; the next one doubles, capped
+        self.assertEqual(relay_at(9), 0)
+        self.assertEqual(relay_at(10), 1)
+        failed.refresh_from_db()
+        self.assertEqual(failed.next_attempt_at, start + timedelta(seconds=25))
+        self.assertEqual(relay_at(24), 0)
+        with self.assertLogs("food.services.outbox_service", "ERROR") as logs:
+            self.assertEqual(relay_at(25), 1)
+        self.assertIn(f"Parked 1 order_status_emails outbox events after 3 attempts: [{failed.id}]", logs.output[-1])
+        self.assertEqual(relay_at(3600), 0)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=1)
+    @patch("food.services.outbox_service.cache")
+    @patch("food.services.outbox_service.send_order_status_email")
+    def test_parked_events_are_reported_and_can_be_redriven(self, mock_email, mock_cache):
+        mock_email.delay.side_effect = ConnectionError("broker down")
+        mark_ready(self._order())
+        out, err = StringIO(), StringIO()
+
+        with self.assertLogs("food.services.outbox_service", "ERROR"):
+            call_command("relay_outbox", "--once", stdout=out, stderr=err)
+        self.assertIn("1 outbox events are parked", err.getvalue())
+
+        mock_email.delay.side_effect = None
+        call_command("relay_outbox", "--redrive", stdout=out)
+        self.assertIn("Re-drove 1 parked outbox events", out.getvalue())
+        call_command("relay_outbox", "--once", stdout=out, stderr=err)
+        self.assertEqual(mock_email.delay.call_count, 2)
+        self.assertFalse(OutboxEvent.objects.filter(published_at__isnull=True).exists())
+
+    @patch("food.services.outbox_service.cache")
+    @patch("food.services.outbox_service.send_order_status_email")
+    def test_relay_command_drains_and_purges(self, mock_email, mock_cache):
+        stale = OutboxEvent.objects.create(
+            kind="payment_email", payload={}, published_at=timezone.now() - timedelta(days=2)
+        )
+        mark_ready(self._order())
+        out = StringIO()
+
+        call_command("relay_outbox", "--once", "--batch-size", "1", stdout=out)
+
+        self.assertEqual(OutboxEvent.objects.filter(published_at__isnull=True).count(), 0)
+        self.assertFalse(OutboxEvent.objects.filter(id=stale.id).exists())
+        self.assertIn("Relayed 3 outbox events, purged 1", out.getvalue())
+
+
+class OrderArchiveTests(OrderTestMixin, TestCase):
+
+    def _order(self, status, days_ago, total="1000.00", payment_status="PAID"):
+        when = timezone.now() - timedelta(days=days_ago)
+        order = Order.objects.create(
+            user=self.customer, vendor=self.vendor, status=status, total=total,
+            payment_status=payment_status, created_at=when,
+        )
+        OrderItem.objects.create(order=order, food=self.jollof, quantity=2, price_at_purchase="500.00")
+        OrderStatusHistory.objects.create(order=order, status=status, changed_by=self.customer)
+        Order.objects.filter(id=order.id).update(updated_at=when)
+        return order
+
+    def test_old_terminal_orders_move_with_items_and_history_in_chunks(self):
+        old = [self._order("DELIVERED", 60), self._order("CANCELLED", 45, payment_status="UNPAID")]
+        recent = self._order("DELIVERED", 5)
+        in_flight = self._order("PREPARING", 60)
+        reviewed = self._order("DELIVERED", 60)
+        Review.objects.create(order=reviewed, vendor=self.vendor, user=self.customer, rating=5)
+        out = StringIO()
+
+        call_command("archive_orders", "--chunk-size", "1", stdout=out)
+
+        self.assertIn("Archived 2 orders", out.getvalue())
+        self.assertEqual(
+            set(Order.objects.values_list("id", flat=True)), {recent.id, in_flight.id, reviewed.id}
+        )
+        archived = ArchivedOrder.objects.get(id=old[0].id)
+        self.assertEqual((archived.status, archived.total), ("DELIVERED", Decimal("1000.00")))
+        self.assertEqual(archived.created_at, old[0].created_at)
+        self.assertEqual([item.subtotal for item in archived.items.all()], [Decimal("1000.00")])
+        self.assertEqual(list(archived.status_history.values_list("status", flat=True)), ["DELIVERED"])
+        self.assertFalse(OrderItem.objects.filter(order_id__in=[order.id for order in old]).exists())
+        self.assertEqual(archive_completed_orders(), 0)
+
+    def test_history_unions_the_archive_only_when_the_range_reaches_it(self):
+        oldest = self._order("DELIVERED", 90)
+        archived = self._order("CANCELLED", 60)
+        live_old = self._order("PREPARING", 40)
+        recent = self._order("DELIVERED", 2)
+        archive_orders()
+
+        response = self.client.get(reverse("food:my-orders"))
+        self.assertEqual(response.data["count"], 4)
+        self.assertEqual(
+            [order["id"] for order in response.data["results"]],
+            [recent.id, live_old.id, archived.id, oldest.id],
+        )
+        self.assertEqual(response.data["results"][3]["items"][0]["subtotal"], Decimal("1000.00"))
+
+        response = self.client.get(reverse("food:my-orders"), {"status": "cancelled"})
+        self.assertEqual([order["id"] for order in response.data["results"]], [archived.id])
+
+        since = (timezone.now() - timedelta(days=10)).isoformat()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("food:my-orders"), {"created_after": since})
+        self.assertEqual([order["id"] for order in response.data["results"]], [recent.id])
+        self.assertFalse(any("food_archivedorder" in query["sql"] for query in queries))
+
+        response = self.client.get(reverse("food:order-detail", args=[oldest.id]))
+        self.assertEqual((response.status_code, response.data["status"]), (200, "DELIVERED"))
+
+    def test_a_history_page_loads_only_its_own_orders(self):
+        orders = [self._order("DELIVERED", days_ago) for days_ago in range(40, 52)]
+        self.assertEqual(archive_orders(cutoff=timezone.now() - timedelta(days=46)), 6)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("food:my-orders"), {"page": 2})
+
+        # page 2 of 10 holds the two oldest orders, both archived
+        self.assertEqual([order["id"] for order in response.data["results"]], [orders[-2].id, orders[-1].id])
+        item_reads = [
+            re.search(r"order_id\" IN \(([^)]*)\)", query["sql"]).group(1).split(", ")
+            for query in queries
+            if "orderitem" in query["sql"]
+        ]
+        self.assertEqual(item_reads, [[str(orders[-2].id), str(orders[-1].id)]])
+
+    def test_vendor_views_and_stats_include_archived_orders(self):
+        self._order("DELIVERED", 60, total="3000.00")
+        self._order("CANCELLED", 60, payment_status="UNPAID")
+        self._order("DELIVERED", 2, total="2000.00")
+        archived = self._order("DELIVERED", 60)
+        before = get_vendor_dashboard_stats(self.vendor)
+        cache.clear()
+
+        self.assertEqual(archive_orders(), 3)
+
+        self.assertEqual(get_vendor_dashboard_stats(self.vendor), before)
+        self.client.force_authenticate(self.vendor.user)
+        response = self.client.get(reverse("food:vendor-orders"), {"ordering": "total"})
+        self.assertEqual(
+            [order["total"] for order in response.data["results"]],
+            ["1000.00", "1000.00", "2000.00", "3000.00"],
+        )
+        response = self.client.get(reverse("food:vendor-order-details", args=[archived.id]))
+        self.assertEqual(response.status_code, 200)
+
+
+class FulfilmentTimesTests(OrderTestMixin, TestCase):
+
+    def _order(self, status, **timestamps):
+        order = Order.objects.create(user=self.customer, vendor=self.vendor, status=status)
+        ago = {field: timezone.now() - timedelta(minutes=minutes) for field, minutes in timestamps.items()}
+        Order.objects.filter(id=order.id).update(**ago)
+        order.refresh_from_db()
+        return order
+
+    def test_status_changes_roll_up_stage_durations(self):
+        for minutes in range(5, 55, 5):
+            mark_ready(self._order("PREPARING", preparing_at=minutes))
+        mark_delivered(self._order("OUT FOR DELIVERY", out_for_delivery_at=25))
+        moves = {self._order("OUT FOR DELIVERY", out_for_delivery_at=35).id: "DELIVERED"}
+        bulk_update_order_status(moves, self.customer, ADMIN_TRANSITION_MAP)
+
+        with self.assertNumQueries(1):
+            stages = fulfilment_times(self.vendor, 30)
+
+        self.assertEqual(stages["prep"]["orders"], 10)
+        self.assertEqual(stages["delivery"]["orders"], 2)
+        self.assertEqual(stages["acceptance"], {"orders": 0, "p50_seconds": None, "p90_seconds": None})
+        # within a bucket of the true 25/27.5 minute p50 and 45 minute p90
+        self.assertTrue(20 * 60 <= stages["prep"]["p50_seconds"] <= 30 * 60)
+        self.assertTrue(40 * 60 <= stages["prep"]["p90_seconds"] <= 50 * 60)
+        self.assertTrue(25 * 60 <= stages["delivery"]["p90_seconds"] <= 40 * 60)
+
+        before = set(FulfilmentHistogram.objects.values_list("stage", "day", "bucket", "count"))
+        call_command("rebuild_fulfilment_histograms", stdout=StringIO())
+        self.assertEqual(set(FulfilmentHistogram.objects.values_list("stage", "day", "bucket", "count")), before)
+
+    def test_endpoint_serves_the_vendors_percentiles(self):
+        mark_ready(self._order("PREPARING", preparing_at=12))
+        self.client.force_authenticate(self.vendor.user)
+
+        response = self.client.get(reverse("food:vendor-fulfilment-times"), {"days": 7})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["days"], 7)
+        self.assertEqual(response.data["stages"]["prep"]["orders"], 1)
+        self.assertTrue(600 <= response.data["stages"]["prep"]["p50_seconds"] <= 780)
+        response = self.client.get(reverse("food:vendor-fulfilment-times"), {"days": 365})
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderTotalTests(OrderTestMixin, TestCase):
+
+    def _total(self):
+        return Order.objects.get(user=self.customer).total
+
+    def test_cart_changes_move_the_total_by_delta(self):
+        self._add(self.jollof, 2)
+        self._add(self.jollof)
+        self._add(self.plantain, 2)
+        self.assertEqual(self._total(), 5500)
+
+        jollof_line = OrderItem.objects.get(food=self.jollof)
+        self.client.post(reverse("food:remove"), {"item_id": jollof_line.id, "action": "decrease"})
+        self.assertEqual(self._total(), 4000)
+
+        self.client.post(reverse("food:remove"), {"item_id": jollof_line.id, "action": "delete"})
+        self.assertEqual(self._total(), 1000)
+
+    def test_check_order_totals_reports_and_fixes_drift(self):
+        self._add(self.jollof, 2)
+        Order.objects.update(total=1)
+
+        out = StringIO()
+        call_command("check_order_totals", stdout=out)
+        self.assertIn("items sum to 3000", out.getvalue())
+        self.assertEqual(self._total(), 1)
+
+        call_command("check_order_totals", "--fix", stdout=out)
+        self.assertEqual(self._total(), 3000)
+        call_command("check_order_totals", stdout=out)
+        self.assertIn("All order totals match", out.getvalue())
+
+    def test_admin_item_edits_retotal_their_orders(self):
+        self._add(self.jollof, 2)
+        order = Order.objects.get(user=self.customer)
+        line = OrderItem.objects.get(order=order)
+        admin_user = User.objects.create_superuser(username="root", password="password123")
+        self.client.force_authenticate(None)
+        self.client.force_login(admin_user)
+
+        response = self.client.post(
+            reverse("admin:food_orderitem_change", args=[line.id]),
+            {"order": order.id, "food": self.jollof.id, "quantity": 5, "price_at_purchase": "1500.00"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self._total(), 7500)
+
+        # inline edits on the order page are saved by save_related
+        OrderItem.objects.create(order=order, food=self.plantain, quantity=1)
+        order_admin = admin.site._registry[Order]
+        form = SimpleNamespace(instance=order, save_m2m=lambda: None)
+        order_admin.save_related(RequestFactory().post("/"), form, [], True)
+        self.assertEqual(self._total(), 8000)
+
+        self.client.post(reverse("admin:food_orderitem_delete", args=[line.id]), {"post": "yes"})
+        self.assertEqual(self._total(), 500)
+
+
+class BulkAddToCartTests(OrderTestMixin, TestCase):
+
+    def _bulk_add(self, *items):
+        return self.client.post(
+            reverse("food:add-bulk"),
+            {"items": [{"food": food.id, "quantity": quantity} for food, quantity in items]},
+            format="json",
+        )
+
+    def test_bulk_add_upserts_lines_across_vendor_carts(self):
+        suya_vendor = Vendor.objects.create(
+            user=User.objects.create_user(username="suya", password="password123"),
+            business_name="Suya Spot",
+            address="4 Wuse Road",
+            city="Wuse",
+            state="FCT",
+            is_approved=True,
+        )
+        suya = Food.objects.create(vendor=suya_vendor, name="Suya", price="2000.00", stock=5)
+        self._add(self.jollof, 1)
+        Food.objects.filter(id=self.jollof.id).update(price="1800.00")
+
+        response = self._bulk_add((self.jollof, 2), (self.plantain, 1), (suya, 1), (self.plantain, 1))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([order["total"] for order in response.data], ["5500.00", "2000.00"])
+        jollof_line = Order.objects.get(vendor=self.vendor).items.get(food=self.jollof)
+        self.assertEqual((jollof_line.quantity, jollof_line.price_at_purchase), (3, 1500))
+
+    def test_bulk_add_is_all_or_nothing(self):
+        response = self._bulk_add((self.jollof, 1), (self.plantain, 11))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+        missing = self.client.post(
+            reverse("food:add-bulk"), {"items": [{"food": 999999}]}, format="json"
+        )
+        self.assertEqual(missing.status_code, 404)
+
+
+@override_settings(CART_BACKEND="cache", CACHES=LOCMEM_CACHE)
+class CachedCartTests(OrderTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_single_item_add_reserves_stock_in_a_transaction(self):
+        # reserve_stock's SELECT ... FOR UPDATE needs one; TestCase's own
+        # atomic block is the baseline, so look for a block inside it
+        depth = len(connection.savepoint_ids)
+        depths = []
+        real_reserve = cart_service.cart_store.reserve_stock
+
+        def reserve(*args, **kwargs):
+            depths.append(len(connection.savepoint_ids))
+            return real_reserve(*args, **kwargs)
+
+        with patch("food.services.cart_store.reserve_stock", side_effect=reserve):
+            self._add(self.jollof)
+        self.assertEqual(depths, [depth + 1])
+
+    def test_cart_lives_in_cache_with_the_order_response_shape(self):
+        self._add(self.jollof, 2)
+        response = self._add(self.jollof)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(response.data["status"], "PENDING")
+        self.assertEqual(response.data["total"], "4500.00")
+        [item] = response.data["items"]
+        self.assertEqual((item["food"]["id"], item["quantity"]), (self.jollof.id, 3))
+        self.assertEqual(item["subtotal"], 4500)
+
+    def test_remove_item_updates_and_empties_the_cart(self):
+        self._add(self.jollof, 2)
+        self._add(self.plantain)
+
+        response = self.client.post(
+            reverse("food:remove"), {"item_id": self.jollof.id, "action": "decrease"}
+        )
+        self.assertEqual(response.data["total"], "2000.00")
+
+        self.client.post(reverse("food:remove"), {"item_id": self.jollof.id, "action": "delete"})
+        response = self.client.post(
+            reverse("food:remove"), {"item_id": self.plantain.id, "action": "delete"}
+        )
+        self.assertEqual(response.data, {"message": "Cart is now empty"})
+
+    def test_checkout_materializes_the_order_and_clears_the_cart(self):
+        self._add(self.jollof, 2)
+        self._add(self.plantain)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._checkout()
+
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get(user=self.customer)
+        self.assertEqual((order.status, order.total, order.address), ("CONFIRMED", 3500, "3 Marina Road"))
+        self.assertEqual(order.items.count(), 2)
+        self.jollof.refresh_from_db()
+        self.assertEqual(self.jollof.stock, 8)
+        self.assertEqual(self._checkout().status_code, 404)
+
+    def test_failed_checkout_keeps_the_cart(self):
+        self._add(self.jollof, 2)
+        Food.objects.filter(id=self.jollof.id).update(stock=1)
+
+        response = self._checkout()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(len(self._add(self.plantain).data["items"]), 2)
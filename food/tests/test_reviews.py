@@ -1,13 +1,17 @@
+from io import StringIO
+
 from django.test import TestCase
 from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
 
-from food.models import Category, Food, Order, OrderItem, Review, Vendor
-from food.services.review_service import create_review
+from food.models import Category, Food, Order, OrderItem, Review, ReviewFood, Vendor
+from food.selectors import get_food_reviews
+from food.services.review_service import create_review, update_review
 
 
-class CreateReviewServiceTests(TestCase):
+class ReviewTestMixin:
     def setUp(self):
         self.user = User.objects.create_user(
             username="alice",
@@ -58,6 +62,8 @@ class CreateReviewServiceTests(TestCase):
         OrderItem.objects.create(order=order, food=self.second_food, quantity=2)
         return order
 
+
+class CreateReviewServiceTests(ReviewTestMixin, TestCase):
     def test_only_order_owner_can_review(self):
         order = self._create_order()
         with self.assertRaises(ValidationError):
@@ -118,3 +124,70 @@ class CreateReviewServiceTests(TestCase):
         self.assertEqual(review.vendor, order.vendor)
         for key in food_keys + [vendor_key]:
             self.assertIsNone(cache.get(key))
+
+
+class RatingAggregateTests(ReviewTestMixin, TestCase):
+    def _review(self, rating):
+        return create_review(
+            order=self._create_order(),
+            user=self.user,
+            validated_data={"rating": rating, "comment": "Tasty"},
+        )
+
+    def assertAggregates(self, obj, rating_sum, rating_count):
+        obj.refresh_from_db()
+        self.assertEqual((obj.rating_sum, obj.rating_count), (rating_sum, rating_count))
+
+    def test_create_review_adds_to_food_and_vendor_aggregates(self):
+        self._review(4)
+        self._review(5)
+
+        for obj in (self.food, self.second_food, self.vendor):
+            self.assertAggregates(obj, 9, 2)
+        self.assertEqual(self.vendor.average_rating, 4.5)
+
+    def test_update_review_applies_rating_difference(self):
+        review = self._review(2)
+
+        update_review(review, {"rating": 5, "comment": "Better on reflection"})
+
+        for obj in (self.food, self.vendor):
+            self.assertAggregates(obj, 5, 1)
+
+    def test_repair_command_rebuilds_drifted_aggregates(self):
+        self._review(3)
+        self._review(5)
+        Food.objects.update(rating_sum=0, rating_count=0)
+        Vendor.objects.update(rating_sum=99, rating_count=7)
+
+        call_command("repair_rating_aggregates", stdout=StringIO())
+
+        for obj in (self.food, self.second_food, self.vendor):
+            self.assertAggregates(obj, 8, 2)
+
+
+class ReviewFoodLinkTests(ReviewTestMixin, TestCase):
+    def test_food_reviews_come_from_links(self):
+        order = self._create_order()
+        review = create_review(
+            order=order,
+            user=self.user,
+            validated_data={"rating": 5, "comment": "Twice as good"},
+        )
+
+        self.assertEqual(review.food_links.count(), 2)
+        self.assertEqual(list(get_food_reviews(self.food.id)), [review])
+
+    def test_backfill_command_links_existing_reviews(self):
+        order = self._create_order()
+        review = Review.objects.create(order=order, user=self.user, vendor=self.vendor, rating=4)
+
+        out = StringIO()
+        call_command("backfill_review_foods", stdout=out)
+        call_command("backfill_review_foods", stdout=out)
+
+        self.assertEqual(
+            set(ReviewFood.objects.values_list("review_id", "food_id")),
+            {(review.id, self.food.id), (review.id, self.second_food.id)},
+        )
+        self.assertIn("Created 0 review-food links", out.getvalue())
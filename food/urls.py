@@ -3,12 +3,15 @@ from django.urls import path
 from .views import(
     AllFoodView, 
     AddToCartView,
+    BulkAddToCartView,
     RemoveFromCartView,
     CancelOrderView,
     UpdateOrderDetailView, 
     CheckOutView, 
+    CheckOutAllView,
     AllOrdersView, 
     OrderStatusUpdateView,
+    BulkOrderStatusUpdateView,
     OrderDetailView,
     InitializePaymentView,
     VerifyPaymentView,
@@ -18,6 +21,7 @@ from .views import(
     OrderReviewDetailView,
     FoodReviewsView,
     FoodDetailView,
+    FoodBatchView,
     VendorListView,
     VendorDetailView,
     VendorFoodListView,
@@ -25,12 +29,14 @@ from .views import(
     VendorRegistrationView,
     VendorDashboardView,
     VendorDashboardStatsView,
+    VendorFulfilmentTimesView,
     VendorProfileUpdateView,
     VendorFoodCreateView,
     VendorFoodsView,
     VendorFoodDetailView,
     VendorFoodToggleAvailabilityView,
     VendorOrderListView,
+    VendorOrderFeedView,
     VendorOrderDetailView,
     AdminVendorListView,
     AdminVendorDetailView,
@@ -50,12 +56,15 @@ urlpatterns = [
     path("menu/", AllFoodView.as_view(), name="menu"),
     path("my-orders/", AllOrdersView.as_view(), name="my-orders"),
     path("add_to_cart/", AddToCartView.as_view(), name="add"),
+    path("add_to_cart/bulk/", BulkAddToCartView.as_view(), name="add-bulk"),
     path("remove/", RemoveFromCartView.as_view(), name="remove"),
     path("order/cancel/", CancelOrderView.as_view(), name="cancel"),
     path("order/details/update/", UpdateOrderDetailView.as_view(), name="order-details"),
     path("checkout/", CheckOutView.as_view(), name="checkout"),
+    path("checkout/all/", CheckOutAllView.as_view(), name="checkout-all"),
     path("order/<int:order_id>/details/", OrderDetailView.as_view(), name="order-detail"),
     path("order/<int:order_id>/status/", OrderStatusUpdateView.as_view(), name="order-status"),
+    path("orders/status/bulk/", BulkOrderStatusUpdateView.as_view(), name="order-status-bulk"),
     path("order/<int:order_id>/pay/", InitializePaymentView.as_view(), name="initialize-payment"),
     path("order/verify/<str:reference>/", VerifyPaymentView.as_view(), name="verify-payment"),
     path("webhook/paystack/", PayStackWebhookView.as_view(), name="webhook-paystack"),
@@ -64,6 +73,7 @@ urlpatterns = [
     path("order/<int:order_id>/review/details/", OrderReviewDetailView.as_view(), name="order-review-detail"),
     path("foods/<int:food_id>/reviews/", FoodReviewsView.as_view(), name="food-reviews"),
     path("food/<int:food_id>/details/", FoodDetailView.as_view(), name="food-detail"),
+    path("foods/batch/", FoodBatchView.as_view(), name="food-batch"),
     path("vendors/", VendorListView.as_view(), name="vendors"),
     path("vendor/<slug:slug>/details/", VendorDetailView.as_view(), name="vendor-detail"),
     path("vendor/<slug:slug>/foods/", VendorFoodListView.as_view(), name="vendor-foods"),
@@ -71,12 +81,14 @@ urlpatterns = [
     path("vendor/apply/", VendorRegistrationView.as_view(), name="vendor-register"),
     path("vendor/dashboard/", VendorDashboardView.as_view(), name="vendor-dashboard"),
     path("vendor/dashboard/stats/", VendorDashboardStatsView.as_view(), name="vendor-dashboard-stats"),
+    path("vendor/dashboard/fulfilment/", VendorFulfilmentTimesView.as_view(), name="vendor-fulfilment-times"),
     path("vendor/profile/update/", VendorProfileUpdateView.as_view(), name="vendor-profile-update"),
     path("vendor/create_food/", VendorFoodCreateView.as_view(), name="vendor-food-create"),
     path("vendor/all_foods/", VendorFoodsView.as_view(), name="all_foods"),
     path("vendor/food/<int:food_id>/details/", VendorFoodDetailView.as_view(), name="vendor-food-details"),
     path("vendor/food/<int:food_id>/available/", VendorFoodToggleAvailabilityView.as_view(), name="vendor-available-food"),
     path("vendor/all_orders/", VendorOrderListView.as_view(), name="vendor-orders"),
+    path("vendor/orders/feed/", VendorOrderFeedView.as_view(), name="vendor-order-feed"),
     path("vendor/order/<int:order_id>/details/", VendorOrderDetailView.as_view(), name="vendor-order-details"),
     path("admin/vendors/", AdminVendorListView.as_view(), name="admin-vendors"),
     path("admin/vendor/<int:vendor_id>/details/", AdminVendorDetailView.as_view(), name="admin-vendor-detail"),
@@ -10,13 +10,18 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import generics
 from rest_framework import status
-from food.models import Category, Food, Order, Vendor
+from food.models import ArchivedOrder, Category, Food, Order, Vendor
 from .serializers import (
+    FOOD_LIST_VALUES,
+    serialize_food_rows,
     CategorySerializer,
     FoodSerializer,
     FoodWriteSerializer, 
     OrderSerializer, 
+    CartChangeSerializer,
+    BulkOrderStatusSerializer,
     AddToCartSerializer, 
+    BulkAddToCartSerializer,
     OrderDeliveryDetailSerializer, 
     ReviewSerializer,
     VendorRegistrationSerializer,
@@ -25,19 +30,28 @@ from .serializers import (
     VendorDashboardSerializer,
     AdminVendorListSerializer
 )
-from food.services.cart_service import add_item_to_cart, remove_item_from_cart
+from food.services.cart_service import (
+    add_item_to_cart,
+    add_items_to_cart,
+    get_cart,
+    get_carts,
+    remove_item_from_cart,
+)
 from food.services.order_service import ( 
     ADMIN_TRANSITION_MAP,
     VENDOR_TRANSITION_MAP,
+    bulk_update_order_status,
     cancel_order, 
     finalize_order,
+    finalize_orders,
     update_payment_status
 )    
 from food.services.payment_service import initialize_payment, verify_payment
-from food.services.review_service import (
-    create_review, 
-    _food_reviews_stats_cache_key,
-    _vendor_reviews_stats_cache_key
+from food.services.review_service import create_review, update_review
+from food.services.category_service import (
+    create_category,
+    update_category,
+    delete_category,
 )
 from food.services.vendor_services import (
     register_vendor,
@@ -56,10 +70,13 @@ from food.selectors import (
     get_category_by_id,
     get_available_foods,
     get_available_food_by_id,
+    get_foods_by_ids,
     get_category_by_slug,
     get_user_orders,
-    get_pending_order,
+    get_user_archived_orders,
+    get_user_archived_order_by_id,
     get_order_by_id,
+    get_orders_by_ids,
     get_user_order_by_id,
     get_order_by_reference,
     get_order_review, 
@@ -72,13 +89,32 @@ from food.selectors import (
     get_vendor_foods,
     get_vendor_orders,
     get_vendor_order_by_id,
+    get_vendor_archived_orders,
+    get_vendor_archived_order_by_id,
     get_vendor_reviews,
     get_vendor_reviews_stats,
     get_vendor_dashboard_stats,
     get_food_by_id
 )
-from food.filters import FoodFilter, OrderFilter
+from food.filters import FoodFilter, FoodSearchFilter, OrderFilter, VendorFilter
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.filters import OrderingFilter
 from rest_framework.pagination import PageNumberPagination
+from food.pagination import FoodKeysetPagination
+from food.order_history import MergedOrders
+from food.services.archive_service import archive_horizon
+from food.services.sla_service import fulfilment_times
+from food.conditional import make_etag, not_modified, set_validators
+from food.catalog_cache import (
+    CATALOG_RESPONSE_TIMEOUT,
+    CATALOG_SCOPE,
+    CATEGORIES_SCOPE,
+    VENDORS_SCOPE,
+    catalog_response_key,
+    location_scopes,
+    category_scope,
+    vendor_scope,
+)
 from food.permissions import (
     IsOrderOwner, 
     IsStaff, 
@@ -90,17 +126,57 @@ from django.core.exceptions import ValidationError
 from django.core.cache import cache
 from drf_spectacular.utils import extend_schema
 from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from asgiref.sync import sync_to_async
+from users.authentication import CookieJWTAuthentication
+from food import order_feed
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class AllFoodView(generics.ListAPIView):
+class CatalogCacheMixin:
+    # Public catalog lists are the same for every caller, so the rendered page is
+    # cached under the generations of the scopes it depends on. Services bump a
+    # scope's generation on write, which orphans the old entries without a key scan.
+    def get_cache_scopes(self):
+        return [CATALOG_SCOPE]
+
+    # The same key doubles as the ETag, so a client revalidating an unchanged
+    # page gets a 304 before the cache or the database is touched.
+    def list(self, request, *args, **kwargs):
+        cache_key = catalog_response_key(request, self.get_cache_scopes())
+        etag = make_etag(cache_key)
+        response = not_modified(request, etag)
+        if response is None:
+            data = cache.get(cache_key)
+            if data is None:
+                data = super().list(request, *args, **kwargs).data
+                cache.set(cache_key, data, timeout=CATALOG_RESPONSE_TIMEOUT)
+            response = Response(data)
+        return set_validators(response, etag)
+
+
+class FastFoodListMixin:
+    # Builds the FoodSerializer list shape straight from .values() rows,
+    # skipping model and nested serializer instantiation per food.
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).values(*FOOD_LIST_VALUES)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serialize_food_rows(page, request))
+        return Response(serialize_food_rows(queryset, request))
+
+
+class AllFoodView(CatalogCacheMixin, FastFoodListMixin, generics.ListAPIView):
     serializer_class = FoodSerializer
     permission_classes = [AllowAny]
+    pagination_class = FoodKeysetPagination
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FoodSearchFilter]
     filterset_class = FoodFilter
-    search_fields = ["name", "category__name", "vendor__business_name"]
-    ordering_fields = ["price", "name"]
+    ordering_fields = ["price", "name", "rating_count"]
     ordering = ["-created_at"]
 
     def get_queryset(self):
@@ -134,12 +210,91 @@ class FoodDetailView(generics.RetrieveAPIView):
         except Food.DoesNotExist:
             raise NotFound("Food not found")
 
+    def retrieve(self, request, *args, **kwargs):
+        food = self.get_object()
+        timestamps = [food.updated_at]
+        if food.vendor:
+            timestamps.append(food.vendor.updated_at)
+        if food.category:
+            timestamps.append(food.category.updated_at)
+
+        last_modified = max(timestamps)
+        etag = make_etag(request.build_absolute_uri(), *timestamps)
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            response = Response(self.get_serializer(food).data)
+        return set_validators(response, etag, last_modified)
+
     @method_decorator(ratelimit(key="ip", rate="30/m", method="GET", block=True))
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
+
+
+class FoodBatchView(APIView):
+    # Rehydrates carts and saved lists in one id__in query instead of a
+    # food detail call per item; entries come back in request order.
+    permission_classes = [AllowAny]
+    max_ids = 50
+
+    @extend_schema(responses={200: None})
+    @method_decorator(ratelimit(key="ip", rate="30/m", method="GET", block=True))
+    def get(self, request):
+        raw_ids = request.query_params.get("ids", "")
+        try:
+            food_ids = list(dict.fromkeys(int(food_id) for food_id in raw_ids.split(",") if food_id))
+        except ValueError:
+            return Response({"error": "ids must be a comma-separated list of integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not food_ids:
+            return Response({"error": "ids is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(food_ids) > self.max_ids:
+            return Response({"error": f"At most {self.max_ids} ids per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = get_foods_by_ids(food_ids).values(*FOOD_LIST_VALUES)
+        foods = {food["id"]: food for food in serialize_food_rows(rows, request)}
+
+        results = []
+        for food_id in food_ids:
+            food = foods.get(food_id)
+            if food is None:
+                results.append({"id": food_id, "status": "missing", "food": None})
+            elif not food["available"]:
+                results.append({"id": food_id, "status": "unavailable", "food": None})
+            else:
+                results.append({"id": food_id, "status": "ok", "food": food})
+
+        return Response({"results": results}, status=status.HTTP_200_OK)
         
 
-class AllOrdersView(generics.ListAPIView):
+class ArchivedOrdersListMixin:
+    # Order lists that also page through ArchivedOrder, unless ?created_after=
+    # starts after the archive horizon and Order alone can answer. Views
+    # define get_archived_queryset alongside get_queryset.
+    def filter_queryset(self, queryset):
+        live = super().filter_queryset(queryset)
+        filterset = OrderFilter(
+            self.request.query_params, queryset=self.get_archived_queryset(), request=self.request
+        )
+        # invalid filters were already rejected on the live queryset
+        filterset.is_valid()
+        created_after = filterset.form.cleaned_data.get("created_after")
+        if created_after is not None and created_after >= archive_horizon():
+            return live
+
+        archived = filterset.qs
+        for backend in self.filter_backends:
+            if backend is not DjangoFilterBackend:
+                archived = backend().filter_queryset(self.request, archived, self)
+        return MergedOrders(live, archived)
+
+
+class AllOrdersView(ArchivedOrdersListMixin, generics.ListAPIView):
     serializer_class = OrderSerializer
     filterset_class = OrderFilter
     ordering_fields = ["created_at", "total"]
@@ -150,11 +305,24 @@ class AllOrdersView(generics.ListAPIView):
             return Order.objects.none()
         return get_user_orders(self.request.user)    
 
+    def get_archived_queryset(self):
+        return get_user_archived_orders(self.request.user)
+
     @method_decorator(ratelimit(key="ip", rate="60/m", method="GET", block=True)) 
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
 
+def _cart_response(request, order, status_code):
+    # ?response=compact skips re-reading and re-serializing the whole order
+    if request.query_params.get("response") == "compact":
+        return Response(CartChangeSerializer(order).data, status=status_code)
+
+    if order.pk:
+        order = get_order_by_id(order.id)
+    return Response(OrderSerializer(order).data, status=status_code)
+
+
 class AddToCartView(APIView):
 
     @extend_schema(request=AddToCartSerializer, responses={201: OrderSerializer})
@@ -178,9 +346,31 @@ class AddToCartView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
     
-        order = get_order_by_id(order.id)
-    
-        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+        return _cart_response(request, order, status.HTTP_201_CREATED)
+
+
+class BulkAddToCartView(APIView):
+
+    @extend_schema(request=BulkAddToCartSerializer, responses={201: OrderSerializer(many=True)})
+    @method_decorator(ratelimit(key="user", rate="20/m", method="POST", block=True))
+    def post(self, request):
+        serializer = BulkAddToCartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            orders = add_items_to_cart(request.user, serializer.validated_data["items"])
+        except Food.DoesNotExist:
+            return Response({"error": "Food not found"}, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError as e:
+            return Response({"error": e.messages[0] if e.messages else str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # one cart per vendor touched
+        if orders and orders[0].pk:
+            orders = get_orders_by_ids([order.id for order in orders])
+
+        return Response(OrderSerializer(orders, many=True).data, status=status.HTTP_201_CREATED)
 
 
 class RemoveFromCartView(APIView):
@@ -212,9 +402,7 @@ class RemoveFromCartView(APIView):
         if order is None:
             return Response({"message": "Cart is now empty"}, status=status.HTTP_200_OK)
         
-        order = get_order_by_id(order.id)
-        serializer = OrderSerializer(order)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return _cart_response(request, order, status.HTTP_200_OK)
     
    
 class CancelOrderView(APIView):
@@ -222,7 +410,7 @@ class CancelOrderView(APIView):
     @extend_schema(responses={200: None})
     @method_decorator(ratelimit(key="user", rate="5/m", method="POST", block=True))
     def post(self, request):
-        order = get_pending_order(request.user)
+        order = get_cart(request.user)
         if not order:
             return Response({"error": "No Order to cancel"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -243,7 +431,7 @@ class UpdateOrderDetailView(APIView):
     def patch(self, request):
 
         with transaction.atomic():
-            order = get_pending_order(request.user)
+            order = get_cart(request.user)
             if not order:
                 return Response({"error" : "No pending order"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -264,7 +452,7 @@ class CheckOutView(APIView):
     def post(self, request):
         user = request.user
 
-        order = get_pending_order(user=user)
+        order = get_cart(user=user)
         if not order:
             return Response({"error": "No pending order to checkout"}, 
                 status=status.HTTP_404_NOT_FOUND
@@ -301,6 +489,48 @@ class CheckOutView(APIView):
         )
 
 
+class CheckOutAllView(APIView):
+
+    @extend_schema(request=OrderDeliveryDetailSerializer, responses={200: OrderSerializer(many=True)})
+    @method_decorator(ratelimit(key="user", rate="5/m", method="POST", block=True))
+    def post(self, request):
+        user = request.user
+
+        orders = get_carts(user)
+        if not orders:
+            return Response({"error": "No pending order to checkout"}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        serializer = OrderDeliveryDetailSerializer(data=request.data, partial=True)
+        if not serializer.is_valid():
+            logger.warning(f"Checkout validation failed for user {user.username}: {serializer.errors}")
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        address, phone = serializer.delivery_details(orders[0])
+
+        try:
+            orders = finalize_orders(orders, address, phone, user=user)
+        except ValidationError as e:
+            return Response({"error": e.messages[0] if e.messages else str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        logger.info(f"User {user.username} checked out orders {[order.id for order in orders]} successfully.")
+
+        return Response(
+            {"message": "Orders checked out successfully",
+            "user" : user.username,
+            "address" : address,
+            "phone" : phone,
+            "status" : "CONFIRMED",
+            "total" : sum((order.total for order in orders), 0),
+            "orders" : [
+                {"id": order.id, "vendor": order.vendor_id, "total": order.total}
+                for order in orders
+            ]},
+            status=status.HTTP_200_OK
+        )
+
+
 class OrderDetailView(generics.RetrieveAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsOrderOwner]
@@ -313,7 +543,10 @@ class OrderDetailView(generics.RetrieveAPIView):
         try:
             order = get_user_order_by_id(self.kwargs["order_id"], self.request.user)
         except Order.DoesNotExist:
-            raise NotFound("Order not found")
+            try:
+                order = get_user_archived_order_by_id(self.kwargs["order_id"], self.request.user)
+            except ArchivedOrder.DoesNotExist:
+                raise NotFound("Order not found")
         self.check_object_permissions(self.request, order)       
         return order
 
@@ -363,6 +596,33 @@ class OrderStatusUpdateView(APIView):
         )
     
 
+class BulkOrderStatusUpdateView(APIView):
+    permission_classes = [IsStaff | IsApprovedVendor]
+
+    @extend_schema(request=BulkOrderStatusSerializer, responses={200: None})
+    @method_decorator(ratelimit(key="user", rate="30/m", method="PATCH", block=True))
+    def patch(self, request):
+        serializer = BulkOrderStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        if request.user.is_staff:
+            transition_map, vendor = ADMIN_TRANSITION_MAP, None
+        else:
+            transition_map, vendor = VENDOR_TRANSITION_MAP, request.user.vendor
+
+        results = bulk_update_order_status(
+            serializer.validated_data["transitions"],
+            request.user,
+            transition_map,
+            vendor=vendor,
+        )
+
+        return Response({"results": [
+            {"id": order_id, "status": new_status} if new_status else {"id": order_id, "error": error}
+            for order_id, (new_status, error) in results.items()
+        ]}, status=status.HTTP_200_OK)
+
+
 class InitializePaymentView(APIView):
 
     @extend_schema(responses={200: None})
@@ -526,17 +786,12 @@ class UpdateReviewView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer.save()
-        food_ids = order.items.values_list("food__id", flat=True)
-        for food_id in food_ids:
-            cache.delete(_food_reviews_stats_cache_key(food_id))
-        if order.vendor_id:
-            cache.delete(_vendor_reviews_stats_cache_key(order.vendor_id))
+        review = update_review(review, serializer.validated_data)
         logger.info(f"User {request.user.username} updated review for Order {order_id}")
 
         return Response({
             "message": "Review updated successfully.",
-            "data": serializer.data}, 
+            "data": ReviewSerializer(review).data}, 
             status=status.HTTP_200_OK
         )
 
@@ -604,9 +859,17 @@ class FoodReviewsView(APIView):
         }, status=status.HTTP_200_OK)
                 
 
-class VendorListView(generics.ListAPIView):
+class VendorListView(CatalogCacheMixin, generics.ListAPIView):
     serializer_class = VendorProfileSerializer
     permission_classes = [AllowAny]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_class = VendorFilter
+    ordering_fields = ["business_name", "rating_count"]
+
+    def get_cache_scopes(self):
+        # a city/state list only goes stale when a vendor in that place changes
+        params = self.request.query_params
+        return location_scopes(params.get("city"), params.get("state")) or [VENDORS_SCOPE]
 
     def get_queryset(self):
         return get_all_vendors()
@@ -628,37 +891,44 @@ class VendorDetailView(APIView):
             vendor = get_vendor_by_slug(slug)
         except Vendor.DoesNotExist:
             return Response({"error": "Vendor not found!"}, status=status.HTTP_404_NOT_FOUND)
-        
-        stats = get_vendor_reviews_stats(vendor.id)
 
-        serializer = VendorProfileSerializer(
-            vendor,
-            context={"request": request}
-        )
+        etag = make_etag(request.build_absolute_uri(), vendor.updated_at)
+        response = not_modified(request, etag, vendor.updated_at)
+        if response is None:
+            # rating aggregates are part of the profile serializer
+            serializer = VendorProfileSerializer(
+                vendor,
+                context={"request": request}
+            )
+            response = Response(serializer.data, status=status.HTTP_200_OK)
 
-        return Response({
-            **serializer.data,
-            "average_rating": stats["average_rating"],
-            "total_reviews": stats["total_reviews"]}, 
-            status=status.HTTP_200_OK
-        )
+        return set_validators(response, etag, vendor.updated_at)
 
 
-class VendorFoodListView(generics.ListAPIView):
+class VendorFoodListView(CatalogCacheMixin, FastFoodListMixin, generics.ListAPIView):
     serializer_class = FoodSerializer
     permission_classes = [AllowAny]
+    pagination_class = FoodKeysetPagination
+    filter_backends = [DjangoFilterBackend, OrderingFilter, FoodSearchFilter]
     filterset_class = FoodFilter
+    # every food here shares the vendor's name, so a term must match the food itself
     search_fields = ["name", "category__name"]
-    ordering_fields = ["price", "name"]
+    ordering_fields = ["price", "name", "rating_count"]
     ordering = ["-created_at"]
 
+    def get_vendor(self):
+        if not hasattr(self, "vendor"):
+            try:
+                self.vendor = get_vendor_by_slug(self.kwargs["slug"])
+            except Vendor.DoesNotExist:
+                raise NotFound("Vendor not found!")
+        return self.vendor
+
+    def get_cache_scopes(self):
+        return [vendor_scope(self.get_vendor().id), CATEGORIES_SCOPE]
+
     def get_queryset(self):
-        slug = self.kwargs["slug"]
-        try:
-            vendor = get_vendor_by_slug(slug)
-        except Vendor.DoesNotExist:
-            raise NotFound("Vendor not found!")
-        return get_available_foods(vendor=vendor)
+        return get_available_foods(vendor=self.get_vendor())
 
     def get_serializer_context(self):
         return {"request": self.request}
@@ -777,6 +1047,29 @@ class VendorDashboardStatsView(APIView):
         return Response(stats, status=status.HTTP_200_OK)
 
 
+class VendorFulfilmentTimesView(APIView):
+    # p50/p90 seconds for each fulfilment stage over the last ?days= days
+    # (default 30), read from the per-day histogram rollup
+    permission_classes = [IsApprovedVendor]
+    max_days = 90
+
+    @method_decorator(ratelimit(key="user", rate="30/m", method="GET", block=True))
+    def get(self, request):
+        try:
+            days = int(request.query_params.get("days", 30))
+        except ValueError:
+            return Response({"error": "days must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= days <= self.max_days:
+            return Response({"error": f"days must be between 1 and {self.max_days}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            {"days": days, "stages": fulfilment_times(request.user.vendor, days)},
+            status=status.HTTP_200_OK
+        )
+
+
 class VendorProfileUpdateView(APIView):
     permission_classes = [IsApprovedVendor]
 
@@ -852,7 +1145,7 @@ class VendorFoodsView(generics.ListAPIView):
     serializer_class = FoodSerializer
     permission_classes = [IsApprovedVendor]
     filterset_class = FoodFilter
-    ordering_fields = ["price", "name"]
+    ordering_fields = ["price", "name", "rating_count"]
     ordering = ["-created_at"]
 
     def get_queryset(self):
@@ -986,7 +1279,7 @@ class VendorFoodToggleAvailabilityView(APIView):
             status=status.HTTP_200_OK
         )
 
-class VendorOrderListView(generics.ListAPIView):
+class VendorOrderListView(ArchivedOrdersListMixin, generics.ListAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsApprovedVendor]
     filterset_class = OrderFilter
@@ -997,11 +1290,50 @@ class VendorOrderListView(generics.ListAPIView):
         if getattr(self, "swagger_fake_view", False):
             return Order.objects.none()
         return get_vendor_orders(self.request.user.vendor)
+
+    def get_archived_queryset(self):
+        return get_vendor_archived_orders(self.request.user.vendor)
     
     @method_decorator(ratelimit(key="user", rate="60/m", method="GET", block=True))
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
+class VendorOrderFeedView(View):
+    # Server-sent events replacement for polling VendorOrderListView: pushes
+    # {id, status, payment_status, total, updated_at} for each order as it
+    # changes, and a "resync" event when the dashboard should refetch the
+    # list. A plain async Django view, since DRF views are sync only; serve it
+    # through food_site/asgi.py, where an idle stream holds no thread.
+
+    @staticmethod
+    def _authenticate(request):
+        authenticated = CookieJWTAuthentication().authenticate(request)
+        if authenticated is None:
+            return None, 401
+        request.user = authenticated[0]
+        if not IsApprovedVendor().has_permission(request, None):
+            return None, 403
+        return request.user.vendor, None
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            # WSGI collects a streaming body into a list before sending it, so
+            # the endless stream would pin a sync worker until it is killed
+            return JsonResponse({"detail": "The order feed is only served by the events server."}, status=404)
+
+        vendor, error_status = await sync_to_async(self._authenticate)(request)
+        if error_status == 401:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+        if error_status == 403:
+            return JsonResponse({"detail": "You do not have permission to perform this action."}, status=403)
+
+        response = StreamingHttpResponse(order_feed.stream(vendor.id), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # stop nginx from buffering the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
 class VendorOrderDetailView(APIView):
     permission_classes = [IsApprovedVendor]
 
@@ -1015,10 +1347,13 @@ class VendorOrderDetailView(APIView):
                 order_id=order_id,
             )
         except Order.DoesNotExist:
-            return Response({
-                "error": 'Order not found!'},
-                status=status.HTTP_404_NOT_FOUND
-            )
+            try:
+                order = get_vendor_archived_order_by_id(vendor=vendor, order_id=order_id)
+            except ArchivedOrder.DoesNotExist:
+                return Response({
+                    "error": 'Order not found!'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
 
         return Response(
             OrderSerializer(order, context={"request": request}).data,
@@ -1208,9 +1543,15 @@ class AdminVendorDeactivateView(APIView):
         )
 
 
-class CategoryListView(generics.ListAPIView):
+class CategoryListView(CatalogCacheMixin, generics.ListAPIView):
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
+    # the list is the in-memory category snapshot, already sorted by name,
+    # not a queryset the filter backends could narrow or reorder
+    filter_backends = []
+
+    def get_cache_scopes(self):
+        return [CATEGORIES_SCOPE]
 
     def get_queryset(self):
         return get_all_categories()
@@ -1220,19 +1561,26 @@ class CategoryListView(generics.ListAPIView):
         return super().get(request, *args, **kwargs)
 
 
-class CategoryFoodsView(generics.ListAPIView):
+class CategoryFoodsView(CatalogCacheMixin, FastFoodListMixin, generics.ListAPIView):
     # all available foods under a category
     serializer_class = FoodSerializer
     permission_classes = [AllowAny]
+    pagination_class = FoodKeysetPagination
     filterset_class = FoodFilter
 
+    def get_category(self):
+        if not hasattr(self, "category"):
+            try:
+                self.category = get_category_by_slug(self.kwargs["slug"])
+            except Category.DoesNotExist:
+                raise NotFound("Category not found")
+        return self.category
+
+    def get_cache_scopes(self):
+        return [category_scope(self.get_category().id), VENDORS_SCOPE]
+
     def get_queryset(self):
-        slug = self.kwargs["slug"]
-        try:
-            category = get_category_by_slug(slug)
-        except Category.DoesNotExist:
-            raise NotFound("Category not found")
-        return get_available_foods().filter(category=category)
+        return get_available_foods().filter(category_id=self.get_category().id)
 
 
 class AdminCategoryCreateView(APIView):
@@ -1242,7 +1590,7 @@ class AdminCategoryCreateView(APIView):
         serializer = CategorySerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=400)
-        category = serializer.save()
+        category = create_category(serializer.validated_data)
         return Response(
             CategorySerializer(category).data,
             status=201
@@ -1270,7 +1618,7 @@ class AdminCategoryDetailView(APIView):
         )
         if not serializer.is_valid():
             return Response(serializer.errors, status=400)
-        category = serializer.save()
+        category = update_category(category, serializer.validated_data)
         return Response(CategorySerializer(category).data)
 
     def delete(self, request, category_id):
@@ -1278,7 +1626,7 @@ class AdminCategoryDetailView(APIView):
             category = get_category_by_id(category_id)
         except Category.DoesNotExist:
             raise NotFound("Category not found")
-        category.delete()
+        delete_category(category)
         return Response(
             {"message": "Category deleted successfully"},
             status=204
@@ -16,6 +16,7 @@ import dj_database_url
 from decouple import config
 from datetime import timedelta
 import ssl
+from celery.schedules import crontab
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -127,6 +128,26 @@ CACHES = {
     }
 }
 
+# "db" keeps pending carts as Order rows; "cache" keeps them in the cache above
+# and only writes Order/OrderItem rows at checkout.
+CART_BACKEND = config("CART_BACKEND", default="db")
+CART_TTL = config("CART_TTL", default=60 * 60 * 24 * 3, cast=int)
+# How long a cart line holds its stock before the sweeper releases it
+STOCK_RESERVATION_TTL = config("STOCK_RESERVATION_TTL", default=60 * 20, cast=int)
+# Compare-and-swap retries for pending order writes: attempts, and the first
+# backoff ceiling in seconds (doubles on each retry)
+ORDER_CAS_ATTEMPTS = config("ORDER_CAS_ATTEMPTS", default=5, cast=int)
+ORDER_CAS_BACKOFF = config("ORDER_CAS_BACKOFF", default=0.01, cast=float)
+# Outbox relay: publish attempts before an event is parked for inspection, the
+# retry backoff (seconds, doubling per failed attempt up to the max delay), and
+# how long published events are kept before the relay purges them
+OUTBOX_MAX_ATTEMPTS = config("OUTBOX_MAX_ATTEMPTS", default=10, cast=int)
+OUTBOX_RETRY_BACKOFF = config("OUTBOX_RETRY_BACKOFF", default=5, cast=int)
+OUTBOX_RETRY_MAX_DELAY = config("OUTBOX_RETRY_MAX_DELAY", default=60 * 60, cast=int)
+OUTBOX_RETENTION = config("OUTBOX_RETENTION", default=60 * 60 * 24, cast=int)
+# Delivered and cancelled orders older than this move to the archive tables
+ORDER_ARCHIVE_AFTER_DAYS = config("ORDER_ARCHIVE_AFTER_DAYS", default=30, cast=int)
+
 RATELIMIT_USE_CACHE = "default"
 
 RATELIMIT_EXCEPTION_CLASS = "django_ratelimit.exceptions.Ratelimited"
@@ -145,6 +166,21 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "Africa/Lagos"
+CELERY_BEAT_SCHEDULE = {
+    "release-expired-stock-reservations": {
+        "task": "food.tasks.release_expired_stock_reservations",
+        "schedule": 60.0,
+    },
+    # sharded foods show the sum of their stock shards with this much lag
+    "sync-sharded-stock": {
+        "task": "food.tasks.sync_sharded_food_stock",
+        "schedule": 10.0,
+    },
+    "archive-completed-orders": {
+        "task": "food.tasks.archive_completed_orders",
+        "schedule": crontab(hour=3, minute=0),
+    },
+}
 
 if IS_PROD:
     CELERY_BROKER_URL = config("REDIS_URL")
@@ -158,6 +194,18 @@ else:
     CELERY_BROKER_USE_SSL = {}
     CELERY_REDIS_BACKEND_USE_SSL = {}
 
+# Vendor order feed (server-sent events, see food/order_feed.py): "redis"
+# fans changes out to every ASGI worker, "local" only within this process, so
+# anything that runs the relay and the feed apart (docker-compose does) needs "redis"
+ORDER_FEED_BROKER = config("ORDER_FEED_BROKER", default="redis" if IS_PROD else "local")
+ORDER_FEED_REDIS_URL = CELERY_BROKER_URL
+# seconds between keepalive comments on an idle stream
+ORDER_FEED_HEARTBEAT = config("ORDER_FEED_HEARTBEAT", default=15, cast=float)
+# client reconnect delay in milliseconds, sent as the stream's retry field
+ORDER_FEED_RETRY_MS = 5000
+# messages buffered per stream before a slow client is told to resync
+ORDER_FEED_QUEUE_SIZE = 100
+
 
 BREVO_API_KEY = config("BREVO_API_KEY")
 